@@ -0,0 +1,40 @@
+"""
+Render the same corpus twice through the persistent render cache: once cold,
+once warm (unchanged style), then once for a rebuilt style whose only change
+is <updated>, and check the outputs are identical.
+
+    python benchmarks/bench_cache.py [style.csl] [count]
+"""
+import os, sys, time, tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__))+"/..")
+
+from core.renderer import Renderer
+from core.cache import RenderCache
+from bench_render import items, root
+
+def main(path=None, count=20000):
+    path = path or root+"/output/chicago-author-date-kyosei-ja.csl"
+    with open(path, "rb") as f:
+        data = f.read()
+    batch = items(count)
+    print(os.path.basename(path)+", "+str(count)+" items")
+
+    start = time.perf_counter()
+    reference = Renderer.load(data).document(batch)
+    print("  no cache:        %8.1f ms" % ((time.perf_counter()-start)*1000))
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = RenderCache(os.path.join(directory, "render-cache.sqlite"))
+        rebuilt = data.replace(b"<updated>", b"<updated>1999-01-01T00:00:00+00:00", 1) if b"<updated>" in data else data
+        for label, style in [("cold", data), ("warm", data), ("rebuilt style", rebuilt)]:
+            hits, misses = cache.hits, cache.misses
+            start = time.perf_counter()
+            output = Renderer.load(style).document(batch, cache=cache)
+            elapsed = time.perf_counter()-start
+            print("  %-16s %8.1f ms  %6d hits %6d misses  same output: %s" % (label+":", elapsed*1000, cache.hits-hits, cache.misses-misses, output==reference))
+        stats = cache.stats()
+        print("  cache: %d entries, %.1f MB" % (stats["entries"], stats["bytes"]/1048576))
+        cache.close()
+
+if __name__=="__main__":
+    main(sys.argv[1] if len(sys.argv)>1 else None, int(sys.argv[2]) if len(sys.argv)>2 else 20000)
@@ -0,0 +1,48 @@
+"""
+A 5,000-cluster document: insert, delete and move clusters near the start and
+compare the incremental engine (clusters rendered again) with rendering the
+whole document after every edit.
+
+    python benchmarks/bench_citations.py [style.csl] [clusters]
+"""
+import os, sys, time, random
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__))+"/..")
+
+from core.renderer import Renderer
+from core.citations import CitationDocument
+from bench_render import items, root
+
+def main(path=None, count=5000):
+    path = path or root+"/output/chicago-author-date-kyosei-ja.csl"
+    renderer = Renderer.load(path)
+    library = items(count//5)
+    rng = random.Random(1)
+    clusters = [[{"id": rng.choice(library)["id"], "locator": str(rng.randint(1, 300)) if rng.random()<0.5 else None} for x in range(rng.randint(1, 3))] for i in range(count)]
+    clusters = [[{k: v for k, v in cite.items() if v is not None} for cite in cites] for cites in clusters]
+    print(os.path.basename(path)+", "+str(count)+" clusters, "+str(len(library))+" items")
+
+    document = CitationDocument(renderer, library)
+    start = time.perf_counter()
+    document.extend(clusters)
+    print("  initial render:      %8.1f ms  %5d clusters" % ((time.perf_counter()-start)*1000, document.rendered))
+
+    edits = [
+        ("insert at 10", lambda: document.insert(10, [library[-1]["id"], library[0]["id"]])),
+        ("move 10 -> 4000", lambda: document.move(10, 4000)),
+        ("delete 0", lambda: document.delete(0)),
+        ("update 100", lambda: document.update(100, [library[5]["id"]])),
+    ]
+    for label, edit in edits:
+        start = time.perf_counter()
+        edit()
+        elapsed = time.perf_counter()-start
+        incremental = document.output()
+
+        start = time.perf_counter()
+        full = CitationDocument(renderer, library)
+        full.extend([cluster.cites for cluster in document.clusters])
+        fullelapsed = time.perf_counter()-start
+        print("  %-20s %8.1f ms  %5d clusters  (full: %8.1f ms, same output: %s)" % (label+":", elapsed*1000, document.rendered, fullelapsed*1000, full.output()==incremental))
+
+if __name__=="__main__":
+    main(sys.argv[1] if len(sys.argv)>1 else None, int(sys.argv[2]) if len(sys.argv)>2 else 5000)
@@ -0,0 +1,57 @@
+"""
+Sort large mixed ja/en bibliographies with the generated style's <sort>
+(name-kana, contributors, issued, title) on precomputed collation keys, and
+check the order against a key-by-key comparison sort of the same keys.
+
+    python benchmarks/bench_collation.py [style.csl] [count]
+"""
+import os, sys, time, functools
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__))+"/..")
+
+from core.renderer import Renderer, normalize
+from core import collation
+from bench_render import items, root
+
+def compare(sort, a, b):
+    """
+    The style's sort applied key by key: empty values last, then the
+    collation of the key (kana reading or string), reversed when descending
+    """
+    for (variable, macro, descending), x, y in zip(sort, a, b):
+        if x==y:
+            continue
+        if not x or not y:
+            return -1 if not y else 1
+        reading = variable in collation.readings
+        kx = collation.kanakey(x) if reading else collation.stringkey(x)
+        ky = collation.kanakey(y) if reading else collation.stringkey(y)
+        if kx!=ky:
+            result = -1 if kx<ky else 1
+            return -result if descending else result
+    return 0
+
+def main(path=None, count=100000):
+    path = path or root+"/output/chicago-author-date-kyosei-ja.csl"
+    renderer = Renderer.load(path)
+    batch = [normalize(item) for item in items(count)]
+    sort = renderer.style.bibliography["sort"]
+    print(os.path.basename(path)+", "+str(count)+" items, keys: "+", ".join([variable or macro for variable, macro, descending in sort]))
+
+    start = time.perf_counter()
+    values = [renderer.sortvalues(item) for item in batch]
+    print("  sort values:    %8.1f ms" % ((time.perf_counter()-start)*1000))
+
+    start = time.perf_counter()
+    collator = collation.Collator()
+    columns = [[row[k] for row in values] for k in range(len(sort))]
+    keys = collator.keys(columns, [variable in collation.readings for variable, macro, descending in sort])
+    order = collator.order(keys, [x[2] for x in sort])
+    print("  collated sort:  %8.1f ms  (%d distinct strings)" % ((time.perf_counter()-start)*1000, len(collator.cache)))
+
+    start = time.perf_counter()
+    reference = sorted(range(count), key=functools.cmp_to_key(lambda i, j: compare(sort, values[i], values[j])))
+    print("  comparison sort:%8.1f ms" % ((time.perf_counter()-start)*1000))
+    print("  same order: "+str(order==reference))
+
+if __name__=="__main__":
+    main(sys.argv[1] if len(sys.argv)>1 else None, int(sys.argv[2]) if len(sys.argv)>2 else 100000)
@@ -0,0 +1,40 @@
+"""
+Count config.xlsx reads while building an increasing number of journals.
+
+    python benchmarks/bench_config.py
+"""
+import os, sys, time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__))+"/..")
+
+from core import config as configmodule
+from core.config import ConfigStore
+from core.base import Base
+
+reads = 0
+readxlsx = configmodule.readers["xlsx"]
+
+def countingread(path):
+    global reads
+    reads += 1
+    return readxlsx(path)
+
+def build(store, repeat):
+    built = 0
+    for i in range(repeat):
+        for config in store.records():
+            ids = [x.strip() for x in config["ids"].split(",")]
+            Base(ids, config["name"], config["language"], len(ids)>1, config, store)
+            built += len(ids)
+    return built
+
+if __name__=="__main__":
+    os.chdir(os.path.dirname(os.path.abspath(__file__))+"/..")
+    configmodule.readers["xlsx"] = countingread
+    print("%8s %8s %8s %10s" % ("repeat", "ids", "reads", "seconds"))
+    for repeat in [1, 2, 4, 8]:
+        reads = 0
+        ConfigStore.instances.clear()
+        start = time.perf_counter()
+        store = ConfigStore.load()
+        built = build(store, repeat)
+        print("%8d %8d %8d %10.3f" % (repeat, built, reads, time.perf_counter()-start))
@@ -0,0 +1,58 @@
+"""
+Clone every macro into a -ja twin on templates with several hundred macros,
+with list-index insertion (old getmacrosja) and sibling insertion (Tools.insertafter).
+
+    python benchmarks/bench_editing.py
+"""
+import os, sys, copy, time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__))+"/..")
+
+from core.template import Template
+from core.tools import Tools
+from core.config import ConfigStore
+
+def bigtemplate(template, count):
+    """
+    Copy of the base template with its macros repeated until there are count of them
+    """
+    style = template.copy()
+    macros = list(style.macros.values())
+    last = macros[-1]
+    i = 0
+    while len(style.root.findall("z:macro", template.ns))<count:
+        m = copy.deepcopy(macros[i%len(macros)])
+        m.attrib["name"] = m.attrib["name"]+"-"+str(i)
+        last.addnext(m)
+        last = m
+        i += 1
+    return style.root
+
+def cloneindex(root, ns):
+    for macro in root.findall("z:macro", ns):
+        parent = macro.getparent()
+        index = parent.getchildren().index(macro)+1
+        jm = copy.deepcopy(macro)
+        jm.attrib["name"] = jm.attrib["name"]+"-ja"
+        parent.insert(index, jm)
+
+def clonesibling(root, ns, tools):
+    for macro in root.findall("z:macro", ns):
+        jm = copy.deepcopy(macro)
+        jm.attrib["name"] = jm.attrib["name"]+"-ja"
+        tools.insertafter(macro, jm)
+
+def timed(function, root, *args):
+    root = copy.deepcopy(root)
+    start = time.perf_counter()
+    function(root, *args)
+    return time.perf_counter()-start
+
+if __name__=="__main__":
+    template = Template.load()
+    tools = Tools(list(ConfigStore.load().settings.keys())[0])
+    print("%8s %12s %12s %8s" % ("macros", "index (ms)", "sibling (ms)", "speedup"))
+    for count in [28, 200, 500, 1000, 2000]:
+        root = bigtemplate(template, count)
+        a = min(timed(cloneindex, root, template.ns) for i in range(3))
+        b = min(timed(clonesibling, root, template.ns, tools) for i in range(3))
+        print("%8d %12.2f %12.2f %8.1f" % (count, a*1000, b*1000, a/b))
@@ -0,0 +1,81 @@
+"""
+Compile a generated style once and render synthetic CSL-JSON bibliographies
+(mixed ja/en items) with the built-in renderer.
+
+    python benchmarks/bench_render.py [style.csl] [count]
+"""
+import os, sys, time, random
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__))+"/..")
+
+from core.renderer import Renderer, CompiledStyle
+
+root = os.path.dirname(os.path.abspath(__file__))+"/.."
+
+families = [("山田", "太郎", "やまだ たろう"), ("佐藤", "花子", "さとう はなこ"), ("鈴木", "一郎", "すずき いちろう"), ("伊藤", "美咲", "いとう みさき")]
+western = [("Smith", "John Paul"), ("Doe", "Jane"), ("Bowles", "Samuel"), ("Gintis", "Herbert"), ("García", "Ana María")]
+types = ["article-journal", "book", "chapter", "report", "thesis", "webpage"]
+
+def items(count, seed=0):
+    """
+    Reproducible CSL-JSON items, about a third of them Japanese
+    """
+    rng = random.Random(seed)
+    out = []
+    for i in range(count):
+        ja = i%3==0
+        item = {"id": "item-"+str(i), "type": types[i%len(types)], "issued": {"date-parts": [[rng.randint(1960, 2024)]]}}
+        if ja:
+            names = [rng.choice(families) for x in range(rng.randint(1, 3))]
+            item["author"] = [{"family": f, "given": g} for f, g, k in names]
+            item["note"] = "name-kana: "+names[0][2]
+            item["language"] = "ja"
+            item["title"] = "教育と社会 第"+str(i)+"巻"
+            item["container-title"] = "教育社会学研究"
+            item["publisher"] = "有斐閣"
+        else:
+            item["author"] = [{"family": f, "given": g} for f, g in [rng.choice(western) for x in range(rng.randint(1, 5))]]
+            item["language"] = "en"
+            item["title"] = "the economics of education, part "+str(i)
+            item["container-title"] = "Journal of Education"
+            item["publisher"] = "Basic Books"
+            item["publisher-place"] = "New York"
+        if item["type"] in ["article-journal", "chapter"]:
+            start = rng.randint(1, 900)
+            item["page"] = str(start)+"-"+str(start+rng.randint(1, 40))
+            item["volume"] = str(rng.randint(1, 60))
+            item["issue"] = str(rng.randint(1, 4))
+        if item["type"]=="chapter":
+            item["editor"] = [{"family": "Editor", "given": "Ed"}]
+        if item["type"]=="webpage":
+            item["URL"] = "https://example.org/"+str(i)
+            item["accessed"] = {"date-parts": [[2021, 3, 4]]}
+        out.append(item)
+    return out
+
+def main(path=None, count=10000):
+    path = path or root+"/output/chicago-author-date-kyosei-ja.csl"
+    with open(path, "rb") as f:
+        data = f.read()
+    batch = items(count)
+    print(os.path.basename(path)+", "+str(count)+" items")
+
+    from lxml import etree as ET
+    start = time.perf_counter()
+    CompiledStyle(ET.fromstring(data), "text")
+    print("  compile:        %8.1f ms" % ((time.perf_counter()-start)*1000))
+
+    for format in ["text", "html", "rtf"]:
+        renderer = Renderer.load(data, format)
+        start = time.perf_counter()
+        entries = list(renderer.entries(batch))
+        elapsed = time.perf_counter()-start
+        print("  %-5s entries:   %8.1f ms  %9.0f items/s" % (format, elapsed*1000, len(entries)/elapsed))
+
+    renderer = Renderer.load(data, "text")
+    start = time.perf_counter()
+    renderer.bibliography(batch)
+    elapsed = time.perf_counter()-start
+    print("  sorted text:    %8.1f ms  %9.0f items/s" % (elapsed*1000, count/elapsed))
+
+if __name__=="__main__":
+    main(sys.argv[1] if len(sys.argv)>1 else None, int(sys.argv[2]) if len(sys.argv)>2 else 10000)
@@ -0,0 +1,208 @@
+"""
+Scale of a full build with synthetic journal catalogues of 10, 100, 1,000 and
+10,000 ids. Each catalogue is written as config.xlsx and as the equivalent
+.json, .toml and CSV sources; the Settings of every synthetic id start from a
+real id of the same language with about a third of its a-/b-/c- keys set to
+another value seen for that key in input/config.xlsx. Every case runs in a
+fresh interpreter: loading each config source, then a full forced build
+through Pycsl (from the .xlsx source) in a scratch directory. Reports
+throughput, peak RSS (of the main process, not of -j workers) and per-style
+latency (from the build timing), and appends the results with the commit to
+a JSON Lines file; the previous run of another commit is shown for comparison.
+
+    python benchmarks/bench_scale.py [sizes...] [--jobs N] [--formats xlsx,json,toml,csv] [-o results.jsonl]
+"""
+import os, sys, json, time, random, argparse, platform, resource, subprocess, tempfile, zipfile, contextlib
+from xml.sax.saxutils import escape
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__))+"/..")
+
+root = os.path.dirname(os.path.abspath(__file__))+"/.."
+default_results = root+"/.cache/bench-scale.jsonl"
+
+def catalogue(count, seed=0):
+    """
+    Config data (as ConfigStore.data()) with count Settings ids: one bilingual
+    record (x-en, x-ja) and one English record (x-en) per pair of ids
+    """
+    from core.config import ConfigStore
+    store = ConfigStore(root+"/input/config.xlsx")
+    rng = random.Random(seed)
+    pools = {}
+    for settings in store.settings.values():
+        for key, value in settings.items():
+            pools.setdefault(key, [])
+            if value not in pools[key]:
+                pools[key].append(value)
+    real = {"ja": [x for x in store.settings if x.endswith("-ja")], "en": [x for x in store.settings if x.endswith("-en")]}
+    bilingual = [r for r in store.metadata if "," in r["ids"]][0]
+    english = [r for r in store.metadata if "," not in r["ids"]][0]
+
+    settings = {}
+    metadata = []
+    for i in range(count//2):
+        name = "syn%05d" % i
+        for language in ["en", "ja"]:
+            column = dict(store.settings[rng.choice(real[language])])
+            for key in column:
+                if key[:2] in ["a-", "b-", "c-"] and rng.random()<0.3:
+                    column[key] = rng.choice(pools[key])
+            settings[name+"-"+language] = column
+        journal = "Synthetic Journal "+str(i)
+        metadata.append(dict(bilingual, ids=name+"-en, "+name+"-ja", name=journal))
+        metadata.append(dict(english, ids=name+"-en", name=journal))
+    return {"settings": settings, "metadata": metadata, "creator": dict(store.creator)}
+
+def writexlsx(data, path):
+    """
+    Minimal workbook with the Settings, Metadata and Creator sheets (inline strings)
+    """
+    def cell(value):
+        if isinstance(value, bool):
+            return '<c t="b"><v>'+("1" if value else "0")+'</v></c>'
+        return '<c t="inlineStr"><is><t xml:space="preserve">'+escape(str(value))+'</t></is></c>'
+    def sheet(rows):
+        body = "".join(['<row r="'+str(i+1)+'">'+"".join([cell(v) for v in row])+'</row>' for i, row in enumerate(rows)])
+        return '<?xml version="1.0" encoding="UTF-8"?><worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'+body+'</sheetData></worksheet>'
+
+    ids = list(data["settings"].keys())
+    variables = list(data["settings"][ids[0]].keys())
+    columns = list(data["metadata"][0].keys())
+    sheets = [
+        ("Settings", [["variable"]+ids]+[[v]+[data["settings"][id][v] for id in ids] for v in variables]),
+        ("Metadata", [columns]+[[r[k] for k in columns] for r in data["metadata"]]),
+        ("Creator", [[k, v] for k, v in data["creator"].items()]),
+    ]
+    main = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+    rel = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", '<?xml version="1.0" encoding="UTF-8"?><Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types"><Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/><Default Extension="xml" ContentType="application/xml"/><Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'+"".join(['<Override PartName="/xl/worksheets/sheet'+str(i+1)+'.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>' for i in range(len(sheets))])+'</Types>')
+        archive.writestr("_rels/.rels", '<?xml version="1.0" encoding="UTF-8"?><Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships"><Relationship Id="rId1" Type="'+rel+'/officeDocument" Target="xl/workbook.xml"/></Relationships>')
+        archive.writestr("xl/workbook.xml", '<?xml version="1.0" encoding="UTF-8"?><workbook xmlns="'+main+'" xmlns:r="'+rel+'"><sheets>'+"".join(['<sheet name="'+name+'" sheetId="'+str(i+1)+'" r:id="rId'+str(i+1)+'"/>' for i, (name, rows) in enumerate(sheets)])+'</sheets></workbook>')
+        archive.writestr("xl/_rels/workbook.xml.rels", '<?xml version="1.0" encoding="UTF-8"?><Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'+"".join(['<Relationship Id="rId'+str(i+1)+'" Type="'+rel+'/worksheet" Target="worksheets/sheet'+str(i+1)+'.xml"/>' for i in range(len(sheets))])+'</Relationships>')
+        for i, (name, rows) in enumerate(sheets):
+            archive.writestr("xl/worksheets/sheet"+str(i+1)+".xml", sheet(rows))
+
+def writesources(data, directory):
+    from core.config import writejson, writetoml, writecsv
+    sources = {"xlsx": directory+"/config.xlsx", "json": directory+"/config.json", "toml": directory+"/config.toml", "csv": directory+"/config"}
+    writexlsx(data, sources["xlsx"])
+    writejson(data, sources["json"])
+    writetoml(data, sources["toml"])
+    writecsv(data, sources["csv"])
+    return sources
+
+def peakrss():
+    """
+    Peak resident set of this process in MB
+    """
+    # On Linux ru_maxrss keeps the parent's peak across fork and exec; VmHWM does not
+    if os.path.exists("/proc/self/status"):
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])/1024
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss/1024 if sys.platform!="darwin" else rss/1048576
+
+# Child side: one measurement per interpreter, printed as JSON
+def childload(source):
+    from core.config import ConfigStore
+    start = time.perf_counter()
+    store = ConfigStore(source)
+    return {"seconds": time.perf_counter()-start, "ids": len(store.settings), "rss": peakrss()}
+
+def childbuild(source, jobs):
+    from core.config import ConfigStore
+    from core import timing
+    import pycsl
+    # Only the per-style "record" stage, so the events do not weigh on the peak RSS
+    timing.timer.enable(depth=1)
+    store = ConfigStore(source)
+    before = peakrss()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        built = pycsl.Pycsl(store, jobs=jobs, force=True, updated="2000-01-01T00:00:00+00:00")
+    seconds = time.perf_counter()-start
+    latencies = sorted([event["duration"] for event in timing.timer.drain() if event["stage"]=="record"])
+    return {
+        "seconds": seconds,
+        "styles": len(built.outputs),
+        "throughput": len(built.outputs)/seconds,
+        "latency p50 ms": latencies[len(latencies)//2]*1000,
+        "latency p95 ms": latencies[min(len(latencies)-1, int(len(latencies)*0.95))]*1000,
+        "latency max ms": latencies[-1]*1000,
+        "rss before build": before,
+        "rss": peakrss(),
+    }
+
+def child(kind, *args):
+    if kind=="load":
+        return childload(args[0])
+    return childbuild(args[0], int(args[1]))
+
+def run(directory, kind, *args):
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", kind]+list(args), cwd=directory, check=True, stdout=subprocess.PIPE)
+    return json.loads(out.stdout.decode("utf-8").strip().splitlines()[-1])
+
+def commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root, check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def previous(path, current):
+    """
+    Last saved run of another commit, or None
+    """
+    if not os.path.exists(path):
+        return None
+    last = None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            run = json.loads(line)
+            if run["commit"]!=current:
+                last = run
+    return last
+
+def main(sizes, jobs, formats, results):
+    rows = []
+    print("%-8s %-6s %10s %10s %12s %10s %10s %10s" % ("ids", "case", "seconds", "styles/s", "p50/p95 ms", "max ms", "peak MB", "build MB"))
+    for size in sizes:
+        with tempfile.TemporaryDirectory(prefix="pycsl-scale-") as directory:
+            sources = writesources(catalogue(size), directory)
+            for format in formats:
+                r = run(directory, "load", sources[format])
+                rows.append(dict(r, ids=size, case="load "+format))
+                print("%-8d %-6s %10.3f %10s %12s %10s %10.1f %10s" % (size, format, r["seconds"], "", "", "", r["rss"], ""))
+            r = run(directory, "build", sources["xlsx"], str(jobs))
+            rows.append(dict(r, ids=size, case="build"))
+            print("%-8d %-6s %10.3f %10.1f %12s %10.2f %10.1f %10.1f" % (size, "build", r["seconds"], r["throughput"], "%.2f/%.2f" % (r["latency p50 ms"], r["latency p95 ms"]), r["latency max ms"], r["rss"], r["rss"]-r["rss before build"]))
+
+    current = commit()
+    saved = {"commit": current, "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "python": platform.python_version(), "jobs": jobs, "results": rows}
+    before = previous(results, current)
+    os.makedirs(os.path.dirname(os.path.abspath(results)), exist_ok=True)
+    with open(results, "a", encoding="utf-8") as f:
+        f.write(json.dumps(saved)+"\n")
+    print("Saved to "+results)
+
+    if before is not None:
+        old = {(r["ids"], r["case"]): r for r in before["results"]}
+        print("Compared with "+str(before["commit"])+" ("+before["date"]+"):")
+        for r in rows:
+            o = old.get((r["ids"], r["case"]), None)
+            if o is not None:
+                print("%-8d %-12s time x%.2f  peak RSS x%.2f" % (r["ids"], r["case"], r["seconds"]/o["seconds"], r["rss"]/o["rss"]))
+
+if __name__=="__main__":
+    if len(sys.argv)>1 and sys.argv[1]=="--child":
+        print(json.dumps(child(*sys.argv[2:])))
+        sys.exit(0)
+    parser = argparse.ArgumentParser(description="Build time, throughput and memory against catalogue size")
+    parser.add_argument("sizes", nargs="*", type=int, default=[10, 100, 1000, 10000])
+    parser.add_argument("-j", "--jobs", type=int, default=1)
+    parser.add_argument("--formats", default="xlsx,json,toml,csv")
+    parser.add_argument("-o", "--output", default=default_results)
+    args = parser.parse_args()
+    main(args.sizes, args.jobs, args.formats.split(","), args.output)
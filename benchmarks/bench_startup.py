@@ -0,0 +1,30 @@
+"""
+Cold-start time of the generator in fresh interpreters: importing it, and
+listing the catalogue from config.xlsx with the built-in reader and with pandas.
+
+    python benchmarks/bench_startup.py [runs]
+"""
+import os, sys, time, subprocess, statistics
+
+root = os.path.dirname(os.path.abspath(__file__))+"/.."
+
+cases = [
+    ("import core", "import core"),
+    ("import pycsl", "import pycsl"),
+    ("list (built-in xlsx)", "import sys, pycsl; pycsl.main(['list']); assert 'pandas' not in sys.modules"),
+    ("list (pandas)", "import os, pycsl; os.environ['PYCSL_XLSX_ENGINE']='pandas'; pycsl.main(['list'])"),
+    ("import pandas", "import pandas"),
+]
+
+def run(code):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], cwd=root, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter()-start
+
+if __name__=="__main__":
+    runs = int(sys.argv[1]) if len(sys.argv)>1 else 5
+    baseline = statistics.median([run("pass") for i in range(runs)])
+    print("%-24s %12s" % ("case", "median (ms)"))
+    print("%-24s %12.1f" % ("python -c pass", baseline*1000))
+    for name, code in cases:
+        print("%-24s %12.1f" % (name, statistics.median([run(code) for i in range(runs)])*1000))
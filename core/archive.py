@@ -0,0 +1,58 @@
+import zlib, struct
+
+# Deflated members compressed once in memory and written as is: into zip
+# archives streamed front to back (ZipStream), or as .gz files sharing the
+# same deflate data. Dates are fixed, so unchanged inputs give byte-identical
+# archives.
+
+def member(name, data):
+    """
+    (name, crc, compressed data, size) of one deflated archive member
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    return (name.encode("utf-8"), zlib.crc32(data), compressor.compress(data)+compressor.flush(), len(data))
+
+class ZipStream:
+    # 1980-01-01 00:00, the earliest zip date
+    time = 0
+    date = (1<<5)|1
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.offset = 0
+        self.directory = []
+
+    def add(self, entry):
+        """
+        entry: a member() tuple, compressed once and added to any number of archives
+        """
+        name, crc, data, size = entry
+        header = struct.pack("<IHHHHHIIIHH", 0x04034b50, 20, 0x800, 8, self.time, self.date, crc, len(data), size, len(name), 0)
+        self.directory.append(struct.pack("<IHHHHHHIIIHHHHHII", 0x02014b50, 20, 20, 0x800, 8, self.time, self.date, crc, len(data), size, len(name), 0, 0, 0, 0, 0, self.offset)+name)
+        self.stream.write(header+name)
+        self.stream.write(data)
+        self.offset += len(header)+len(name)+len(data)
+
+    def close(self):
+        directory = b"".join(self.directory)
+        self.stream.write(directory)
+        self.stream.write(struct.pack("<IHHHHIIH", 0x06054b50, 0, 0, len(self.directory), len(self.directory), len(directory), self.offset, 0))
+
+# gzip header without file name or modification time
+gzipheader = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+
+def gzipped(entry):
+    """
+    .gz file of a member() tuple
+    """
+    name, crc, data, size = entry
+    return gzipheader+data+struct.pack("<II", crc & 0xffffffff, size & 0xffffffff)
+
+def ungzipped(name, data):
+    """
+    member() tuple of a .gz file written by gzipped(), or None for any other file
+    """
+    if len(data)<len(gzipheader)+8 or not data.startswith(gzipheader):
+        return None
+    crc, size = struct.unpack("<II", data[-8:])
+    return (name.encode("utf-8"), crc, data[len(gzipheader):-8], size)
@@ -1,23 +1,61 @@
-import os, copy, datetime, pytz, shutil
+import os, copy
 from lxml import etree as ET
-from lxml.etree import SubElement, QName
+from lxml.etree import SubElement
 from .tools import Tools
+from .template import Template
+from .macros import MacroClones
+from . import timing
 
 from .processor import Processor
 
+def serializetree(tree, compact=False):
+    """
+    Pretty-printed style and None, or with compact the optimized unindented
+    one (see core.optimize) and its size report
+    """
+    data = ET.tostring(tree, pretty_print=True, xml_declaration=True, encoding="UTF-8")
+    if not compact:
+        return data, None
+    from .optimize import compact as optimized
+    timing.lap("compact")
+    optimizeddata, sizes = optimized(tree)
+    return optimizeddata, (len(data), sizes)
+
+# Terms of the <locale> added for each language of a multilingual style
+localeterms = {
+    "ja": [("頁", {"name": "page", "form": "long"}), ("巻", {"name": "volume", "form": "short"}), ("号", {"name": "issue", "form": "short"}), ("訳", {"name": "translator", "form": "short"}), ("編訳", {"name": "editortranslator", "form": "short"}), ("アクセス", {"name": "accessed"})],
+    "zh": [("页", {"name": "page", "form": "long"}), ("卷", {"name": "volume", "form": "short"}), ("期", {"name": "issue", "form": "short"}), ("译", {"name": "translator", "form": "short"}), ("编译", {"name": "editortranslator", "form": "short"}), ("访问", {"name": "accessed"})],
+    "ko": [("쪽", {"name": "page", "form": "long"}), ("권", {"name": "volume", "form": "short"}), ("호", {"name": "issue", "form": "short"}), ("역", {"name": "translator", "form": "short"}), ("편역", {"name": "editortranslator", "form": "short"}), ("접속", {"name": "accessed"})],
+}
+
+# Timing lap of each language's Processor
+processornames = {"ja": "japanese", "zh": "chinese", "ko": "korean"}
+
+def idlanguage(id):
+    """
+    Language of an output id: kyosei-ja is ja
+    """
+    return id.split("-")[1]
+
 class Base:
-    def __init__(self, ids, name, language, multilingual, config):
+    def __init__(self, ids, name, language, multilingual, config, store=None, template=None, updated=None, track=False):
         if multilingual:
             self.id = ids[1]
         else:
             self.id = ids[0]
         
+        # Every id after the first (English) one adds the layouts of its language
+        self.languages = [idlanguage(x) for x in ids[1:]]
+        
         config["translate"] = {x.strip().split(":")[0]:x.strip().split(":")[1] for x in config.get("translate", "").split(",") if len(x.strip().split(":"))>1}
         
-        self.input = "input/chicago-author-date.csl"
-        self.output = "output/chicago-author-date-"+self.id+".csl"
+        self.template = template if template is not None else Template.load()
+        self.input = self.template.path
+        self.output = self.outputpath(self.id)
         
-        self.tools = Tools(self.id)
+        timing.lap("settings")
+        self.tools = Tools(self.id, store)
+        self.store = self.tools.store
         
         #basic settings
         self.sortkey = "name-kana"
@@ -26,63 +64,58 @@ class Base:
         #basic info
         self.journalname = name
         self.language = language
+        self.updated = updated
+        self.sizes = None
         
         #xml bases
-        parser = ET.XMLParser(remove_blank_text=True)
-        self.tree = ET.parse(self.input, parser)
-        self.root = self.tree.getroot()
-        self.info = self.tree.findall('z:info', self.ns)[0]
-        self.citation = self.tree.findall('z:citation', self.ns)[0]
-        self.bibliography = self.tree.findall('z:bibliography', self.ns)[0]
+        timing.lap("template copy")
+        style = self.template.copy(track)
+        self.origin = style.origin
+        self.derived = {} if track else None
+        self.tree = style.tree
+        self.root = style.root
+        self.info = style.info
+        self.citation = style.citation
+        self.bibliography = style.bibliography
         self.bibliography.attrib.pop("subsequent-author-substitute")
         
         self.root.attrib["page-range-format"] = "expanded"
         self.root.attrib["default-locale"] = config.get("locale", "en-UK")
         
         # new macros
+        timing.lap("layouts")
         # Add period before access
-        macros = self.getmacros()
-        idx = self.root.index(macros.get(list(macros.keys())[len(macros)-1], None))+1
-        macro = self.tools.insertchild(idx, self.root, "macro", None, {"name": "final-dot"})
+        macros = style.macros
+        lastmacro = macros.get(list(macros.keys())[len(macros)-1], None)
+        macro = self.tools.insertafter(lastmacro, self.tools.newelement("macro", None, {"name": "final-dot"}))
         
         # retrieve macro list
-        self.macros = self.getmacros()
-        self.jamacros = self.getmacrosja()
+        self.macros = dict(macros)
+        self.macros["final-dot"] = macro
+        self.macroclones = MacroClones(self.macros, self.tools, self.clone, self.languages) if multilingual else None
         
         """
         Bibliography settings
         """
         # Add sorting key: kana-name
         if multilingual:
-            sort = self.bibliography.xpath("z:sort", namespaces=self.ns)[0]
+            sort = style.sort
             key = SubElement(sort, "key")
             key.attrib["variable"] = self.sortkey
             sort.insert(0, key)
         
         """
-        Split in two languages
+        Split in languages
         """
-        # Add ja bibliography layouts
-        self.bibliographylayout = self.tree.findall('z:bibliography/z:layout', self.ns)[0]
-        if multilingual:
-            self.bibliographylayoutja = copy.deepcopy(self.bibliographylayout)
-            self.bibliographylayoutja.attrib["locale"] = "ja"
-            idx = self.bibliography.getchildren().index(self.bibliographylayout)
-            self.bibliography.insert(idx, self.bibliographylayoutja)
-            for child in self.bibliographylayoutja.getchildren():
-                self.tools.localize(child)
+        # Add localized bibliography layouts, one per language
+        self.bibliographylayout = style.bibliographylayout
+        self.bibliographylayouts = self.localizelayout(self.bibliographylayout)
         
         """
         Citation settings
         """
-        self.citationlayout = self.tree.findall('z:citation/z:layout', self.ns)[0]
-        if multilingual:
-            self.citationlayoutja = copy.deepcopy(self.citationlayout)
-            self.citationlayoutja.attrib["locale"] = "ja"
-            idx = self.citation.getchildren().index(self.citationlayout)
-            self.citation.insert(idx, self.citationlayoutja)
-            for child in self.citationlayoutja.getchildren():
-                self.tools.localize(child)
+        self.citationlayout = style.citationlayout
+        self.citationlayouts = self.localizelayout(self.citationlayout)
             
         # Citation main settings
         self.citation.attrib["et-al-min"] = "3"
@@ -93,59 +126,76 @@ class Base:
         """
         Edit metadata
         """
+        timing.lap("metadata")
         self.setmetadata()
         
         """ 
         Create locales
         """
         
-        if multilingual:
-            localeja = SubElement(self.info.getparent(), "{"+self.ns["z"]+"}locale")
-            terms = SubElement(localeja, "{"+self.ns["z"]+"}terms")
-            localeja.attrib[self.tools.qname("lang")] = "ja"
-            idx = self.info.getparent().getchildren().index(self.info)+1
-            self.info.getparent().insert(idx, localeja)
-            localeja.insert(0, terms)
+        timing.lap("locale")
+        previous = self.info
+        for language in self.languages:
+            locale = SubElement(self.info.getparent(), "{"+self.ns["z"]+"}locale")
+            terms = SubElement(locale, "{"+self.ns["z"]+"}terms")
+            locale.attrib[self.tools.qname("lang")] = language
+            previous = self.tools.insertafter(previous, locale)
+            locale.insert(0, terms)
             
             #Insert locale terms
-            self.tools.appendchild(terms, "term", "頁", {"name": "page", "form": "long"})
-            self.tools.appendchild(terms, "term", "巻", {"name": "volume", "form": "short"})
-            self.tools.appendchild(terms, "term", "号", {"name": "issue", "form": "short"})
-            self.tools.appendchild(terms, "term", "訳", {"name": "translator", "form": "short"})
-            self.tools.appendchild(terms, "term", "編訳", {"name": "editortranslator", "form": "short"})
-            self.tools.appendchild(terms, "term", "アクセス", {"name": "accessed"})
-                       
+            for text, attribs in localeterms.get(language, []):
+                self.tools.appendchild(terms, "term", text, attribs)
         
         if multilingual:
-            #Process Japanese
-            Processor(self.root, ids[1], config, self.jamacros, self.citationlayoutja, self.bibliographylayoutja).process()
+            #Process each language on its clones made on first use, then English
+            for id, language in zip(ids[1:], self.languages):
+                timing.lap(processornames.get(language, language))
+                Processor(self.root, id, config, self.macroclones.localized(language), self.citationlayouts[language], self.bibliographylayouts[language], self.store).process()
+            timing.lap("english")
+            Processor(self.root, ids[0], config, self.macroclones.english(), self.citationlayout, self.bibliographylayout, self.store).process()
             
-        #Process English
-        Processor(self.root, ids[0], config, self.macros, self.citationlayout, self.bibliographylayout).process()
+            # Clones left identical to their original are dropped
+            timing.lap("macro clones")
+            self.localizedmacros = self.macroclones.finish({language: [self.citationlayouts[language], self.bibliographylayouts[language]] for language in self.languages})
+        else:
+            #Process English
+            timing.lap("english")
+            Processor(self.root, ids[0], config, self.macros, self.citationlayout, self.bibliographylayout, self.store).process()
+    
+    def localizelayout(self, layout):
+        """
+        Copies of a layout for every language, before it and in id order
+        """
+        layouts = dict(zip(self.languages, self.tools.localize(layout, self.languages, self.clone)))
+        for language in self.languages:
+            layouts[language].attrib["locale"] = language
+            self.tools.insertbefore(layout, layouts[language])
+        return layouts
+    
+    def clone(self, element):
+        """
+        Deep copy of an element; when tracking, each copied node remembers the
+        template node its source came from
+        """
+        clone = copy.deepcopy(element)
+        if self.derived is not None:
+            for node, source in zip(clone.iter(), element.iter()):
+                template = self.origin.get(source, None)
+                if template is None:
+                    template = self.derived.get(source, None)
+                if template is not None:
+                    self.derived[node] = template
+        return clone
+    
+    @staticmethod
+    def outputpath(id):
+        return "output/chicago-author-date-"+id+".csl"
     
     def getmacros(self):
         m = self.tree.findall('z:macro', self.ns)
         m = {x.attrib["name"]:x for x in m}
         return m
     
-    def getmacrosja(self):
-        macros = {}
-        for i in self.macros:
-            macro = self.macros[i]
-            parent= macro.getparent()
-            index = parent.getchildren().index(macro)+1
-            jm = copy.deepcopy(macro)
-            mkey = jm.attrib["name"]
-            jm.attrib["name"] = mkey+"-ja"
-            parent.insert(index, jm)
-            macros[mkey] = jm
-            macroelements = jm.xpath(".//z:text[@macro]", namespaces=self.ns)
-            for m in macroelements:
-                m.attrib["macro"] = m.attrib["macro"]+"-ja"
-            # print(macroelements)
-            
-        return macros
-    
     def setmetadata(self):
         """
         Add my contributions
@@ -181,13 +231,45 @@ class Base:
         Add updated date
         """
         up = self.tools.child(self.info, "z:updated")
-        up.text = datetime.datetime.now().astimezone().replace(microsecond=0).isoformat()
+        if self.updated is not None:
+            up.text = self.updated
+        else:
+            import datetime
+            up.text = datetime.datetime.now().astimezone().replace(microsecond=0).isoformat()
     
     def install(self):
         output = os.path.dirname(os.path.abspath(__file__))+"/../"+self.output
         os.system(output)
     
-    def create(self):
-        os.makedirs("output", exist_ok=True)
-        self.tree.write(self.output, pretty_print=True, xml_declaration=True, encoding="UTF-8")
+    def serialize(self, compact=False):
+        """
+        Pretty-printed style, or with compact the optimized unindented one;
+        self.sizes then holds the size report
+        """
+        timing.lap("serialize")
+        data, sizes = serializetree(self.tree, compact)
+        if compact:
+            self.sizes = sizes
+        return data
+    
+    def patch(self):
+        """
+        The style as the template plus the edits of this build (see
+        core.patch); needs a Base built with track=True
+        """
+        if self.origin is None:
+            raise ValueError("Base of '"+self.id+"' was not built with track=True")
+        from .patch import StylePatch, diff
+        return StylePatch(self.template, diff(self.template, self.root, self.origin, self.derived), self.id, self.output)
+    
+    def write(self, stream, compact=False):
+        data = self.serialize(compact)
+        timing.lap("write")
+        stream.write(data)
+    
+    def create(self, output=None, compact=False):
+        output = output if output is not None else self.output
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        with open(output, "wb") as f:
+            self.write(f, compact)
         # self.install()
\ No newline at end of file
@@ -0,0 +1,118 @@
+import os, datetime, fnmatch
+from .base import Base
+from .config import ConfigStore
+from .template import Template
+from . import timing
+
+# Worker side of the parallel build: each process keeps its own store and
+# parsed template, and only Metadata records (plain dicts) cross the pool
+worker = {}
+
+def initworker(store, templatesource, updated, compact=False, timed=False, depth=None):
+    # A forked worker starts with a copy of the parent's events
+    timing.timer.enable(timed, depth)
+    timing.timer.drain()
+    worker["store"] = store
+    worker["template"] = Template.fromsource(templatesource)
+    worker["updated"] = updated
+    worker["compact"] = compact
+
+def recordids(config):
+    """
+    Ids of a Metadata record and the id its output is named after
+    """
+    ids = [x.strip() for x in config["ids"].split(",")]
+    return ids, ids[1] if len(ids)>1 else ids[0]
+
+class SelectionError(ValueError):
+    """
+    Id or journal patterns that match no Metadata record
+    """
+    def __init__(self, patterns):
+        self.patterns = patterns
+        ValueError.__init__(self, "No Metadata record matches "+", ".join([option+" '"+pattern+"'" for option, pattern in patterns]))
+
+def selectrecords(configs, ids=None, journals=None):
+    """
+    Records whose output id matches one of the id patterns and whose journal
+    name matches one of the journal patterns (shell-style globs); raises
+    SelectionError for every pattern no record matches
+    """
+    configs = list(configs)
+    patterns = [("--id", x) for x in ids or [] if not any(fnmatch.fnmatchcase(recordids(config)[1], x) for config in configs)]
+    patterns += [("--journal", x) for x in journals or [] if not any(fnmatch.fnmatchcase(config["name"], x) for config in configs)]
+    if patterns:
+        raise SelectionError(patterns)
+    selected = []
+    for config in configs:
+        if ids and not any(fnmatch.fnmatchcase(recordids(config)[1], x) for x in ids):
+            continue
+        if journals and not any(fnmatch.fnmatchcase(config["name"], x) for x in journals):
+            continue
+        selected.append(config)
+    return selected
+
+def buildrecord(config, store=None, template=None, updated=None, compact=False):
+    if store is None:
+        store = worker["store"]
+        template = worker["template"]
+        updated = worker["updated"]
+        compact = worker["compact"]
+    ids, id = recordids(config)
+    multilingual = len(ids)>1
+    timing.timer.record(id)
+    with timing.stage("record"):
+        base = Base(ids, config["name"], config["language"], multilingual, config, store, template, updated)
+        base.create(compact=compact)
+    timing.timer.record(None)
+    return base
+
+def buildpatch(config, store, template, updated=None):
+    """
+    Style of one Metadata record as a StylePatch (the template plus the edits
+    of the build, see core.patch); the built tree itself is not kept
+    """
+    ids, id = recordids(config)
+    base = Base(ids, config["name"], config["language"], len(ids)>1, dict(config), store, template, updated, track=True)
+    return base.patch()
+
+def generate(config, settings, template=None, updated=None, stream=None, compact=False):
+    """
+    Serialized CSL for one Metadata record, built entirely in memory.
+    settings maps each id of the record to its Settings column; template is a
+    Template, a path, or None for the base template. With a stream, the bytes
+    are written to it instead of returned. compact gives the optimized release form.
+    """
+    if template is None or isinstance(template, str):
+        template = Template.load(template)
+    store = ConfigStore(data={"settings": settings})
+    ids, id = recordids(config)
+    base = Base(ids, config["name"], config["language"], len(ids)>1, dict(config), store, template, updated)
+    if stream is not None:
+        base.write(stream, compact)
+        return None
+    return base.serialize(compact)
+
+def buildtimestamp():
+    return datetime.datetime.now().astimezone().replace(microsecond=0).isoformat()
+
+def buildparallel(configs, store, template, updated, jobs, compact=False):
+    """
+    Build records over a process pool; returns (output path, size report) in
+    record order. Stage timings of the workers are added to this process's timer.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    if jobs<1:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, max(len(configs), 1))
+    chunksize = max(1, len(configs)//(jobs*4))
+    with ProcessPoolExecutor(jobs, initializer=initworker, initargs=(store, template.source(), updated, compact, timing.timer.enabled, timing.timer.depth)) as pool:
+        built = []
+        for output, sizes, events in pool.map(buildoutput, configs, chunksize=chunksize):
+            timing.timer.events += events
+            built.append((output, sizes))
+        return built
+
+def buildoutput(config):
+    base = buildrecord(config)
+    return base.output, base.sizes, timing.timer.drain()
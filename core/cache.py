@@ -0,0 +1,144 @@
+import os, json, sqlite3, hashlib
+from .renderer import version as rendererversion
+
+# Persistent render cache: one SQLite file of rendered records, keyed by the
+# canonical digest of the style (without <updated>), the output format and
+# the digest of the normalized CSL-JSON item. Entries carry a use counter for
+# least-recently-used eviction once the file exceeds its size limit. The file
+# records the renderer version (SQLite user_version) its entries were rendered
+# with, and is emptied when opened by another version.
+
+schema = """
+CREATE TABLE IF NOT EXISTS entries (
+    style TEXT NOT NULL,
+    format TEXT NOT NULL,
+    item TEXT NOT NULL,
+    record TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    used INTEGER NOT NULL,
+    PRIMARY KEY (style, format, item)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_used ON entries (used);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+def itemdigest(item):
+    return hashlib.sha256(json.dumps(item, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+class RenderCache:
+    default_path = os.path.dirname(os.path.abspath(__file__))+"/../.cache/render-cache.sqlite"
+
+    # Items looked up per query
+    batch = 500
+
+    def __init__(self, path=None, limit=256*1024*1024):
+        self.path = path if path is not None else self.default_path
+        self.limit = limit
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+
+        # Several build workers can share the file
+        self.connection = sqlite3.connect(self.path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(schema)
+        with self.connection:
+            if self.connection.execute("PRAGMA user_version").fetchone()[0]!=rendererversion:
+                self.connection.execute("DELETE FROM entries")
+                self.connection.execute("PRAGMA user_version=%d" % rendererversion)
+
+        # Lookups of this instance
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def clock(self):
+        row = self.connection.execute("SELECT MAX(used) FROM entries").fetchone()
+        return (row[0] or 0)+1
+
+    def records(self, renderer, items):
+        """
+        renderer.record() of every normalized item, rendering only the items
+        not cached yet for this style and format
+        """
+        style = renderer.canonicaldigest()
+        format = renderer.format
+        digests = [itemdigest(item) for item in items]
+        found = {}
+        for i in range(0, len(digests), self.batch):
+            chunk = list(set(digests[i:i+self.batch]))
+            query = "SELECT item, record FROM entries WHERE style=? AND format=? AND item IN ("+",".join(["?"]*len(chunk))+")"
+            for item, record in self.connection.execute(query, [style, format]+chunk):
+                found[item] = record
+
+        out = []
+        new = {}
+        for item, digest in zip(items, digests):
+            if digest in found:
+                self.hits += 1
+                out.append(tuple(json.loads(found[digest])))
+                continue
+            if digest not in new:
+                self.misses += 1
+                new[digest] = renderer.record(item)
+            out.append(new[digest])
+
+        clock = self.clock()
+        with self.connection:
+            self.connection.executemany("UPDATE entries SET used=? WHERE style=? AND format=? AND item=?", [(clock, style, format, digest) for digest in found])
+            rows = []
+            for digest, record in new.items():
+                data = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+                rows.append((style, format, digest, data, len(data.encode("utf-8"))+len(digest), clock))
+            self.connection.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.count("hits", sum(1 for digest in digests if digest in found))
+            self.count("misses", len(new))
+        if new:
+            self.evict()
+        return out
+
+    def count(self, name, value):
+        self.connection.execute("INSERT INTO counters VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value=value+excluded.value", (name, value))
+
+    def size(self):
+        return self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def evict(self):
+        """
+        Drop the least recently used entries until the cache is back to 90% of its limit
+        """
+        size = self.size()
+        if size<=self.limit:
+            return 0
+        target = size-self.limit*9//10
+        removed = 0
+        freed = 0
+        with self.connection:
+            rows = self.connection.execute("SELECT style, format, item, size FROM entries ORDER BY used")
+            victims = []
+            for style, format, item, entrysize in rows:
+                if freed>=target:
+                    break
+                victims.append((style, format, item))
+                freed += entrysize
+            self.connection.executemany("DELETE FROM entries WHERE style=? AND format=? AND item=?", victims)
+            removed = len(victims)
+            self.count("evicted", removed)
+        self.evicted += removed
+        return removed
+
+    def stats(self):
+        """
+        Counters of this instance, totals over all runs, and the cache size
+        """
+        totals = dict(self.connection.execute("SELECT name, value FROM counters").fetchall())
+        entries = self.connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "evicted": self.evicted, "total hits": totals.get("hits", 0), "total misses": totals.get("misses", 0), "total evicted": totals.get("evicted", 0), "entries": entries, "bytes": self.size(), "limit": self.limit}
+
+    def clear(self):
+        with self.connection:
+            self.connection.execute("DELETE FROM entries")
+            self.connection.execute("DELETE FROM counters")
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,144 @@
+from .renderer import Renderer, normalize
+
+# Document-level citations: clusters in document order, each cite getting its
+# CSL position (first, subsequent, ibid, ibid-with-locator) from the cites
+# before it. Disambiguation is off in the generated styles, so the output of a
+# cluster depends only on its own cites and their positions: after an edit the
+# positions are recomputed in one pass and only the clusters whose position
+# signature changed (or that were edited) are rendered again.
+
+class Cluster:
+    __slots__ = ["id", "cites", "positions", "text"]
+
+    def __init__(self, id, cites):
+        self.id = id
+        self.cites = cites
+        self.positions = None
+        self.text = None
+
+class CitationDocument:
+    def __init__(self, renderer, items=None):
+        self.renderer = renderer if isinstance(renderer, Renderer) else Renderer.load(renderer)
+        self.items = {}
+        self.clusters = []
+        self.counter = 0
+
+        # Clusters rendered by the last edit, and since the document was created
+        self.rendered = 0
+        self.total = 0
+        if items is not None:
+            self.additems(items)
+
+    def additems(self, items):
+        """
+        Add or replace items; clusters citing a replaced item are rendered again
+        """
+        changed = set()
+        for item in items:
+            id = str(item["id"])
+            if id in self.items:
+                changed.add(id)
+            self.items[id] = normalize(item)
+        for cluster in self.clusters:
+            if any(cite["id"] in changed for cite in cluster.cites):
+                cluster.text = None
+        return self.refresh() if changed else 0
+
+    def cites(self, cites):
+        """
+        Cites as dicts with "id" and optional "locator" and "label"; plain ids are accepted
+        """
+        out = []
+        for cite in cites:
+            cite = {"id": cite} if isinstance(cite, str) else dict(cite)
+            cite["id"] = str(cite["id"])
+            if cite["id"] not in self.items:
+                raise KeyError("No item with id '"+cite["id"]+"' in the document")
+            out.append(cite)
+        return out
+
+    # Edits: each returns the number of clusters rendered again
+    def insert(self, index, cites, id=None):
+        if id is None:
+            self.counter += 1
+            id = "cluster-"+str(self.counter)
+        self.clusters.insert(index, Cluster(id, self.cites(cites)))
+        return self.refresh()
+
+    def append(self, cites, id=None):
+        return self.insert(len(self.clusters), cites, id)
+
+    def extend(self, clusters):
+        """
+        Append many clusters with a single refresh
+        """
+        for cites in clusters:
+            self.counter += 1
+            self.clusters.append(Cluster("cluster-"+str(self.counter), self.cites(cites)))
+        return self.refresh()
+
+    def update(self, index, cites):
+        cluster = self.clusters[index]
+        cluster.cites = self.cites(cites)
+        cluster.positions = None
+        return self.refresh()
+
+    def delete(self, index):
+        del self.clusters[index]
+        return self.refresh()
+
+    def move(self, source, destination):
+        cluster = self.clusters.pop(source)
+        self.clusters.insert(destination, cluster)
+        return self.refresh()
+
+    def index(self, id):
+        for i, cluster in enumerate(self.clusters):
+            if cluster.id==id:
+                return i
+        raise KeyError("No cluster with id '"+id+"'")
+
+    def positions(self):
+        """
+        Position of every cite, cluster by cluster
+        """
+        seen = set()
+        previous = None
+        previouscluster = None
+        out = []
+        for cluster in self.clusters:
+            positions = []
+            for i, cite in enumerate(cluster.cites):
+                id = cite["id"]
+                locator = cite.get("locator", None)
+                if id not in seen:
+                    position = "first"
+                elif previous is not None and previous["id"]==id and (i>0 or len(previouscluster.cites)==1):
+                    if not locator:
+                        position = "ibid" if not previous.get("locator", None) else "subsequent"
+                    else:
+                        position = "ibid" if locator==previous.get("locator", None) else "ibid-with-locator"
+                else:
+                    position = "subsequent"
+                seen.add(id)
+                positions.append(position)
+                previous = cite
+            previouscluster = cluster
+            out.append(tuple(positions))
+        return out
+
+    def refresh(self):
+        rendered = 0
+        renderer = self.renderer
+        for cluster, positions in zip(self.clusters, self.positions()):
+            if cluster.positions==positions and cluster.text is not None:
+                continue
+            cluster.positions = positions
+            cluster.text = renderer.cluster([dict(cite, item=self.items[cite["id"]], position=position) for cite, position in zip(cluster.cites, positions)])
+            rendered += 1
+        self.rendered = rendered
+        self.total += rendered
+        return rendered
+
+    def output(self):
+        return [cluster.text for cluster in self.clusters]
@@ -0,0 +1,243 @@
+import re, unicodedata
+
+# Collation keys for mixed Japanese/English bibliographies.
+#
+# Kana readings (name-kana) sort in gojūon order with the JIS X 4061
+# conventions: voicing and small kana are secondary differences, katakana
+# reads as hiragana, and the long vowel mark counts as the vowel it extends.
+# Other strings sort accent- and case-insensitively. Every key is a tuple
+# (empty, primary, secondary) so a whole sort is one tuple comparison per pair,
+# and empty values sort last as in CSL.
+
+readings = ["name-kana"]
+
+vowels = {}
+for vowel, row in [("あ", "あかさたなはまやらわ"), ("い", "いきしちにひみりゐ"), ("う", "うくすつぬふむゆる"), ("え", "えけせてねへめれゑ"), ("お", "おこそとのほもよろを"), ("ん", "ん")]:
+    for kana in row:
+        vowels[kana] = vowel
+
+small = {"ぁ": "あ", "ぃ": "い", "ぅ": "う", "ぇ": "え", "ぉ": "お", "っ": "つ", "ゃ": "や", "ゅ": "ゆ", "ょ": "よ", "ゎ": "わ", "ゕ": "か", "ゖ": "け"}
+
+def kanaweights(char):
+    """
+    (base kana, secondary weight) of one hiragana: small 0, plain 1, voiced 2, semi-voiced 3
+    """
+    if char in small:
+        return small[char], "0"
+    decomposed = unicodedata.normalize("NFD", char)
+    if len(decomposed)==2 and decomposed[1]=="゙":
+        return decomposed[0], "2"
+    if len(decomposed)==2 and decomposed[1]=="゚":
+        return decomposed[0], "3"
+    return char, "1"
+
+# Katakana (and its iteration marks) to hiragana
+katakana = {code: code-0x60 for code in list(range(0x30a1, 0x30f7))+[0x30fd, 0x30fe]}
+
+def hiragana(text):
+    if text.isascii():
+        return text
+    return unicodedata.normalize("NFKC", text).translate(katakana)
+
+def kanakey(text):
+    """
+    (primary, secondary) for a kana reading: "がっこう" and "かつこう" share
+    the primary key and differ in the secondary one
+    """
+    primary = []
+    secondary = []
+    previous = None
+    for char in hiragana(text):
+        if char in "ゝゞ":
+            if previous is None:
+                continue
+            base, weight = previous[0], "2" if char=="ゞ" else "1"
+        elif char=="ー":
+            if previous is None:
+                continue
+            base, weight = vowels.get(previous[0], previous[0]), "1"
+        elif "ぁ"<=char<="ゖ":
+            base, weight = kanaweights(char)
+        elif char.isalnum():
+            base, weight = latin(char) or char, "1"
+        else:
+            # Spaces, middle dots and punctuation are ignored
+            continue
+        primary.append(base)
+        secondary.append(weight)
+        previous = (base, weight)
+    return "".join(primary), "".join(secondary)
+
+def latin(text):
+    """
+    Case- and accent-insensitive form of a Latin string ("Ōno" -> "ono")
+    """
+    if text.isascii():
+        return text.casefold()
+    return "".join([c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c)]).casefold()
+
+def stringkey(text):
+    """
+    (primary, secondary) for any other string: accents and case are secondary,
+    kana compare as readings, and scripts keep their Unicode order (Latin, kana, kanji)
+    """
+    primary = latin(hiragana(text))
+    if re.search(r"[ぁ-ゟ]", primary):
+        primary = "".join([kanaweights(c)[0] if "ぁ"<=c<="ゖ" else c for c in primary])
+    return primary.strip(), text
+
+# Romanized Japanese names (Hepburn, with the kunrei spellings) read as kana
+romaji = {
+    "a": "あ", "i": "い", "u": "う", "e": "え", "o": "お",
+    "ka": "か", "ki": "き", "ku": "く", "ke": "け", "ko": "こ", "kya": "きゃ", "kyu": "きゅ", "kyo": "きょ",
+    "sa": "さ", "shi": "し", "si": "し", "su": "す", "se": "せ", "so": "そ", "sha": "しゃ", "shu": "しゅ", "sho": "しょ", "sya": "しゃ", "syu": "しゅ", "syo": "しょ",
+    "ta": "た", "chi": "ち", "ti": "ち", "tsu": "つ", "tu": "つ", "te": "て", "to": "と", "cha": "ちゃ", "chu": "ちゅ", "cho": "ちょ", "tya": "ちゃ", "tyu": "ちゅ", "tyo": "ちょ",
+    "na": "な", "ni": "に", "nu": "ぬ", "ne": "ね", "no": "の", "nya": "にゃ", "nyu": "にゅ", "nyo": "にょ",
+    "ha": "は", "hi": "ひ", "fu": "ふ", "hu": "ふ", "he": "へ", "ho": "ほ", "hya": "ひゃ", "hyu": "ひゅ", "hyo": "ひょ",
+    "ma": "ま", "mi": "み", "mu": "む", "me": "め", "mo": "も", "mya": "みゃ", "myu": "みゅ", "myo": "みょ",
+    "ya": "や", "yu": "ゆ", "yo": "よ",
+    "ra": "ら", "ri": "り", "ru": "る", "re": "れ", "ro": "ろ", "rya": "りゃ", "ryu": "りゅ", "ryo": "りょ",
+    "wa": "わ", "wo": "を",
+    "ga": "が", "gi": "ぎ", "gu": "ぐ", "ge": "げ", "go": "ご", "gya": "ぎゃ", "gyu": "ぎゅ", "gyo": "ぎょ",
+    "za": "ざ", "ji": "じ", "zi": "じ", "zu": "ず", "ze": "ぜ", "zo": "ぞ", "ja": "じゃ", "ju": "じゅ", "jo": "じょ", "zya": "じゃ", "zyu": "じゅ", "zyo": "じょ",
+    "da": "だ", "de": "で", "do": "ど",
+    "ba": "ば", "bi": "び", "bu": "ぶ", "be": "べ", "bo": "ぼ", "bya": "びゃ", "byu": "びゅ", "byo": "びょ",
+    "pa": "ぱ", "pi": "ぴ", "pu": "ぷ", "pe": "ぺ", "po": "ぽ", "pya": "ぴゃ", "pyu": "ぴゅ", "pyo": "ぴょ",
+}
+macrons = {"ā": "aa", "ī": "ii", "ū": "uu", "ē": "ei", "ō": "ou", "â": "aa", "î": "ii", "û": "uu", "ê": "ei", "ô": "ou"}
+
+def romajikana(text):
+    """
+    Kana reading of a romanized name ("Satō Hanako" -> "さとうはなこ"), or ""
+    when the text is not Hepburn/kunrei romaji
+    """
+    text = "".join([macrons.get(c, c) for c in text.lower()])
+    text = re.sub(r"[\s'’\-.]", lambda m: "'" if m.group(0) in "'’" else "", text)
+    out = []
+    i = 0
+    while i<len(text):
+        if text[i]=="'":
+            i += 1
+            continue
+        # Doubled consonant (and "tch"): sokuon
+        if i+1<len(text) and text[i] not in "aeioun'" and (text[i]==text[i+1] or text[i:i+3]=="tch"):
+            out.append("っ")
+            i += 1
+            continue
+        for size in [3, 2, 1]:
+            if text[i:i+size] in romaji:
+                out.append(romaji[text[i:i+size]])
+                i += size
+                break
+        else:
+            # Syllabic n (or m before b, m and p)
+            if text[i]=="n" or (text[i]=="m" and text[i+1:i+2] in ["b", "m", "p"]):
+                out.append("ん")
+                i += 1
+            else:
+                return ""
+    return "".join(out)
+
+# Readings
+kanapattern = re.compile(r"^[ぁ-ゟ゠-ヿｦ-ﾟ\s・ー]+$")
+latinpattern = re.compile(r"^[A-Za-zÀ-ɏ\s'’.\-]+$")
+
+def namekana(item, names=("author", "editor", "translator")):
+    """
+    Reading of the first name of an item: its name-kana variable, else the
+    name itself when written in kana, else the kana of a romanized name of a
+    Japanese item; "" when none applies (kanji names without a reading and
+    non-Japanese items), which sorts those items after the others
+    """
+    for variable in readings:
+        value = item.get(variable, "")
+        if isinstance(value, str) and value.strip():
+            return value
+    for variable in names:
+        people = item.get(variable, None)
+        if not people:
+            continue
+        person = people[0]
+        name = person.get("literal", None) or " ".join([x for x in [person.get("family", ""), person.get("given", "")] if x])
+        if kanapattern.match(name):
+            return name
+        language = item.get("language", "")
+        if isinstance(language, str) and language.lower().startswith("ja") and latinpattern.match(name):
+            return romajikana(name)
+        return ""
+    return ""
+
+# Sorting on precomputed keys
+class Descending:
+    """
+    Reversed ordering of a key component, for merges that need one key per row
+    """
+    __slots__ = ["value"]
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value<self.value
+
+    def __eq__(self, other):
+        return self.value==other.value
+
+    def __reduce__(self):
+        return (Descending, (self.value,))
+
+class Collator:
+    def __init__(self):
+        # Distinct strings are collated once per collator
+        self.cache = {}
+
+    def key(self, value, reading=False):
+        cached = self.cache.get((value, reading), None)
+        if cached is None:
+            if not value:
+                cached = (1, "", "")
+            else:
+                primary, secondary = kanakey(value) if reading else stringkey(value)
+                cached = (0, primary, secondary) if primary else (1, "", "")
+            self.cache[(value, reading)] = cached
+        return cached
+
+    def column(self, values, reading=False):
+        key = self.key
+        return [key(value, reading) for value in values]
+
+    def keys(self, columns, kinds):
+        """
+        One tuple key per row from columns of raw values; kinds tells which
+        columns hold kana readings
+        """
+        collated = [self.column(values, reading) for values, reading in zip(columns, kinds)]
+        return list(zip(*collated)) if collated else []
+
+    def order(self, keys, descending=None):
+        """
+        Indices of keys in sorted order; a descending column keeps its empty values last
+        """
+        order = list(range(len(keys)))
+        if not descending or not any(descending):
+            order.sort(key=keys.__getitem__)
+            return order
+        for k in reversed(range(len(descending))):
+            if descending[k]:
+                order.sort(key=lambda i: keys[i][k][1:], reverse=True)
+                order.sort(key=lambda i: keys[i][k][0])
+            else:
+                order.sort(key=lambda i: keys[i][k])
+        return order
+
+    def mergekey(self, key, descending=None):
+        """
+        Single comparable key equivalent to order(): descending components
+        are reversed, empty values stay last
+        """
+        if not descending or not any(descending):
+            return key
+        return tuple([(k[0], Descending(k[1:])) if d else k for k, d in zip(key, descending)])
+
+    def sort(self, items, columns, kinds, descending=None):
+        return [items[i] for i in self.order(self.keys(columns, kinds), descending)]
@@ -0,0 +1,208 @@
+import os, csv, json
+from .schema import compilesettings
+
+class ConfigStore:
+    """
+    Settings, Metadata and Creator sheets, read once and kept as dicts.
+    The source can be config.xlsx or an equivalent .json file, .toml file
+    or directory of CSV files (see convert).
+    """
+    default_path = os.path.dirname(os.path.abspath(__file__))+"/../input/config.xlsx"
+    instances = {}
+
+    def __init__(self, path=None, engine=None, data=None):
+        if data is not None:
+            # Already loaded (or built in memory): nothing to read
+            self.path = path if path is not None else "<memory>"
+        else:
+            self.path = path if path is not None else self.default_path
+            format = sourceformat(self.path)
+            if format=="xlsx" and (engine or os.environ.get("PYCSL_XLSX_ENGINE", "builtin"))=="pandas":
+                format = "xlsx-pandas"
+            data = readers[format](self.path)
+
+        # One dict per id: {variable: value}
+        self.settings = data["settings"]
+
+        # One dict per journal row
+        self.metadata = data.get("metadata", [])
+
+        self.creator = data.get("creator", {})
+
+        # Typed settings per id, compiled on first use (see core.schema)
+        self.compiled = {}
+
+    @classmethod
+    def load(cls, path=None):
+        """
+        Process-wide store: each source is parsed only once per path
+        """
+        key = os.path.abspath(path if path is not None else cls.default_path)
+        if key not in cls.instances:
+            cls.instances[key] = cls(key)
+        return cls.instances[key]
+
+    def getsettings(self, id):
+        if id not in self.settings:
+            raise KeyError("No Settings column for id '"+id+"' in "+self.path)
+        return self.settings[id]
+
+    def journal(self, id):
+        """
+        Typed, validated JournalSettings of an id
+        """
+        if id not in self.compiled:
+            self.compiled[id] = compilesettings(id, self.getsettings(id))
+        return self.compiled[id]
+
+    def records(self):
+        return [dict(record) for record in self.metadata]
+
+    def data(self):
+        return {"settings": self.settings, "metadata": self.metadata, "creator": self.creator}
+
+def sourceformat(path):
+    if os.path.isdir(path):
+        return "csv"
+    extension = os.path.splitext(path)[1].lower().replace(".", "")
+    if extension not in ["xlsx", "json", "toml"]:
+        raise ValueError("Unsupported config source '"+path+"' (expected .xlsx, .json, .toml or a directory of CSV files)")
+    return extension
+
+# Readers: each returns {"settings": {id: {variable: value}}, "metadata": [record], "creator": {key: value}}
+# with the values pandas gives for the workbook (str or bool, empty cells as "")
+def readxlsx(path):
+    from .xlsx import readsheets, records
+    sheets = readsheets(path, ["Settings", "Metadata", "Creator"])
+
+    columns, rows = records(sheets["Settings"])
+    settings = {id: {row["variable"]: row[id] for row in rows} for id in columns if id!="variable"}
+
+    metadata = records(sheets["Metadata"])[1]
+
+    # Creator is a two-column key/value sheet without a header row
+    creator = {row[0]: row[1] if len(row)>1 else "" for row in sheets["Creator"] if len(row)>0}
+    return {"settings": settings, "metadata": metadata, "creator": creator}
+
+def readxlsxpandas(path):
+    import pandas as pd
+    sheets = pd.read_excel(path, sheet_name=["Settings", "Metadata", "Creator"])
+
+    df = sheets["Settings"].fillna("")
+    variables = list(df["variable"])
+    settings = {id: dict(zip(variables, df[id])) for id in df.columns if id!="variable"}
+
+    metadata = sheets["Metadata"].fillna("").to_dict(orient="records")
+
+    # Creator is a two-column key/value sheet without a header row
+    df = sheets["Creator"].fillna("")
+    creator = {df.columns[0]: df.columns[1]}
+    creator.update({row[0]: row[1] for row in df.values.tolist()})
+    return {"settings": settings, "metadata": metadata, "creator": creator}
+
+def readjson(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def readtoml(path):
+    try:
+        import tomllib
+    except ImportError:
+        import tomli as tomllib
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+def readcsv(path):
+    settings = {}
+    rows = readcsvrows(os.path.join(path, "Settings.csv"))
+    ids = rows[0][1:]
+    for i, id in enumerate(ids):
+        settings[id] = {row[0]: csvvalue(row[i+1]) for row in rows[1:]}
+
+    rows = readcsvrows(os.path.join(path, "Metadata.csv"))
+    metadata = [{k: csvvalue(v) for k, v in zip(rows[0], row)} for row in rows[1:]]
+
+    rows = readcsvrows(os.path.join(path, "Creator.csv"))
+    creator = {row[0]: csvvalue(row[1]) for row in rows}
+    return {"settings": settings, "metadata": metadata, "creator": creator}
+
+def readcsvrows(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        return list(csv.reader(f))
+
+# CSV cells follow the spreadsheet conventions: booleans are TRUE/FALSE and a
+# leading apostrophe marks text, so a string "TRUE" is written 'TRUE
+def csvvalue(cell):
+    if cell=="TRUE":
+        return True
+    if cell=="FALSE":
+        return False
+    if cell.startswith("'"):
+        return cell[1:]
+    return cell
+
+def csvcell(value):
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    value = str(value)
+    if value in ["TRUE", "FALSE"] or value.startswith("'"):
+        return "'"+value
+    return value
+
+# Writers (one-way conversion from any source)
+def writejson(data, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+        f.write("\n")
+
+def writetoml(data, path):
+    def value(v):
+        if isinstance(v, bool):
+            return "true" if v else "false"
+        return json.dumps(str(v), ensure_ascii=False)
+    lines = []
+    for id in data["settings"]:
+        lines.append("[settings."+json.dumps(id, ensure_ascii=False)+"]")
+        lines += [json.dumps(k, ensure_ascii=False)+" = "+value(v) for k, v in data["settings"][id].items()]
+        lines.append("")
+    for record in data["metadata"]:
+        lines.append("[[metadata]]")
+        lines += [json.dumps(k, ensure_ascii=False)+" = "+value(v) for k, v in record.items()]
+        lines.append("")
+    lines.append("[creator]")
+    lines += [json.dumps(k, ensure_ascii=False)+" = "+value(v) for k, v in data["creator"].items()]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines)+"\n")
+
+def writecsv(data, path):
+    os.makedirs(path, exist_ok=True)
+    ids = list(data["settings"].keys())
+    variables = list(data["settings"][ids[0]].keys()) if ids else []
+    rows = [["variable"]+ids]
+    rows += [[variable]+[csvcell(data["settings"][id].get(variable, "")) for id in ids] for variable in variables]
+    writecsvrows(os.path.join(path, "Settings.csv"), rows)
+
+    columns = list(data["metadata"][0].keys()) if data["metadata"] else []
+    rows = [columns]+[[csvcell(record.get(k, "")) for k in columns] for record in data["metadata"]]
+    writecsvrows(os.path.join(path, "Metadata.csv"), rows)
+
+    writecsvrows(os.path.join(path, "Creator.csv"), [[k, csvcell(v)] for k, v in data["creator"].items()])
+
+def writecsvrows(path, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        csv.writer(f, lineterminator="\n").writerows(rows)
+
+def convert(source, destination):
+    """
+    Write the configuration of source (any supported format) to destination;
+    the format of destination follows its extension (a directory for CSV)
+    """
+    data = ConfigStore(source).data()
+    extension = os.path.splitext(destination)[1].lower().replace(".", "")
+    if extension=="xlsx":
+        raise ValueError("Conversion to .xlsx is not supported: config.xlsx stays the edited source")
+    writers.get(extension, writecsv)(data, destination)
+    return destination
+
+readers = {"xlsx": readxlsx, "xlsx-pandas": readxlsxpandas, "json": readjson, "toml": readtoml, "csv": readcsv}
+writers = {"json": writejson, "toml": writetoml}
@@ -0,0 +1,186 @@
+# Built-in locale terms for the renderer, used when a term is not defined in
+# the style's own <locale> elements. Subset of the CSL locale files covering
+# the terms, roles, locators and months the generated styles use.
+# {name: {form: (single, multiple)}}
+
+def terms(long, short=None, verb=None, verbshort=None, symbol=None):
+    forms = {"long": long}
+    if short is not None:
+        forms["short"] = short
+    if verb is not None:
+        forms["verb"] = verb
+    if verbshort is not None:
+        forms["verb-short"] = verbshort
+    if symbol is not None:
+        forms["symbol"] = symbol
+    return {form: forms[form] if isinstance(forms[form], tuple) else (forms[form], forms[form]) for form in forms}
+
+en = {
+    "accessed": terms("accessed"),
+    "and": terms("and", symbol="&"),
+    "and others": terms("and others"),
+    "anonymous": terms("anonymous", "anon."),
+    "at": terms("at"),
+    "by": terms("by"),
+    "circa": terms("circa", "c."),
+    "et-al": terms("et al."),
+    "forthcoming": terms("forthcoming"),
+    "from": terms("from"),
+    "ibid": terms("ibid."),
+    "in": terms("in"),
+    "letter": terms("letter"),
+    "no date": terms("no date", "n.d."),
+    "online": terms("online"),
+    "presented at": terms("presented at the"),
+    "retrieved": terms("retrieved"),
+    "version": terms("version"),
+    "open-quote": terms("“"),
+    "close-quote": terms("”"),
+    "open-inner-quote": terms("‘"),
+    "close-inner-quote": terms("’"),
+    "page-range-delimiter": terms("–"),
+    "ordinal": terms("th"),
+    "ordinal-01": terms("st"),
+    "ordinal-02": terms("nd"),
+    "ordinal-03": terms("rd"),
+    "ordinal-11": terms("th"),
+    "ordinal-12": terms("th"),
+    "ordinal-13": terms("th"),
+
+    # Locators and numbers
+    "book": terms(("book", "books"), ("bk.", "bks.")),
+    "chapter": terms(("chapter", "chapters"), ("chap.", "chaps.")),
+    "column": terms(("column", "columns"), ("col.", "cols.")),
+    "edition": terms(("edition", "editions"), ("ed.", "eds.")),
+    "figure": terms(("figure", "figures"), ("fig.", "figs.")),
+    "folio": terms(("folio", "folios"), ("fol.", "fols.")),
+    "issue": terms(("issue", "issues"), ("no.", "nos.")),
+    "line": terms(("line", "lines"), ("l.", "ll.")),
+    "note": terms(("note", "notes"), ("n.", "nn.")),
+    "number": terms(("number", "numbers"), ("no.", "nos.")),
+    "number-of-volumes": terms(("volume", "volumes"), ("vol.", "vols.")),
+    "opus": terms(("opus", "opera"), ("op.", "opp.")),
+    "page": terms(("page", "pages"), ("p.", "pp.")),
+    "paragraph": terms(("paragraph", "paragraphs"), ("para.", "paras."), symbol=("¶", "¶¶")),
+    "part": terms(("part", "parts"), ("pt.", "pts.")),
+    "section": terms(("section", "sections"), ("sec.", "secs."), symbol=("§", "§§")),
+    "sub verbo": terms(("sub verbo", "sub verbis"), ("s.v.", "s.vv.")),
+    "verse": terms(("verse", "verses"), ("v.", "vv.")),
+    "volume": terms(("volume", "volumes"), ("vol.", "vols.")),
+
+    # Roles
+    "container-author": terms(("author", "authors"), verb="by"),
+    "director": terms(("director", "directors"), ("dir.", "dirs."), "directed by", "dir."),
+    "editor": terms(("editor", "editors"), ("ed.", "eds."), "edited by", "ed."),
+    "editorial-director": terms(("editor", "editors"), ("ed.", "eds."), "edited by", "ed."),
+    "editortranslator": terms(("editor & translator", "editors & translators"), ("ed. & tran.", "eds. & trans."), "edited & translated by", "ed. & trans."),
+    "illustrator": terms(("illustrator", "illustrators"), ("ill.", "ills."), "illustrated by", "illus."),
+    "interviewer": terms(("interviewer", "interviewers"), verb="interview by"),
+    "recipient": terms(("recipient", "recipients"), verb="to"),
+    "reviewed-author": terms(("reviewed author", "reviewed authors"), verb="by"),
+    "translator": terms(("translator", "translators"), ("tran.", "trans."), "translated by", "trans."),
+}
+
+months = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December"]
+for i, month in enumerate(months):
+    en["month-%02d" % (i+1)] = terms(month, month[:3]+"." if len(month)>4 else month)
+
+ja = {
+    "accessed": terms("アクセス"),
+    "and": terms("・", symbol="・"),
+    "and others": terms("ほか"),
+    "et-al": terms("ほか"),
+    "in": terms(""),
+    "no date": terms("日付なし", "n.d."),
+    "open-quote": terms("「"),
+    "close-quote": terms("」"),
+    "open-inner-quote": terms("『"),
+    "close-inner-quote": terms("』"),
+    "page-range-delimiter": terms("–"),
+    "ordinal": terms(""),
+    "edition": terms("版"),
+    "issue": terms("号"),
+    "page": terms("頁", ("p.", "pp.")),
+    "volume": terms("巻"),
+    "chapter": terms("章"),
+    "section": terms("節"),
+    "editor": terms("編", "編", "編", "編"),
+    "translator": terms("訳", "訳", "訳", "訳"),
+    "editortranslator": terms("編訳", "編訳", "編訳", "編訳"),
+}
+for i in range(12):
+    ja["month-%02d" % (i+1)] = terms(str(i+1)+"月")
+
+zh = {
+    "accessed": terms("访问"),
+    "and": terms("和", symbol="&"),
+    "and others": terms("等"),
+    "et-al": terms("等"),
+    "in": terms("载"),
+    "no date": terms("无日期", "n.d."),
+    "open-quote": terms("「"),
+    "close-quote": terms("」"),
+    "open-inner-quote": terms("『"),
+    "close-inner-quote": terms("』"),
+    "page-range-delimiter": terms("–"),
+    "ordinal": terms(""),
+    "edition": terms("版"),
+    "issue": terms("期"),
+    "page": terms("页"),
+    "volume": terms("卷"),
+    "chapter": terms("章"),
+    "section": terms("节"),
+    "editor": terms("编", "编", "编", "编"),
+    "translator": terms("译", "译", "译", "译"),
+    "editortranslator": terms("编译", "编译", "编译", "编译"),
+}
+for i in range(12):
+    zh["month-%02d" % (i+1)] = terms(str(i+1)+"月")
+
+ko = {
+    "accessed": terms("접속"),
+    "and": terms("와", symbol="&"),
+    "and others": terms("외"),
+    "et-al": terms("외"),
+    "in": terms(""),
+    "no date": terms("날짜 없음", "n.d."),
+    "open-quote": terms("“"),
+    "close-quote": terms("”"),
+    "open-inner-quote": terms("‘"),
+    "close-inner-quote": terms("’"),
+    "page-range-delimiter": terms("–"),
+    "ordinal": terms(""),
+    "edition": terms("판"),
+    "issue": terms("호"),
+    "page": terms("쪽"),
+    "volume": terms("권"),
+    "chapter": terms("장"),
+    "section": terms("절"),
+    "editor": terms("편", "편", "편", "편"),
+    "translator": terms("역", "역", "역", "역"),
+    "editortranslator": terms("편역", "편역", "편역", "편역"),
+}
+for i in range(12):
+    ko["month-%02d" % (i+1)] = terms(str(i+1)+"월")
+
+builtin = {"en": en, "ja": ja, "zh": zh, "ko": ko}
+
+# Localized date formats: (date-part name, form, prefix, suffix)
+dates = {
+    "en": {
+        "text": [("month", "long", "", " "), ("day", "numeric", "", ", "), ("year", "long", "", "")],
+        "numeric": [("month", "numeric", "", "/"), ("day", "numeric", "", "/"), ("year", "long", "", "")],
+    },
+    "ja": {
+        "text": [("year", "long", "", "年"), ("month", "numeric", "", "月"), ("day", "numeric", "", "日")],
+        "numeric": [("year", "long", "", "/"), ("month", "numeric", "", "/"), ("day", "numeric", "", "")],
+    },
+    "zh": {
+        "text": [("year", "long", "", "年"), ("month", "numeric", "", "月"), ("day", "numeric", "", "日")],
+        "numeric": [("year", "long", "", "/"), ("month", "numeric", "", "/"), ("day", "numeric", "", "")],
+    },
+    "ko": {
+        "text": [("year", "long", "", "년"), ("month", "numeric", " ", "월"), ("day", "numeric", " ", "일")],
+        "numeric": [("year", "long", "", "."), ("month", "numeric", " ", "."), ("day", "numeric", " ", ".")],
+    },
+}
@@ -0,0 +1,120 @@
+import copy
+from collections.abc import Mapping
+from .xpaths import xpaths
+
+class MacroClones:
+    """
+    Copy-on-write language twins of the macros of a multilingual style.
+
+    A macro is cloned (as "<name>-ja", "<name>-zh", ... right after the
+    original, with its macro calls renamed to the twins of the same language)
+    only when a Processor asks for it, for every language at once: each
+    localized Processor edits its own clones, and the English Processor gets
+    the original after the clones have kept the state the localized layouts
+    must see. finish() then drops the clones that ended up identical to their
+    original and points the localized layouts at the shared macros instead.
+    """
+    def __init__(self, macros, tools, clone=copy.deepcopy, languages=("ja",)):
+        self.originals = macros
+        self.tools = tools
+        self.copy = clone
+        self.suffixes = ["-"+x for x in languages]
+        self.clones = {suffix: {} for suffix in self.suffixes}
+
+    def clone(self, name, suffixes=None):
+        suffixes = suffixes if suffixes is not None else [x for x in self.suffixes if name not in self.clones[x]]
+        macro = self.originals[name]
+        for suffix in suffixes:
+            jm = self.copy(macro)
+            jm.attrib["name"] = name+suffix
+            for m in xpaths.all(".//macro-calls", jm):
+                m.attrib["macro"] = m.attrib["macro"]+suffix
+            self.tools.insertafter(macro, jm)
+            self.clones[suffix][name] = jm
+
+    def localized(self, language):
+        return CloneView(self, "-"+language)
+
+    def english(self):
+        return CloneView(self, None)
+
+    def same(self, clone, original, suffix, root=True):
+        """
+        Whether a clone still matches its original, reading its calls to
+        twins as the shared ones and ignoring its name
+        """
+        if clone.tag!=original.tag or clone.text!=original.text or (not root and clone.tail!=original.tail) or len(clone)!=len(original):
+            return False
+        a = dict(clone.attrib)
+        b = dict(original.attrib)
+        if root:
+            a.pop("name")
+            b.pop("name")
+        elif "macro" in a and a["macro"].endswith(suffix):
+            a["macro"] = a["macro"][:-len(suffix)]
+        if a!=b:
+            return False
+        return all(self.same(x, y, suffix, False) for x, y in zip(clone, original))
+
+    def calls(self, macro):
+        return set([call.attrib["macro"] for call in xpaths.all(".//macro-calls", macro)])
+
+    def finish(self, layouts):
+        """
+        For each language (layouts: its localized layouts by language), keep
+        the clones that differ from their original, plus every macro that
+        calls a kept clone (cloned now if needed); the rest of the localized
+        layouts and clones call the shared macros. Returns the kept clones
+        by language and name.
+        """
+        kept = {}
+        for suffix in self.suffixes:
+            clones = self.clones[suffix]
+            kept[suffix] = set([name for name in clones if not self.same(clones[name], self.originals[name], suffix)])
+
+            # Callers of kept clones need twins too, up the call graph
+            changed = True
+            while changed:
+                changed = False
+                for name, macro in self.originals.items():
+                    if name in kept[suffix]:
+                        continue
+                    source = clones.get(name, macro)
+                    called = set([x[:-len(suffix)] if x.endswith(suffix) else x for x in self.calls(source)])
+                    if called & kept[suffix]:
+                        if name not in clones:
+                            self.clone(name, [suffix])
+                        kept[suffix].add(name)
+                        changed = True
+
+            for name in list(clones.keys()):
+                if name not in kept[suffix]:
+                    clone = clones.pop(name)
+                    clone.getparent().remove(clone)
+
+            # Calls to dropped clones go to the shared macro
+            for element in layouts[suffix[1:]]+[clones[name] for name in kept[suffix]]:
+                for call in xpaths.all(".//macro-calls", element):
+                    value = call.attrib["macro"]
+                    if value.endswith(suffix) and value[:-len(suffix)] not in kept[suffix]:
+                        call.attrib["macro"] = value[:-len(suffix)]
+        return {suffix[1:]: dict(self.clones[suffix]) for suffix in self.suffixes}
+
+class CloneView(Mapping):
+    """
+    Macros as seen by one Processor: asking for a macro is taken as the
+    intent to edit it
+    """
+    def __init__(self, clones, suffix):
+        self.clones = clones
+        self.suffix = suffix
+
+    def __getitem__(self, name):
+        self.clones.clone(name)
+        return self.clones.originals[name] if self.suffix is None else self.clones.clones[self.suffix][name]
+
+    def __iter__(self):
+        return iter(self.clones.originals)
+
+    def __len__(self):
+        return len(self.clones.originals)
@@ -0,0 +1,51 @@
+import os, json, glob, hashlib
+from . import __version__
+
+class Manifest:
+    """
+    Digests of everything an output style was generated from, stored next to the outputs
+    """
+    filename = "build-manifest.json"
+
+    def __init__(self, directory="output"):
+        self.path = os.path.join(directory, self.filename)
+        self.entries = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                self.entries = json.load(f).get("styles", {})
+
+    @staticmethod
+    def generatordigest():
+        h = hashlib.sha256(__version__.encode("utf-8"))
+        for source in sorted(glob.glob(os.path.dirname(os.path.abspath(__file__))+"/*.py")):
+            with open(source, "rb") as f:
+                h.update(f.read())
+        return h.hexdigest()
+
+    @staticmethod
+    def digest(templatedigest, generatordigest, config, settings, options=None):
+        data = {
+            "template": templatedigest,
+            "generator": generatordigest,
+            "metadata": config,
+            "settings": settings,
+        }
+        # Output options only enter the digest when set, so default builds keep their digests
+        if options:
+            data["options"] = options
+        data = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def uptodate(self, id, output, digest):
+        return self.entries.get(id, {}).get("digest", None)==digest and os.path.exists(output)
+
+    def update(self, id, output, digest):
+        self.entries[id] = {"output": output, "digest": digest}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path+".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": __version__, "styles": self.entries}, f, indent=2, sort_keys=True, ensure_ascii=False)
+            f.write("\n")
+        os.replace(tmp, self.path)
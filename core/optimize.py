@@ -0,0 +1,89 @@
+import copy
+from lxml import etree as ET
+
+# Release optimization of a generated style: macros not reachable from the
+# citation and bibliography layouts or sort keys are removed, as are empty
+# prefix/suffix attributes and comments, and the style is serialized without
+# indentation.
+
+csl = "{http://purl.org/net/xbiblio/csl}"
+
+def calls(element):
+    """
+    Names of the macros an element calls (text/@macro and sort key/@macro)
+    """
+    return [x.attrib["macro"] for x in element.iter(csl+"text", csl+"key") if "macro" in x.attrib]
+
+def reachable(root):
+    macros = {macro.attrib["name"]: macro for macro in root.iterfind(csl+"macro")}
+    pending = []
+    for section in ["citation", "bibliography"]:
+        for element in root.iterfind(csl+section):
+            pending += calls(element)
+    seen = set()
+    while pending:
+        name = pending.pop()
+        if name in seen or name not in macros:
+            continue
+        seen.add(name)
+        pending += calls(macros[name])
+    return seen
+
+def shake(root):
+    """
+    Remove unreachable macros; returns their names
+    """
+    used = reachable(root)
+    removed = []
+    for macro in list(root.iterfind(csl+"macro")):
+        if macro.attrib["name"] not in used:
+            removed.append(macro.attrib["name"])
+            root.remove(macro)
+    return removed
+
+def prune(root):
+    """
+    Remove no-op attributes (empty prefix and suffix) and comments; returns how many
+    """
+    count = 0
+    for element in root.iter():
+        if not isinstance(element.tag, str):
+            continue
+        for name in ["prefix", "suffix"]:
+            if element.attrib.get(name, None)=="":
+                del element.attrib[name]
+                count += 1
+    for comment in list(root.iter(ET.Comment)):
+        parent = comment.getparent()
+        if comment.tail:
+            previous = comment.getprevious()
+            if previous is not None:
+                previous.tail = (previous.tail or "")+comment.tail
+            else:
+                parent.text = (parent.text or "")+comment.tail
+        parent.remove(comment)
+        count += 1
+    return count
+
+def compact(tree):
+    """
+    Optimized, unindented serialization of a style tree (left unchanged),
+    with a size report
+    """
+    tree = copy.deepcopy(tree)
+    root = tree.getroot()
+    macros = len(root.findall(csl+"macro"))
+    removed = shake(root)
+    pruned = prune(root)
+    data = ET.tostring(tree, pretty_print=False, xml_declaration=True, encoding="UTF-8")
+    return data, {"macros": macros, "removed macros": len(removed), "removed attributes": pruned, "bytes": len(data)}
+
+def report(rows):
+    """
+    Size table: rows of (id, bytes before, compact report)
+    """
+    lines = ["%-16s %9s %9s %7s %13s" % ("style", "bytes", "compact", "saved", "macros")]
+    for id, before, sizes in rows:
+        saved = 100.0*(before-sizes["bytes"])/before if before else 0
+        lines.append("%-16s %9d %9d %6.1f%% %6d -> %d" % (id, before, sizes["bytes"], saved, sizes["macros"], sizes["macros"]-sizes["removed macros"]))
+    return "\n".join(lines)
@@ -0,0 +1,130 @@
+import os, json, glob, hashlib
+from lxml import etree as ET
+from . import __version__
+from .archive import member, ZipStream, gzipped, ungzipped
+from .base import idlanguage
+
+# Release packaging of the built styles: a JSON catalogue index (id, title,
+# language, locale, parent template, updated, size, SHA-256), a .gz copy of
+# every style and one zip bundle of the styles and the index. Each style is
+# read, hashed and compressed once, in one pass over a process pool; its .gz
+# copy and its bundle member share the same deflate data. Files whose size and
+# mtime match the package manifest of the last run are not read again: their
+# entry is reused and their bundle member taken back from their .gz copy.
+
+csl = "{http://purl.org/net/xbiblio/csl}"
+manifestname = "package-manifest.json"
+indexname = "index.json"
+bundlename = "styles.zip"
+
+def describe(data):
+    """
+    Catalogue fields read from the <info> of a serialized style
+    """
+    root = ET.fromstring(data)
+    info = root.find(csl+"info")
+    template = info.find(csl+"link[@rel='self']")
+    return {
+        "title": info.findtext(csl+"title"),
+        "uri": info.findtext(csl+"id"),
+        "locale": root.attrib.get("default-locale", None),
+        "template": template.attrib["href"] if template is not None else None,
+        "updated": info.findtext(csl+"updated"),
+    }
+
+def styleid(path):
+    """
+    Output id of a built style: output/chicago-author-date-kyosei-ja.csl is kyosei-ja
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    return name[len("chicago-author-date-"):] if name.startswith("chicago-author-date-") else name
+
+def packfile(task):
+    """
+    (index entry, bundle member, whether the file was read, mtime) of one style;
+    task is (path, destination, the file's manifest record of the last run)
+    """
+    path, destination, previous = task
+    file = os.path.basename(path)
+    status = os.stat(path)
+    gzpath = os.path.join(destination, file+".gz")
+    if previous is not None and previous["size"]==status.st_size and previous["mtime"]==status.st_mtime_ns and os.path.exists(gzpath):
+        with open(gzpath, "rb") as f:
+            entry = ungzipped(file, f.read())
+        if entry is not None and entry[3]==status.st_size:
+            return previous["entry"], entry, False, status.st_mtime_ns
+
+    with open(path, "rb") as f:
+        data = f.read()
+    entry = member(file, data)
+    compressed = gzipped(entry)
+    tmp = gzpath+".tmp"
+    with open(tmp, "wb") as f:
+        f.write(compressed)
+    os.replace(tmp, gzpath)
+    id = styleid(path)
+    record = dict({"id": id, "file": file, "language": idlanguage(id) if "-" in id else None}, **describe(data))
+    record.update({"size": len(data), "sha256": hashlib.sha256(data).hexdigest(), "gzip": {"file": file+".gz", "size": len(compressed)}})
+    return record, entry, True, status.st_mtime_ns
+
+def writeatomic(path, data):
+    tmp = path+".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def package(directory="output", destination="dist", jobs=1, baseurl=None):
+    """
+    Package every .csl of directory into destination; returns the index and
+    the number of styles read (the others were unchanged since the last run)
+    """
+    os.makedirs(destination, exist_ok=True)
+    paths = sorted(glob.glob(os.path.join(directory, "*.csl")))
+    manifestpath = os.path.join(destination, manifestname)
+    manifest = {}
+    if os.path.exists(manifestpath):
+        with open(manifestpath, encoding="utf-8") as f:
+            saved = json.load(f)
+        # Entries of another version may lack fields of this one
+        if saved.get("version", None)==__version__:
+            manifest = saved.get("files", {})
+    tasks = [(path, destination, manifest.get(os.path.basename(path), None)) for path in paths]
+
+    if jobs==1:
+        packed = [packfile(task) for task in tasks]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        if jobs<1:
+            jobs = os.cpu_count() or 1
+        jobs = min(jobs, max(len(tasks), 1))
+        with ProcessPoolExecutor(jobs) as pool:
+            packed = list(pool.map(packfile, tasks, chunksize=max(1, len(tasks)//(jobs*4))))
+
+    styles = []
+    files = {}
+    for record, entry, read, mtime in packed:
+        files[record["file"]] = {"size": record["size"], "mtime": mtime, "entry": record}
+        # The download URL is not part of the reused entry
+        styles.append(dict(record, url=baseurl.rstrip("/")+"/"+record["file"]) if baseurl else record)
+    index = {"version": __version__, "styles": sorted(styles, key=lambda x: x["id"])}
+    indexdata = (json.dumps(index, indent=2, ensure_ascii=False)+"\n").encode("utf-8")
+    writeatomic(os.path.join(destination, indexname), indexdata)
+
+    # Bundle: styles in id order, then the index
+    order = sorted(range(len(packed)), key=lambda i: packed[i][0]["id"])
+    tmp = os.path.join(destination, bundlename+".tmp")
+    with open(tmp, "wb") as f:
+        bundle = ZipStream(f)
+        for i in order:
+            bundle.add(packed[i][1])
+        bundle.add(member(indexname, indexdata))
+        bundle.close()
+    os.replace(tmp, os.path.join(destination, bundlename))
+
+    # .gz copies of styles no longer built
+    for gzpath in glob.glob(os.path.join(destination, "*.csl.gz")):
+        if os.path.basename(gzpath)[:-len(".gz")] not in files:
+            os.remove(gzpath)
+
+    writeatomic(manifestpath, (json.dumps({"version": __version__, "files": files}, indent=2, ensure_ascii=False)+"\n").encode("utf-8"))
+    return index, len([x for x in packed if x[2]])
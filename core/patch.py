@@ -0,0 +1,196 @@
+import sys, copy
+from lxml import etree as ET
+
+# A generated style as the shared template plus the edits that turn the
+# template into it. Node handles are the preorder index of a template node,
+# or -k-1 for the k-th node the build created (shown as +k). Names and values
+# are interned, so patches of many styles share their strings. Operations,
+# in order:
+#   ("new", h, tag, attrib, text, tail)    create a node (not placed yet)
+#   ("comment", h, text, tail)             create a comment
+#   ("clone", h, t)                        create a childless copy of template node t
+#   ("children", h, (h, ...))              set the child list of a node: moves,
+#                                          inserts, clones and removals
+#   ("set", h, name, value), ("pop", h, name)
+#   ("attrib", h, {name: value})           all attributes, when their order changed
+#   ("text", h, value), ("tail", h, value)
+# Creations come first, so clones copy the unedited template node. The ops
+# are taken from the Base after its Processors ran, by comparing each node of
+# the built tree with the template node it was copied (or cloned) from; the
+# style becomes a tree again only when serialized.
+
+class StylePatch:
+    __slots__ = ["template", "id", "output", "ops"]
+
+    def __init__(self, template, ops, id=None, output=None):
+        self.template = template
+        self.ops = ops
+        self.id = id
+        self.output = output
+
+    def materialize(self):
+        """
+        Fresh tree: a copy of the template with the ops applied
+        """
+        tree = copy.deepcopy(self.template.master)
+        nodes = list(tree.getroot().iter())
+        created = {}
+        def node(h):
+            return nodes[h] if h>=0 else created[h]
+        for op in self.ops:
+            kind = op[0]
+            if kind=="new":
+                element = ET.Element(op[2])
+                for name, value in op[3].items():
+                    element.attrib[name] = value
+                element.text = op[4]
+                element.tail = op[5]
+                created[op[1]] = element
+            elif kind=="comment":
+                comment = ET.Comment(op[2])
+                comment.tail = op[3]
+                created[op[1]] = comment
+            elif kind=="clone":
+                source = nodes[op[2]]
+                if isinstance(source.tag, str):
+                    element = ET.Element(source.tag, dict(source.attrib))
+                else:
+                    element = ET.Comment(source.text)
+                element.text = source.text
+                element.tail = source.tail
+                created[op[1]] = element
+            elif kind=="children":
+                parent = node(op[1])
+                for child in list(parent):
+                    parent.remove(child)
+                for h in op[2]:
+                    parent.append(node(h))
+            elif kind=="set":
+                node(op[1]).attrib[op[2]] = op[3]
+            elif kind=="pop":
+                node(op[1]).attrib.pop(op[2])
+            elif kind=="attrib":
+                element = node(op[1])
+                element.attrib.clear()
+                for name, value in op[2].items():
+                    element.attrib[name] = value
+            elif kind=="text":
+                node(op[1]).text = op[2]
+            elif kind=="tail":
+                node(op[1]).tail = op[2]
+        return tree
+
+    def serialize(self, compact=False):
+        from .base import serializetree
+        return serializetree(self.materialize(), compact)[0]
+
+    def write(self, stream, compact=False):
+        stream.write(self.serialize(compact))
+
+    def summary(self):
+        """
+        Number of ops of each kind
+        """
+        counts = {}
+        for op in self.ops:
+            counts[op[0]] = counts.get(op[0], 0)+1
+        return counts
+
+    def describe(self):
+        """
+        The ops one per line, template nodes shown by path
+        """
+        paths = self.template.nodepaths()
+        def name(h):
+            return paths[h] if h>=0 else "+"+str(-h-1)
+        lines = []
+        for op in self.ops:
+            kind = op[0]
+            if kind=="new":
+                attrib = "".join([" "+localname(k)+"="+repr(v) for k, v in op[3].items()])
+                lines.append("new      "+name(op[1])+" <"+localname(op[2])+attrib+">"+(" "+repr(op[4]) if op[4] is not None else ""))
+            elif kind=="comment":
+                lines.append("comment  "+name(op[1])+" "+repr(op[2]))
+            elif kind=="clone":
+                lines.append("clone    "+name(op[1])+" of "+name(op[2]))
+            elif kind=="children":
+                lines.append("children "+name(op[1])+" = ["+", ".join(["#"+str(h) if h>=0 else name(h) for h in op[2]])+"]")
+            elif kind=="set":
+                lines.append("set      "+name(op[1])+" @"+localname(op[2])+" = "+repr(op[3]))
+            elif kind=="pop":
+                lines.append("pop      "+name(op[1])+" @"+localname(op[2]))
+            elif kind=="attrib":
+                lines.append("attrib   "+name(op[1])+" = "+repr({localname(k): v for k, v in op[2].items()}))
+            else:
+                lines.append("%-8s " % kind+name(op[1])+" = "+repr(op[2]))
+        return "\n".join(lines)
+
+def localname(name):
+    return name.split("}")[-1] if isinstance(name, str) else "comment"
+
+def diff(template, root, origin, derived=None):
+    """
+    Ops turning the template into the tree at root; origin maps each node
+    copied from the template to its template node, derived each node cloned
+    during the build to the template node its source came from
+    """
+    derived = derived if derived is not None else {}
+    index = template.nodeindex()
+    handles = {}
+    created = []
+    for element in root.iter():
+        source = origin.get(element, None)
+        if source is not None:
+            handles[element] = index[source]
+            continue
+        h = -len(created)-1
+        handles[element] = h
+        if element in derived:
+            created.append(("clone", h, index[derived[element]]))
+        elif isinstance(element.tag, str):
+            created.append(("new", h, intern(element.tag), {intern(k): intern(v) for k, v in element.attrib.items()}, intern(element.text), intern(element.tail)))
+        else:
+            created.append(("comment", h, intern(element.text), intern(element.tail)))
+
+    ops = []
+    for element in root.iter():
+        h = handles[element]
+        children = tuple([handles[child] for child in element])
+        source = origin.get(element, None)
+        if source is None:
+            source = derived.get(element, None)
+            if source is None:
+                if children:
+                    ops.append(("children", h, children))
+                continue
+            if children:
+                ops.append(("children", h, children))
+        elif children!=tuple([index[child] for child in source]):
+            ops.append(("children", h, children))
+        if not isinstance(element.tag, str):
+            if element.text!=source.text:
+                ops.append(("text", h, intern(element.text)))
+        else:
+            ops += attributes(h, source.attrib, element.attrib)
+            if element.text!=source.text:
+                ops.append(("text", h, intern(element.text)))
+        if element.tail!=source.tail:
+            ops.append(("tail", h, intern(element.tail)))
+    return created+ops
+
+def intern(value):
+    return sys.intern(value) if value is not None else None
+
+def attributes(h, before, after):
+    """
+    set/pop ops from one attribute list to another, or a single attrib op
+    when they would not give the same attribute order
+    """
+    popped = [name for name in before.keys() if name not in after]
+    kept = [name for name in before.keys() if name in after]
+    added = [name for name in after.keys() if name not in before]
+    if list(after.keys())!=kept+added:
+        return [("attrib", h, {intern(k): intern(v) for k, v in after.items()})]
+    ops = [("pop", h, intern(name)) for name in popped]
+    ops += [("set", h, intern(name), intern(after[name])) for name in after.keys() if before.get(name, None)!=after[name]]
+    return ops
@@ -1,12 +1,16 @@
 import copy
 from lxml.etree import SubElement
 from .tools import Tools
+from .xpaths import xpaths
+from . import timing
 
 class Processor:
-    def __init__(self, root, id, mainconfig, macros, citationlayout, bibliographylayout):
+    def __init__(self, root, id, mainconfig, macros, citationlayout, bibliographylayout, store=None):
         self.root = root
         self.macros = macros
-        self.tools = Tools(id)
+        with timing.stage("settings"):
+            self.tools = Tools(id, store)
+        self.query = xpaths
         self.config = self.tools.config
         self.mainconfig = mainconfig
         self.citationlayout = citationlayout
@@ -14,13 +18,14 @@ class Processor:
         self.langsuffix = "-"+id.split("-")[1] if len(id.split("-"))>1 else ""
         
         # Set locale style options
-        locale = self.root.xpath("z:locale[@xml:lang='"+self.langsuffix.replace("-", "")+"']", namespaces=self.tools.ns)[0]
-        
-        self.tools.insertchild(0, locale, "style-options", None, {"punctuation-in-quote": self.tools.config.get("a-punctuation-in-quote", "false")})
-        
-        # Page delimiter settings
-        terms = self.root.xpath("z:locale[@xml:lang='"+self.langsuffix.replace("-", "")+"']/z:terms", namespaces=self.tools.ns)[0]
-        self.tools.appendchild(terms, "term", self.config.get("a-page-range-delimiter", "-"), {"name": "page-range-delimiter"})
+        with timing.stage("locale"):
+            locale = self.query.first("locale", self.root, lang=self.langsuffix.replace("-", ""))
+            
+            self.tools.insertchild(0, locale, "style-options", None, {"punctuation-in-quote": self.tools.config.a_punctuation_in_quote})
+            
+            # Page delimiter settings
+            terms = self.query.first("locale/terms", self.root, lang=self.langsuffix.replace("-", ""))
+            self.tools.appendchild(terms, "term", self.config.a_page_range_delimiter, {"name": "page-range-delimiter"})
         
         # Remove -en for default
         if "-en" in self.langsuffix:
@@ -28,11 +33,14 @@ class Processor:
         
         
     def process(self):
-        self.setbibliography()
-        self.setcitation()
+        with timing.stage("bibliography"):
+            self.setbibliography()
+        with timing.stage("citation"):
+            self.setcitation()
     
     def setcitation(self):
         config = self.config
+        timing.lap("layout")
         """
         Citation layout
         """
@@ -41,44 +49,46 @@ class Processor:
         self.citationlayout.attrib["suffix"] = self.mainconfig.get("bracket-right", "）")
         
         # between author/date 
-        group = self.citationlayout.xpath("z:group/z:choose/z:if/z:group", namespaces=self.tools.ns)[0]
-        group.attrib["delimiter"] = config.get("c-name-date-delimiter", ", ")
+        group = self.query.first("group/choose/if/group", self.citationlayout)
+        group.attrib["delimiter"] = config.c_name_date_delimiter
         
         #between author/n.d
-        group = self.citationlayout.xpath("z:group/z:choose/z:else/z:group", namespaces=self.tools.ns)[0]
-        group.attrib["delimiter"] = config.get("c-name-date-delimiter", ", ")
+        group = self.query.first("group/choose/else/group", self.citationlayout)
+        group.attrib["delimiter"] = config.c_name_date_delimiter
         
+        timing.lap("names")
         """
         Separators and "and"
         """
         
         contributors = self.macros.get("contributors-short", None)
-        name = contributors.xpath("z:names/z:name", namespaces=self.tools.ns)[0]
-        name.attrib["delimiter"] = config.get("c-name-delimiter", "")
-        name.attrib["and"] = config.get("c-and-form", "")
+        name = self.query.first("names/name", contributors)
+        name.attrib["delimiter"] = config.c_name_delimiter
+        name.attrib["and"] = config.c_and_form
         
+        timing.lap("locators")
         """
         Set page number
         """
         locator = self.macros.get("point-locators", None)
         
         # Address inverted
-        locatortext = locator.xpath("z:choose/z:if/z:text", namespaces=self.tools.ns)[0]
+        locatortext = self.query.first("choose/if/text", locator)
         
-        labelgroup = locator.xpath("z:choose/z:if/z:choose", namespaces=self.tools.ns)[0]
+        labelgroup = self.query.first("choose/if/choose", locator)
         # Remove label if not needed
-        if config.get("c-page-label-form", "") == "":
+        if config.c_page_label_form == "":
             choose = self.tools.appendchild(locatortext.getparent(), "choose", None, {})
             ifnotpage = self.tools.appendchild(choose, "if", None, {"locator": "page", "match":"none"})
-            pagelabel = self.tools.appendchild(ifnotpage, "label", None, {"variable": "locator", "form":config.get("c-locator-label-form", "")})
-            if config.get("c-locator-label-right", "")!="":
-                pagelabel.attrib["suffix"] = config.get("c-locator-label-right", "")
+            pagelabel = self.tools.appendchild(ifnotpage, "label", None, {"variable": "locator", "form":config.c_locator_label_form})
+            if config.c_locator_label_right!="":
+                pagelabel.attrib["suffix"] = config.c_locator_label_right
             labelgroup.getparent().remove(labelgroup)
 
         # Or add label to page
         else:
             # if volume
-            volumegroup = labelgroup.xpath("z:else-if", namespaces=self.tools.ns)[0]
+            volumegroup = self.query.first("else-if", labelgroup)
             pagelabel = self.tools.appendchild(volumegroup, "label", None, {"variable": "locator"})
             
             # if no volume
@@ -86,54 +96,55 @@ class Processor:
             pagelabel = self.tools.appendchild(ifpage, "label", None, {"variable": "locator"})
             
             # Add suffix
-            labels = locator.xpath(".//z:label", namespaces=self.tools.ns)
+            labels = self.query.all(".//label", locator)
             for label in labels:
-                label.attrib["form"] = config.get("c-page-label-form", "long")
-                label.attrib["suffix"] = config.get("c-page-label-suffix", " ")
+                label.attrib["form"] = config.c_page_label_form
+                label.attrib["suffix"] = config.c_page_label_suffix
         
-        if config.get("c-invert-page-label", False):
+        if config.c_invert_page_label:
             locatortext.getparent().insert(0, locatortext)  
         else:
             locatortext.getparent().append(locatortext)
         
         # between date and page
-        group = self.citationlayout.xpath("z:group", namespaces=self.tools.ns)[0]
-        group.attrib["delimiter"] = config.get("c-date-page-delimiter", ", ")
+        group = self.query.first("group", self.citationlayout)
+        group.attrib["delimiter"] = config.c_date_page_delimiter
         
         # et-al setting
         citation = self.citationlayout.getparent()
-        if config.get("c-et-al-subsequent", False):
+        if config.c_et_al_subsequent:
             citation.attrib.pop("et-al-min")
             citation.attrib.pop("et-al-use-first")
             citation.attrib["et-al-subsequent-min"] = "3"
             citation.attrib["et-al-subsequent-use-first"] = "1"
         
         # delimiter-precedes-last
-        if config.get("c-delimiter-precedes-last", False):
+        if config.c_delimiter_precedes_last:
             citation.attrib["delimiter-precedes-last"] = "always"
         else:
             citation.attrib["delimiter-precedes-last"] = "never"
         
+        timing.lap("dates")
         """
         Dates
         """
         # Original date
         dateintext = self.macros.get("date-in-text", None)
-        group = dateintext.xpath("z:choose/z:if/z:group", namespaces=self.tools.ns)[0]
+        group = self.query.first("choose/if/group", dateintext)
         group.attrib["delimiter"] = ""
-        originaldate = group.xpath("z:date[@variable='original-date']", namespaces=self.tools.ns)[0]
-        originaldate.attrib["prefix"] = config.get("c-original-date-left", "")
-        originaldate.attrib["suffix"] = config.get("c-original-date-right", "=")
+        originaldate = self.query.first("date[@variable='original-date']", group)
+        originaldate.attrib["prefix"] = config.c_original_date_left
+        originaldate.attrib["suffix"] = config.c_original_date_right
         originaldate.attrib.pop("form")
         originaldate.attrib.pop("date-parts")
         self.tools.appendchild(originaldate, "date-part", None, {"name": "year"})
         
         # No date
-        if config.get("a-no-date-value", "")!="":
-            nodate = dateintext.xpath("z:choose/z:else/z:text", namespaces=self.tools.ns)[0]
+        if config.a_no_date_value!="":
+            nodate = self.query.first("choose/else/text", dateintext)
             nodate.attrib.pop("term")
             nodate.attrib.pop("form")
-            nodate.attrib["value"] = config.get("a-no-date-value", "")
+            nodate.attrib["value"] = config.a_no_date_value
         
         
     def setbibliography(self):
@@ -141,35 +152,35 @@ class Processor:
         Bibliography layout
         """
         config = self.config
+        timing.lap("layout")
         
         # Layout order
-        containercontributor = self.bibliographylayout.xpath("z:text[@macro='container-contributors"+self.langsuffix+"']", namespaces=self.tools.ns)[0]
-        idx = self.bibliographylayout.getchildren().index(containercontributor)-1
-        self.bibliographylayout.insert(idx, containercontributor)
+        containercontributor = self.query.first("macro-call", self.bibliographylayout, macro="container-contributors", langsuffix=self.langsuffix)
+        self.tools.move(containercontributor, before=containercontributor.getprevious())
         
         # Move locator chapter after issue
-        if self.config.get("b-locators-chapter-after-issue", False):
-            issue = self.bibliographylayout.xpath("z:text[@macro='issue"+self.langsuffix+"']", namespaces=self.tools.ns)[0]
-            locatorschapter = self.bibliographylayout.xpath("z:text[@macro='locators-chapter"+self.langsuffix+"']", namespaces=self.tools.ns)[0]
-            idx = issue.getparent().getchildren().index(locatorschapter)
-            issue.getparent().insert(idx, issue)
+        if self.config.b_locators_chapter_after_issue:
+            issue = self.query.first("macro-call", self.bibliographylayout, macro="issue", langsuffix=self.langsuffix)
+            locatorschapter = self.query.first("macro-call", self.bibliographylayout, macro="locators-chapter", langsuffix=self.langsuffix)
+            self.tools.move(issue, before=locatorschapter)
                 
         # Remove delimiters
-        group = self.bibliographylayout.xpath("z:group", namespaces=self.tools.ns)[0]
+        group = self.query.first("group", self.bibliographylayout)
         group.attrib.pop("delimiter")
         self.bibliographylayout.attrib.pop("suffix")
         
         # Add period before access
         finaldot = self.macros.get("final-dot", None)
-        if config.get("b-final-punctuation-omit-type", "")!="":
+        if config.b_final_punctuation_omit_type!="":
             choose = self.tools.appendchild(finaldot, "choose", None, {})
-            notomit = self.tools.appendchild(choose, "if", None, {"type": config.get("b-final-punctuation-omit-type", ""), "match": "none"})
-            self.tools.appendchild(notomit, "text", None, {"value": config.get("b-final-punctuation", ". ")})
+            notomit = self.tools.appendchild(choose, "if", None, {"type": config.b_final_punctuation_omit_type, "match": "none"})
+            self.tools.appendchild(notomit, "text", None, {"value": config.b_final_punctuation})
         else:
-            self.tools.appendchild(finaldot, "text", None, {"value": config.get("b-final-punctuation", ". ")})
+            self.tools.appendchild(finaldot, "text", None, {"value": config.b_final_punctuation})
         
         self.tools.insertchild(-2, self.bibliographylayout, "text", None, {"macro": "final-dot"+self.langsuffix})
         
+        timing.lap("contributors")
         """
         Contributors
         """
@@ -177,36 +188,37 @@ class Processor:
         contributors = self.macros.get("contributors", None)
         
         # Change delimiters
-        name = contributors.xpath("z:group/z:names/z:name", namespaces=self.tools.ns)[0]
-        name.attrib["and"] = config.get("b-and-form", "")
-        name.attrib["delimiter"] = config.get("b-name-delimiter", "・")
-        name.attrib["sort-separator"] = config.get("b-name-sort-separator", ",")
-        name.attrib["delimiter-precedes-last"] = config.get("b-delimiter-precedes-last", "never")
-        if config.get("b-name-initialize-with", "")!="":
-            name.attrib["initialize-with"] = config.get("b-name-initialize-with", "")
-            name.attrib["initialize"] = config.get("b-name-initialize", "")
-        if config.get("b-contributor-name-as-sort-order", "")!="":
-            name.attrib["name-as-sort-order"] = config.get("b-contributor-name-as-sort-order", "first")
+        name = self.query.first("group/names/name", contributors)
+        name.attrib["and"] = config.b_and_form
+        name.attrib["delimiter"] = config.b_name_delimiter
+        name.attrib["sort-separator"] = config.b_name_sort_separator
+        name.attrib["delimiter-precedes-last"] = config.b_delimiter_precedes_last
+        if config.b_name_initialize_with!="":
+            name.attrib["initialize-with"] = config.b_name_initialize_with
+            name.attrib["initialize"] = config.b_name_initialize
+        if config.b_contributor_name_as_sort_order!="":
+            name.attrib["name-as-sort-order"] = config.b_contributor_name_as_sort_order
         
         # Label
-        label = contributors.xpath("z:group/z:names/z:label", namespaces=self.tools.ns)[0]
+        label = self.query.first("group/names/label", contributors)
         label.attrib["prefix"] = ""
         
         # Add label affixes
-        label.attrib["prefix"] = config.get("b-contributor-label-left", " (")
-        label.attrib["suffix"] = config.get("b-contributor-label-right", ")")
+        label.attrib["prefix"] = config.b_contributor_label_left
+        label.attrib["suffix"] = config.b_contributor_label_right
         
         # Split names with delimiters
-        if config.get("b-name-part-delimiter", "")!="":
-            self.tools.splitname(name, config.get("b-name-part-delimiter", ""))
+        if config.b_name_part_delimiter!="":
+            self.tools.splitname(name, config.b_name_part_delimiter)
         
+        timing.lap("container contributors")
         """
         Container contributors
         """
         contributors = self.macros.get("container-contributors", None)
-        group = contributors.xpath("z:choose/z:if/z:group", namespaces=self.tools.ns)[0]
-        labels = contributors.xpath("z:choose/z:if/z:group/z:names/z:label", namespaces=self.tools.ns)
-        names = contributors.xpath("z:choose/z:if/z:group/z:names/z:name", namespaces=self.tools.ns)
+        group = self.query.first("choose/if/group", contributors)
+        labels = self.query.all("choose/if/group/names/label", contributors)
+        names = self.query.all("choose/if/group/names/name", contributors)
         
         group.attrib["prefix"] = ""
         
@@ -216,186 +228,189 @@ class Processor:
             label.getparent().insert(idx, label)
         
         for name in names:
-            name.attrib["and"] = config.get("b-and-form", "")
-            name.attrib["delimiter"] = config.get("b-name-delimiter", "・")
-            name.attrib["sort-separator"] = config.get("b-name-sort-separator", ",")
-            name.attrib["delimiter-precedes-last"] = config.get("b-delimiter-precedes-last", "never")
-            if config.get("b-container-contributor-name-as-sort-order", "")!="":
-                name.attrib["name-as-sort-order"] = config.get("b-container-contributor-name-as-sort-order", "first")
+            name.attrib["and"] = config.b_and_form
+            name.attrib["delimiter"] = config.b_name_delimiter
+            name.attrib["sort-separator"] = config.b_name_sort_separator
+            name.attrib["delimiter-precedes-last"] = config.b_delimiter_precedes_last
+            if config.b_container_contributor_name_as_sort_order!="":
+                name.attrib["name-as-sort-order"] = config.b_container_contributor_name_as_sort_order
             
             # Split names with delimiters
-            if config.get("b-name-part-delimiter", "")!="":
-                self.tools.splitname(name, config.get("b-name-part-delimiter", ""))
+            if config.b_name_part_delimiter!="":
+                self.tools.splitname(name, config.b_name_part_delimiter)
         
         # Remove prefix from container-title to container-contributor suffix
-        title = self.bibliographylayout.xpath("z:text[@macro='container-title"+self.langsuffix+"']", namespaces=self.tools.ns)[0]
+        title = self.query.first("macro-call", self.bibliographylayout, macro="container-title", langsuffix=self.langsuffix)
         title.attrib["prefix"] = ""
         
-        authors = self.bibliographylayout.xpath("z:text[@macro='container-contributors"+self.langsuffix+"']", namespaces=self.tools.ns)[0]
-        authors.attrib["suffix"] = config.get("b-container-contributors-suffix", "")
+        authors = self.query.first("macro-call", self.bibliographylayout, macro="container-contributors", langsuffix=self.langsuffix)
+        authors.attrib["suffix"] = config.b_container_contributors_suffix
         
         # Move container-prefix="in" to contributors from title
         title = self.macros.get('container-title', None)
-        authors = self.macros.get('container-contributors', None).xpath("z:choose/z:if/z:group", namespaces=self.tools.ns)[0]
-        prefix = title.xpath("z:choose/z:if/z:text[@macro='container-prefix"+self.langsuffix+"']", namespaces=self.tools.ns)[0]
+        authors = self.query.first("choose/if/group", self.macros.get('container-contributors', None))
+        prefix = self.query.first("choose/if/macro-call", title, macro="container-prefix", langsuffix=self.langsuffix)
         prefix.attrib["prefix"] = ". "
         prefix.attrib["suffix"] = ""
         authors.attrib["delimiter"] = " "
         authors.insert(0, prefix)
         
         # Translator editor instead of editor translator
-        tred = self.macros.get('container-contributors', None).xpath("z:choose/z:if/z:group/z:names[@variable='editor translator']", namespaces=self.tools.ns)[0]
-        if config.get("b-translator-editor", False):
+        tred = self.query.first("choose/if/group/names[@variable='editor translator']", self.macros.get('container-contributors', None))
+        if config.b_translator_editor:
             tred.attrib["variable"] = "translator editor"
         
         # Translator editor delimiter
-        if config.get("b-translator-editor-delimiter", "")!="":
-            tred.attrib["delimiter"] = config.get("b-translator-editor-delimiter", "")
+        if config.b_translator_editor_delimiter!="":
+            tred.attrib["delimiter"] = config.b_translator_editor_delimiter
         
         # Format names and labels
-        nameslist = self.macros.get('container-contributors', None).xpath("z:choose/z:if/z:group/z:names", namespaces=self.tools.ns)
-        namelist = self.macros.get('container-contributors', None).xpath("z:choose/z:if/z:group/z:names/z:name", namespaces=self.tools.ns)
-        labels = self.macros.get('container-contributors', None).xpath("z:choose/z:if/z:group/z:names/z:label", namespaces=self.tools.ns)
+        nameslist = self.query.all("choose/if/group/names", self.macros.get('container-contributors', None))
+        namelist = self.query.all("choose/if/group/names/name", self.macros.get('container-contributors', None))
+        labels = self.query.all("choose/if/group/names/label", self.macros.get('container-contributors', None))
         
         for names in nameslist:
-            if config.get("b-container-contributors-left", "")!="":
-                names.attrib["prefix"] = config.get("b-container-contributors-left", "")
-            if config.get("b-container-contributors-right", "")!="":
-                names.attrib["suffix"] = config.get("b-container-contributors-right", "")
+            if config.b_container_contributors_left!="":
+                names.attrib["prefix"] = config.b_container_contributors_left
+            if config.b_container_contributors_right!="":
+                names.attrib["suffix"] = config.b_container_contributors_right
         
         for name in namelist:
-            name.attrib["and"] = config.get("b-and-form", "")
-            name.attrib["delimiter"] = config.get("b-name-delimiter", "・")
-            name.attrib["sort-separator"] = config.get("b-name-sort-separator", ",")
-            name.attrib["delimiter-precedes-last"] = config.get("b-delimiter-precedes-last", "never")
-            if config.get("b-container-contributor-initialize-with", "")!="":
-                name.attrib["initialize-with"] = config.get("b-container-contributor-initialize-with", "")
-                name.attrib["initialize"] = config.get("b-container-contributor-initialize", "")
+            name.attrib["and"] = config.b_and_form
+            name.attrib["delimiter"] = config.b_name_delimiter
+            name.attrib["sort-separator"] = config.b_name_sort_separator
+            name.attrib["delimiter-precedes-last"] = config.b_delimiter_precedes_last
+            if config.b_container_contributor_initialize_with!="":
+                name.attrib["initialize-with"] = config.b_container_contributor_initialize_with
+                name.attrib["initialize"] = config.b_container_contributor_initialize
             
-            if config.get("b-container-contributor-name-as-sort-order", "")!="":
-                name.attrib["name-as-sort-order"] = config.get("b-container-contributor-name-as-sort-order", "first")
+            if config.b_container_contributor_name_as_sort_order!="":
+                name.attrib["name-as-sort-order"] = config.b_container_contributor_name_as_sort_order
         
         for label in labels:
-            label.attrib["prefix"] = config.get("b-contributor-label-left", " (")
-            label.attrib["suffix"] = config.get("b-contributor-label-right", ")")
+            label.attrib["prefix"] = config.b_contributor_label_left
+            label.attrib["suffix"] = config.b_contributor_label_right
                 
+        timing.lap("secondary contributors")
         """
         Secondary contributors
         """
-        secondarycontributors = self.bibliographylayout.xpath("z:text[@macro='secondary-contributors"+self.langsuffix+"']", namespaces=self.tools.ns)[0]
-        secondarycontributors.attrib["suffix"] = config.get("b-secondary-contributor-label-right", ",")
+        secondarycontributors = self.query.first("macro-call", self.bibliographylayout, macro="secondary-contributors", langsuffix=self.langsuffix)
+        secondarycontributors.attrib["suffix"] = config.b_secondary_contributor_label_right
         
         # Remove prefix
-        authors = self.bibliographylayout.xpath("z:text[@macro='secondary-contributors"+self.langsuffix+"']", namespaces=self.tools.ns)[0]
+        authors = self.query.first("macro-call", self.bibliographylayout, macro="secondary-contributors", langsuffix=self.langsuffix)
         if "prefix" in authors.attrib:
             authors.attrib.pop("prefix")
         
-        names = self.macros.get('secondary-contributors', None).xpath("z:choose/z:if/z:group/z:names", namespaces=self.tools.ns)[0]
-        namelist = self.macros.get('secondary-contributors', None).xpath("z:choose/z:if/z:group/z:names/z:name", namespaces=self.tools.ns)
-        labels = self.macros.get('secondary-contributors', None).xpath("z:choose/z:if/z:group/z:names/z:label", namespaces=self.tools.ns)
+        names = self.query.first("choose/if/group/names", self.macros.get('secondary-contributors', None))
+        namelist = self.query.all("choose/if/group/names/name", self.macros.get('secondary-contributors', None))
+        labels = self.query.all("choose/if/group/names/label", self.macros.get('secondary-contributors', None))
         
-        if config.get("b-secondary-contributors-left", "")!="":
-            names.attrib["prefix"] = config.get("b-secondary-contributors-left", "")
-        if config.get("b-secondary-contributors-right", "")!="":
-            names.attrib["suffix"] = config.get("b-secondary-contributors-right", "")
+        if config.b_secondary_contributors_left!="":
+            names.attrib["prefix"] = config.b_secondary_contributors_left
+        if config.b_secondary_contributors_right!="":
+            names.attrib["suffix"] = config.b_secondary_contributors_right
         
         for name in namelist:
-            name.attrib["and"] = config.get("b-and-form", "")
-            name.attrib["delimiter"] = config.get("b-name-delimiter", "・")
-            name.attrib["sort-separator"] = config.get("b-name-sort-separator", ",")
-            name.attrib["delimiter-precedes-last"] = config.get("b-delimiter-precedes-last", "never")
-            if config.get("b-secondary-contributor-initialize-with", "")!="":
-                name.attrib["initialize-with"] = config.get("b-secondary-contributor-initialize-with", "")
-                name.attrib["initialize"] = config.get("b-secondary-contributor-initialize", "")
+            name.attrib["and"] = config.b_and_form
+            name.attrib["delimiter"] = config.b_name_delimiter
+            name.attrib["sort-separator"] = config.b_name_sort_separator
+            name.attrib["delimiter-precedes-last"] = config.b_delimiter_precedes_last
+            if config.b_secondary_contributor_initialize_with!="":
+                name.attrib["initialize-with"] = config.b_secondary_contributor_initialize_with
+                name.attrib["initialize"] = config.b_secondary_contributor_initialize
                 
-            if config.get("b-secondary-contributor-name-as-sort-order", "")!="":
-                name.attrib["name-as-sort-order"] = config.get("b-secondary-contributor-name-as-sort-order", "first")
+            if config.b_secondary_contributor_name_as_sort_order!="":
+                name.attrib["name-as-sort-order"] = config.b_secondary_contributor_name_as_sort_order
             name.getparent().insert(0, name)
            
             # Split names with delimiters
-            if config.get("b-name-part-delimiter", "")!="":
-                self.tools.splitname(name, config.get("b-name-part-delimiter", ""))
+            if config.b_name_part_delimiter!="":
+                self.tools.splitname(name, config.b_name_part_delimiter)
         
         for label in labels:
-            label.attrib["prefix"] = config.get("b-contributor-2-label-left", " (")
-            label.attrib["suffix"] = config.get("b-contributor-2-label-right", ")")
+            label.attrib["prefix"] = config.b_contributor_2_label_left
+            label.attrib["suffix"] = config.b_contributor_2_label_right
             label.attrib["form"] = "short"
 
         # contributors = self.macros.get("secondary-contributors", None)
         # labels = contributors.xpath("z:choose/z:if/z:group/z:names/z:label", namespaces=self.tools.ns)
         # for label in labels:
             # label.attrib["form"] = "short"
-            # label.attrib["suffix"] = config.get("b-contributors-suffix", "、")
-            # if config.get("b-invert-contributors-label", False):
+            # label.attrib["suffix"] = config.b_contributors_suffix
+            # if config.b_invert_contributors_label:
                 # label.getparent().insert(len(label.getparent().getchildren()), label)
             # else:
                 # pass #Not move
                 
+        timing.lap("date")
         """
         Date
         """
         date = self.macros.get("date", None)
-        group = date.xpath("z:choose/z:if/z:group", namespaces=self.tools.ns)[0]
-        group.attrib["prefix"] = config.get("b-date-left", "（")
-        group.attrib["suffix"] = config.get("b-date-right", "）")
-        group.attrib["delimiter"] = config.get("b-date-delimiter", "")
+        group = self.query.first("choose/if/group", date)
+        group.attrib["prefix"] = config.b_date_left
+        group.attrib["suffix"] = config.b_date_right
+        group.attrib["delimiter"] = config.b_date_delimiter
         
         # Original date
-        originaldate = group.xpath("z:date[@variable='original-date']", namespaces=self.tools.ns)[0]
-        originaldate.attrib["prefix"] = config.get("c-original-date-left", "")
-        originaldate.attrib["suffix"] = config.get("c-original-date-right", "=")
+        originaldate = self.query.first("date[@variable='original-date']", group)
+        originaldate.attrib["prefix"] = config.c_original_date_left
+        originaldate.attrib["suffix"] = config.c_original_date_right
         originaldate.attrib.pop("form")
         originaldate.attrib.pop("date-parts")
         self.tools.appendchild(originaldate, "date-part", None, {"name": "year"})
         
         # No date
-        nodate = date.xpath("z:choose/z:else/z:text", namespaces=self.tools.ns)[0]
-        nodate.attrib["prefix"] =  config.get("b-date-left", "（")
-        nodate.attrib["suffix"] =  config.get("b-date-right", "）")
+        nodate = self.query.first("choose/else/text", date)
+        nodate.attrib["prefix"] =  config.b_date_left
+        nodate.attrib["suffix"] =  config.b_date_right
         
-        if config.get("a-no-date-value", "")!="":
+        if config.a_no_date_value!="":
             nodate.attrib.pop("term")
             nodate.attrib.pop("form")
-            nodate.attrib["value"] = config.get("a-no-date-value", "")
+            nodate.attrib["value"] = config.a_no_date_value
         
+        timing.lap("titles")
         """
         Title
         """
         title = self.macros.get("title", None)
-        t = title.xpath("z:choose/z:else/z:text", namespaces=self.tools.ns)[0]
-        t.attrib["quotes"] = config.get("b-title-quotes", "true")
+        t = self.query.first("choose/else/text", title)
+        t.attrib["quotes"] = config.b_title_quotes
         
         """
         Book title
         """
         title = self.macros.get("title", None)
-        booktitle = title.xpath("z:choose/z:else-if[@type='bill book graphic legislation motion_picture song']/z:text", namespaces=self.tools.ns)[0]
-        if config.get("b-book-title-style", "")=="":
+        booktitle = self.query.first("choose/else-if[@type='bill book graphic legislation motion_picture song']/text", title)
+        if config.b_book_title_style=="":
             booktitle.attrib.pop("font-style")
         else:
-            booktitle.attrib["font-style"] = config.get("b-book-title-style")
+            booktitle.attrib["font-style"] = config.b_book_title_style
             
-        booktitle.attrib["prefix"] = config.get("b-book-title-left", "『")
-        booktitle.attrib["suffix"] = config.get("b-book-title-right", "』")
+        booktitle.attrib["prefix"] = config.b_book_title_left
+        booktitle.attrib["suffix"] = config.b_book_title_right
         
         """
         Container title
         """
         title = self.macros.get("container-title", None)
         # website title
-        websitetitle = title.xpath("z:choose/z:if[@type='webpage']/z:text", namespaces=self.tools.ns)[0]
-        websitetitle.attrib["prefix"] = config.get("b-website-title-left", "")
+        websitetitle = self.query.first("choose/if[@type='webpage']/text", title)
+        websitetitle.attrib["prefix"] = config.b_website_title_left
         
         # book title
-        containertitle = title.xpath("z:choose/z:else-if/z:group/z:text", namespaces=self.tools.ns)[0]
-        if config.get("b-book-title-style", "")=="":
+        containertitle = self.query.first("choose/else-if/group/text", title)
+        if config.b_book_title_style=="":
             containertitle.attrib.pop("font-style")
         else:
-            containertitle.attrib["font-style"] = config.get("b-book-title-style")
+            containertitle.attrib["font-style"] = config.b_book_title_style
         
-        # if config.get("b-book-title-right", "") == config.get("b-journal-title-right", ""):
-            # containertitle.attrib["prefix"] = config.get("b-book-title-left", "『")
-            # containertitle.attrib["suffix"] = config.get("b-book-title-right", "』")
+        # if config.b_book_title_right == config.b_journal_title_right:
+            # containertitle.attrib["prefix"] = config.b_book_title_left
+            # containertitle.attrib["suffix"] = config.b_book_title_right
         # else:
         choose = self.tools.insertchild(0, containertitle.getparent(), "choose", None, {})
         book = self.tools.insertchild(0, choose, "if", None, {"type": "chapter"})
@@ -405,12 +420,12 @@ class Processor:
         booktitle = copy.deepcopy(containertitle)
         journaltitle = copy.deepcopy(containertitle)
         
-        booktitle.attrib["prefix"] = config.get("b-book-title-left", "『")
-        booktitle.attrib["suffix"] = config.get("b-book-title-right", "』")
+        booktitle.attrib["prefix"] = config.b_book_title_left
+        booktitle.attrib["suffix"] = config.b_book_title_right
         book.insert(0, booktitle)
 
-        journaltitle.attrib["prefix"] = config.get("b-journal-title-left", "")
-        journaltitle.attrib["suffix"] = config.get("b-journal-title-right", "")
+        journaltitle.attrib["prefix"] = config.b_journal_title_left
+        journaltitle.attrib["suffix"] = config.b_journal_title_right
         journal.insert(0, journaltitle)
         
         other.insert(0, containertitle)
@@ -420,229 +435,233 @@ class Processor:
         
         # Change container-title prefix
         # title = self.bibliographylayout.xpath("z:text[@macro='container-title"+self.langsuffix+"']", namespaces=self.tools.ns)[0]
-        # title.attrib["prefix"] = config.get("b-book-title-prefix", ". ")
+        # title.attrib["prefix"] = config.b_book_title_prefix
         
         """
         Journal title (collection-title)
         """
-        title = self.macros.get("collection-title", None).xpath("z:choose/z:if/z:choose/z:if/z:group", namespaces=self.tools.ns)[0]
-        title.attrib["delimiter"] = config.get("b-journal-title-suffix", ",")
+        title = self.query.first("choose/if/choose/if/group", self.macros.get("collection-title", None))
+        title.attrib["delimiter"] = config.b_journal_title_suffix
                 
         
+        timing.lap("edition")
         """
         Edition
         """
-        edition = self.bibliographylayout.xpath("z:text[@macro='edition"+self.langsuffix+"']", namespaces=self.tools.ns)[0]
-        if config.get("b-edition-left", "")!="":
-            edition.attrib["prefix"] = config.get("b-edition-left", "")
-        if config.get("b-edition-right", "")!="":
-            edition.attrib["suffix"] = config.get("b-edition-right", "")
+        edition = self.query.first("macro-call", self.bibliographylayout, macro="edition", langsuffix=self.langsuffix)
+        if config.b_edition_left!="":
+            edition.attrib["prefix"] = config.b_edition_left
+        if config.b_edition_right!="":
+            edition.attrib["suffix"] = config.b_edition_right
         
         # Remove prefix for bill book graphic legal_case legislation motion_picture report song
-        editionnumeric = self.macros.get("edition", None).xpath("z:choose/z:if/z:choose/z:if/z:group", namespaces=self.tools.ns)[0]
-        editiontext = self.macros.get("edition", None).xpath("z:choose/z:if/z:choose/z:else/z:text", namespaces=self.tools.ns)[0]
+        editionnumeric = self.query.first("choose/if/choose/if/group", self.macros.get("edition", None))
+        editiontext = self.query.first("choose/if/choose/else/text", self.macros.get("edition", None))
         editionnumeric.attrib.pop("prefix")
         editiontext.attrib.pop("prefix")
         
         # Remove prefix for chapter entry-dictionary entry-encyclopedia paper-conference
-        editionnumeric = self.macros.get("edition", None).xpath("z:choose/z:else-if/z:choose/z:if/z:group", namespaces=self.tools.ns)[0]
-        editiontext = self.macros.get("edition", None).xpath("z:choose/z:else-if/z:choose/z:else/z:text", namespaces=self.tools.ns)[0]
+        editionnumeric = self.query.first("choose/else-if/choose/if/group", self.macros.get("edition", None))
+        editiontext = self.query.first("choose/else-if/choose/else/text", self.macros.get("edition", None))
         editionnumeric.attrib.pop("prefix")
         editiontext.attrib.pop("prefix")
         
         
         
+        timing.lap("locators")
         """
         issue
         """
-        issue = self.macros.get("issue", None).xpath("z:choose/z:else/z:group", namespaces=self.tools.ns)[0]
+        issue = self.query.first("choose/else/group", self.macros.get("issue", None))
         issue.attrib.pop("prefix")
-        issue.attrib["delimiter"] = config.get("b-issue-delimiter", "、")
+        issue.attrib["delimiter"] = config.b_issue_delimiter
         
         """
         Locators (volume and issue for article)
         """
         # Add punctuation after locator
-        locators = self.bibliographylayout.xpath("z:text[@macro='locators"+self.langsuffix+"']", namespaces=self.tools.ns)[0]
-        locators.attrib["suffix"] = config.get("b-locator-right", "")
+        locators = self.query.first("macro-call", self.bibliographylayout, macro="locators", langsuffix=self.langsuffix)
+        locators.attrib["suffix"] = config.b_locator_right
         
         locators = self.macros.get("locators", None)
         
         #volume and issue present
-        volume = locators.xpath("z:choose/z:if/z:choose/z:if", namespaces=self.tools.ns)[0]
-        vtext = locators.xpath("z:choose/z:if/z:choose/z:if/z:text", namespaces=self.tools.ns)[0]
-        group = locators.xpath("z:choose/z:if/z:choose/z:if/z:group", namespaces=self.tools.ns)[0]
+        volume = self.query.first("choose/if/choose/if", locators)
+        vtext = self.query.first("choose/if/choose/if/text", locators)
+        group = self.query.first("choose/if/choose/if/group", locators)
         
-        vtext.attrib["prefix"] = config.get("b-volume-left", "")
+        vtext.attrib["prefix"] = config.b_volume_left
 
         #add comma between volume and issue
         volumeissuegroup = SubElement(volume, "group")
         volume.insert(0, volumeissuegroup)
         
-        issue = locators.xpath("z:choose/z:if/z:choose/z:if/z:group/z:choose/z:if", namespaces=self.tools.ns)[0]
-        issued = locators.xpath("z:choose/z:if/z:choose/z:if/z:group/z:choose/z:else", namespaces=self.tools.ns)[0]
+        issue = self.query.first("choose/if/choose/if/group/choose/if", locators)
+        issued = self.query.first("choose/if/choose/if/group/choose/else", locators)
         
-        if config.get("b-locator-label-form", "")!="":
+        if config.b_locator_label_form!="":
             vgroup = SubElement(volume, "group")
             vlabel = SubElement(vgroup, "label")
             vgroup.insert(0, vtext)
-            vgroup.attrib["delimiter"] = config.get("b-locator-label-delimiter", "")
+            vgroup.attrib["delimiter"] = config.b_locator_label_delimiter
             vlabel.attrib["variable"] = "volume"
             vlabel.attrib["form"] = "short"
             vlabel.attrib["text-case"] = "capitalize-first"
             volume.insert(0, vgroup)
                         
-            itext = locators.xpath("z:choose/z:if/z:choose/z:if/z:group/z:choose/z:if/z:text", namespaces=self.tools.ns)[0]
-            if config.get("b-locator-label-invert", False):
+            itext = self.query.first("choose/if/choose/if/group/choose/if/text", locators)
+            if config.b_locator_label_invert:
                 vgroup.insert(1, vlabel)
-                itext.attrib["prefix"] = config.get("b-issue-left", "")
+                itext.attrib["prefix"] = config.b_issue_left
                 
-                if config.get("b-volume-right", "")!="":
-                    vlabel.attrib["suffix"] = config.get("b-volume-right", "")
+                if config.b_volume_right!="":
+                    vlabel.attrib["suffix"] = config.b_volume_right
  
-                # label.attrib["suffix"] = config.get("b-issue-right", "")
-                vtext.attrib["prefix"] = config.get("b-volume-left", "")
-                if config.get("b-locator-label-form", "")!="":
+                # label.attrib["suffix"] = config.b_issue_right
+                vtext.attrib["prefix"] = config.b_volume_left
+                if config.b_locator_label_form!="":
                     ilabel = self.tools.appendchild(issue, "label", None, {"variable": "issue", "form": "short"})
-                    if config.get("b-issue-right", "")!="":
-                        ilabel.attrib["suffix"] = config.get("b-issue-right", "")
+                    if config.b_issue_right!="":
+                        ilabel.attrib["suffix"] = config.b_issue_right
             else:
                 vgroup.insert(0, vlabel)
-                itext.attrib["suffix"] = config.get("b-issue-right", "")
-                label.attrib["prefix"] = config.get("b-issue-left", "")
-                if config.get("b-locator-label-form", "")!="":
+                itext.attrib["suffix"] = config.b_issue_right
+                label.attrib["prefix"] = config.b_issue_left
+                if config.b_locator_label_form!="":
                     ilabel  = self.tools.insertchild(0, issue, "label", None, {"variable": "issue", "form": "short", "text-case": "capitalize-first"})
             volumeissuegroup.insert(0, vgroup)
         else: # No label
-            itext = issue.xpath("z:text", namespaces=self.tools.ns)[0]
-            itext.attrib["prefix"] = config.get("b-issue-left", "")
-            itext.attrib["suffix"] = config.get("b-issue-right", "")
+            itext = self.query.first("text", issue)
+            itext.attrib["prefix"] = config.b_issue_left
+            itext.attrib["suffix"] = config.b_issue_right
             
-            volif = locators.xpath("z:choose/z:if/z:choose/z:if", namespaces=self.tools.ns)[0]
-            votext = locators.xpath("z:choose/z:if/z:choose/z:if/z:text", namespaces=self.tools.ns)[0]
+            volif = self.query.first("choose/if/choose/if", locators)
+            votext = self.query.first("choose/if/choose/if/text", locators)
             volif.insert(0, votext)
             
             
         # text.attrib.pop("prefix")
-        group.attrib.pop("prefix") # = config.get("b-issue-left", "")
-        group.attrib.pop("suffix") # = config.get("b-issue-right", "")
-        group.attrib["delimiter"] = config.get("b-locator-label-delimiter", "")
+        group.attrib.pop("prefix") # = config.b_issue_left
+        group.attrib.pop("suffix") # = config.b_issue_right
+        group.attrib["delimiter"] = config.b_locator_label_delimiter
         
         
         igroup = issued.getparent().getparent()
         volumeissuegroup.insert(1, igroup)
         
         # add delimiter
-        volumeissuegroup.attrib["delimiter"] = config.get("b-volume-issue-delimiter", "")
+        volumeissuegroup.attrib["delimiter"] = config.b_volume_issue_delimiter
         
         # Only issue present
-        issue = locators.xpath("z:choose/z:if/z:choose/z:else-if/z:group/z:text[@variable='issue']", namespaces=self.tools.ns)[0]
+        issue = self.query.first("choose/if/choose/else-if/group/text[@variable='issue']", locators)
 
-        ilabel = locators.xpath("z:choose/z:if/z:choose/z:else-if/z:group/z:text[@term='issue']", namespaces=self.tools.ns)[0]
-        group = locators.xpath("z:choose/z:if/z:choose/z:else-if/z:group", namespaces=self.tools.ns)[0]
-        
-        if config.get("b-locator-label-invert", False):
-            ilabel.getparent().insert(len(ilabel.getparent().getchildren()), ilabel)
-            issue.attrib["prefix"] = config.get("b-only-issue-left", "")
-            ilabel.attrib["suffix"] = config.get("b-only-issue-right", "")
-            ilabel.getparent().attrib["delimiter"] = config.get("b-locator-label-delimiter", "")
+        ilabel = self.query.first("choose/if/choose/else-if/group/text[@term='issue']", locators)
+        group = self.query.first("choose/if/choose/else-if/group", locators)
+        
+        if config.b_locator_label_invert:
+            self.tools.move(ilabel)
+            issue.attrib["prefix"] = config.b_only_issue_left
+            ilabel.attrib["suffix"] = config.b_only_issue_right
+            ilabel.getparent().attrib["delimiter"] = config.b_locator_label_delimiter
         else:
             ilabel.getparent().insert(0, ilabel)
             ilabel.attrib["text-case"] = "capitalize-first"
-            ilabel.attrib["prefix"] = config.get("b-only-issue-left", "")
-            ilabel.getparent().attrib["delimiter"] = config.get("b-locator-label-delimiter", "")
-            issue.attrib["suffix"] = config.get("b-only-issue-right", "")
+            ilabel.attrib["prefix"] = config.b_only_issue_left
+            ilabel.getparent().attrib["delimiter"] = config.b_locator_label_delimiter
+            issue.attrib["suffix"] = config.b_only_issue_right
         
         # Remove label if not needed
-        if config.get("b-locator-label-form", "")=="":
+        if config.b_locator_label_form=="":
             ilabel.getparent().remove(ilabel)
         
         group.attrib.pop("prefix")
 
         # Only issued present
-        issued = locators.xpath("z:choose/z:if/z:choose/z:else", namespaces=self.tools.ns)[0]
+        issued = self.query.first("choose/if/choose/else", locators)
         # self.tools.appendchild(issued, "label", None, {"variable": "issued", "form": "short"})
         
         """
         Locators chapter
         """
         locatorschapter = self.macros.get("locators-chapter", None)
-        group = locatorschapter.xpath("z:choose/z:if/z:choose/z:if/z:group", namespaces=self.tools.ns)[0]
-        group.attrib["prefix"] = config.get("b-locator-chapter-prefix", "、")
-        group.attrib["suffix"] = config.get("b-locator-chapter-suffix", "、")
-        locatorform = config.get("b-locator-chapter-label-form", "long")
+        group = self.query.first("choose/if/choose/if/group", locatorschapter)
+        group.attrib["prefix"] = config.b_locator_chapter_prefix
+        group.attrib["suffix"] = config.b_locator_chapter_suffix
+        locatorform = config.b_locator_chapter_label_form
         
-        if  config.get("b-locator-chapter-label-invert", False):
+        if  config.b_locator_chapter_label_invert:
             self.tools.appendchild(group, "label", None, {"form": locatorform, "variable": "page"})
         else:
-            sep = config.get("b-locator-chapter-separator", False)
+            sep = config.b_locator_chapter_separator
             self.tools.insertchild(0, group, "label", None, {"form": locatorform, "variable": "page", "suffix": sep})
             
         """
         Locators article
         """
         locatorsarticle = self.macros.get("locators-article", None)
-        volpage = locatorsarticle.xpath("z:choose/z:else-if/z:choose/z:if/z:text", namespaces=self.tools.ns)[0]
-        page = locatorsarticle.xpath("z:choose/z:else-if/z:choose/z:else/z:text", namespaces=self.tools.ns)[0]
-        volpage.attrib["prefix"] = config.get("b-locator-article-prefix", "、") #need checking
+        volpage = self.query.first("choose/else-if/choose/if/text", locatorsarticle)
+        page = self.query.first("choose/else-if/choose/else/text", locatorsarticle)
+        volpage.attrib["prefix"] = config.b_locator_article_prefix #need checking
         
-        if config.get("b-article-page-label-invert", False):
-            if config.get("b-locator-label-form", "")!="":
-                self.tools.appendchild(volpage.getparent(), "label", None, {"form": config.get("b-locator-label-form", "long"), "variable": "page", "prefix":config.get("b-locator-label-delimiter", "")})
+        if config.b_article_page_label_invert:
+            if config.b_locator_label_form!="":
+                self.tools.appendchild(volpage.getparent(), "label", None, {"form": config.b_locator_label_form, "variable": "page", "prefix":config.b_locator_label_delimiter})
         else:
-            if config.get("b-locator-label-form", "")!="":
-                self.tools.insertchild(0, volpage.getparent(), "label", None, {"form": config.get("b-locator-label-form", "long"), "variable": "page", "suffix":config.get("b-locator-label-delimiter", "")})
+            if config.b_locator_label_form!="":
+                self.tools.insertchild(0, volpage.getparent(), "label", None, {"form": config.b_locator_label_form, "variable": "page", "suffix":config.b_locator_label_delimiter})
         
-        page.attrib["prefix"] = config.get("b-locator-article-prefix", "、") #need checking
+        page.attrib["prefix"] = config.b_locator_article_prefix #need checking
         
-        if config.get("b-article-page-label-invert", False):
-            if config.get("b-locator-label-form", "")!="":
-                self.tools.appendchild(page.getparent(), "label", None, {"form": config.get("b-locator-label-form", "long"), "variable": "page", "prefix":config.get("b-locator-label-delimiter", "")})
+        if config.b_article_page_label_invert:
+            if config.b_locator_label_form!="":
+                self.tools.appendchild(page.getparent(), "label", None, {"form": config.b_locator_label_form, "variable": "page", "prefix":config.b_locator_label_delimiter})
         else:
-            if config.get("b-locator-label-form", "")!="":
-                self.tools.insertchild(0, page.getparent(), "label", None, {"form": config.get("b-locator-label-form", "long"), "variable": "page", "suffix":config.get("b-locator-label-delimiter", "")})
+            if config.b_locator_label_form!="":
+                self.tools.insertchild(0, page.getparent(), "label", None, {"form": config.b_locator_label_form, "variable": "page", "suffix":config.b_locator_label_delimiter})
         
 
+        timing.lap("publisher")
         """
         Publisher place
         """
-        if config.get("b-publisher-remove-place", False):
-            publisherplace = self.macros.get("publisher", None).xpath("z:group/z:text[@variable='publisher-place']", namespaces=self.tools.ns)[0]
+        if config.b_publisher_remove_place:
+            publisherplace = self.query.first("group/text[@variable='publisher-place']", self.macros.get("publisher", None))
             publisherplace.getparent().remove(publisherplace)
         
         #Publisher group affix
-        publishergroup = self.macros.get("publisher", None).xpath("z:group", namespaces=self.tools.ns)[0]
-        if config.get("b-publisher-group-left", "")!="":
-            publishergroup.attrib["prefix"] = config.get("b-publisher-group-left", "")
-        if config.get("b-publisher-group-right", "")!="":
-            publishergroup.attrib["prefix"] = config.get("b-publisher-group-right", "")
+        publishergroup = self.query.first("group", self.macros.get("publisher", None))
+        if config.b_publisher_group_left!="":
+            publishergroup.attrib["prefix"] = config.b_publisher_group_left
+        if config.b_publisher_group_right!="":
+            publishergroup.attrib["prefix"] = config.b_publisher_group_right
+        timing.lap("access")
         """
         Access
         """
         #remove prefix from access in layout
-        a = self.bibliographylayout.xpath("z:text[@macro='access"+self.langsuffix+"']", namespaces=self.tools.ns)[0]
+        a = self.query.first("macro-call", self.bibliographylayout, macro="access", langsuffix=self.langsuffix)
         if "prefix" in a.attrib:
             a.attrib.pop("prefix")
         
         access = self.macros.get("access", None)
-        group = access.xpath("z:group", namespaces=self.tools.ns)[0]
+        group = self.query.first("group", access)
         group.attrib.pop("delimiter")
-        urldoi = access.xpath("z:group/z:choose/z:if[@type='legal_case']", namespaces=self.tools.ns)[0].getparent()
+        urldoi = self.query.first("group/choose/if[@type='legal_case']", access).getparent()
         urldoi.getparent().insert(0, urldoi)
-        issuedgroup = access.xpath("z:group/z:choose/z:if[@type='webpage post-weblog']", namespaces=self.tools.ns)[0]
-        accessed = access.xpath("z:group/z:choose/z:if[@variable='issued']/z:group", namespaces=self.tools.ns)[0]
+        issuedgroup = self.query.first("group/choose/if[@type='webpage post-weblog']", access)
+        accessed = self.query.first("group/choose/if[@variable='issued']/group", access)
         
         # Prefix url and doi
-        if config.get("b-url-left", "")!="":
-            url = access.xpath("z:group/z:choose/z:if[@type='legal_case']/z:choose/z:else/z:text", namespaces=self.tools.ns)[0]
-            url.attrib["prefix"] = config.get("b-url-left", "")
+        if config.b_url_left!="":
+            url = self.query.first("group/choose/if[@type='legal_case']/choose/else/text", access)
+            url.attrib["prefix"] = config.b_url_left
         
-        if config.get("b-doi-left", "")!="":
-            doi = access.xpath("z:group/z:choose/z:if[@type='legal_case']/z:choose/z:if/z:text", namespaces=self.tools.ns)[0]
-            doi.attrib["prefix"] = config.get("b-doi-left", "")
+        if config.b_doi_left!="":
+            doi = self.query.first("group/choose/if[@type='legal_case']/choose/if/text", access)
+            doi.attrib["prefix"] = config.b_doi_left
         
-        if not config.get("b-accessed-label-added", False):
-            accessedlabel = access.xpath("z:group/z:choose/z:if[@variable='issued']/z:group/z:text", namespaces=self.tools.ns)[0]
+        if not config.b_accessed_label_added:
+            accessedlabel = self.query.first("group/choose/if[@variable='issued']/group/text", access)
             accessed.remove(accessedlabel)
        
         issuedgroup.insert(0, accessed)
@@ -650,51 +669,51 @@ class Processor:
        
         
         #remove issued date = force accessed date
-        issued = access.xpath("z:group/z:choose/z:if[@type='webpage post-weblog']/z:date", namespaces=self.tools.ns)[0]
+        issued = self.query.first("group/choose/if[@type='webpage post-weblog']/date", access)
         issuedgroup.remove(issued)
         
         if self.mainconfig.get("language", "Japanese")=="English":
-            if config.get("b-accessed-left-en", "")!="":
-                value = config.get("b-accessed-left-en", "")
+            if config.b_accessed_left_en!="":
+                value = config.b_accessed_left_en
                 accessed.attrib["prefix"] = value
-            if config.get("b-accessed-right-en", "")!="":
-                value = config.get("b-accessed-right-en", "")
+            if config.b_accessed_right_en!="":
+                value = config.b_accessed_right_en
                 accessed.attrib["suffix"] = value
         else:
-            if config.get("b-accessed-left", "")!="":
-                value = config.get("b-accessed-left", "")
+            if config.b_accessed_left!="":
+                value = config.b_accessed_left
                 accessed.attrib["prefix"] = value
-            if config.get("b-accessed-right", "")!="":
-                value = config.get("b-accessed-right", "")
+            if config.b_accessed_right!="":
+                value = config.b_accessed_right
                 accessed.attrib["suffix"] = value
         
-        accessed.attrib["delimiter"] = config.get("b-accessed-label-right", "")
+        accessed.attrib["delimiter"] = config.b_accessed_label_right
         
         #Format accessed date
-        if config.get("b-accessed-format", "")!="":
-            accesseddate = accessed.xpath("z:date", namespaces=self.tools.ns)[0]
+        if config.b_accessed_format!="":
+            accesseddate = self.query.first("date", accessed)
             if self.mainconfig.get("language", "Japanese")=="English":
-                self.tools.formatdate(accesseddate, config.get("b-accessed-format-en", ""))
+                self.tools.formatdate(accesseddate, config.b_accessed_format_en)
             else:
-                self.tools.formatdate(accesseddate, config.get("b-accessed-format", ""))
+                self.tools.formatdate(accesseddate, config.b_accessed_format)
         
         
         # access block (new line)
-        if config.get("b-access-display-newline", False):
-            access = self.bibliographylayout.xpath("z:text[@macro='access"+self.langsuffix+"']", namespaces=self.tools.ns)[0]
+        if config.b_access_display_newline:
+            access = self.query.first("macro-call", self.bibliographylayout, macro="access", langsuffix=self.langsuffix)
             group = self.tools.appendchild(access.getparent(), "group", None, {"display":"indent"})
             group.insert(0, access)
         
         # Move the second part to a block
-        if config.get("b-contributors-display-block", False):
-            group = self.bibliographylayout.xpath("z:group", namespaces=self.tools.ns)[0]
-            contributors = group.xpath("z:text", namespaces=self.tools.ns)[0]
-            texts = self.bibliographylayout.xpath("z:text", namespaces=self.tools.ns)
+        if config.b_contributors_display_block:
+            group = self.query.first("group", self.bibliographylayout)
+            contributors = self.query.first("text", group)
+            texts = self.query.all("text", self.bibliographylayout)
             self.bibliographylayout.insert(0, contributors)
             group.attrib["display"] = "block"
             for text in texts:
                 group.append(text)
             
         # substitute subsequent authors
-        if config.get("b-contributors-substitute-subsequent", "")!="":    
-            self.bibliographylayout.getparent().attrib["subsequent-author-substitute"] = config.get("b-contributors-substitute-subsequent", "")
\ No newline at end of file
+        if config.b_contributors_substitute_subsequent!="":    
+            self.bibliographylayout.getparent().attrib["subsequent-author-substitute"] = config.b_contributors_substitute_subsequent
\ No newline at end of file
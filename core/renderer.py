@@ -0,0 +1,1180 @@
+import re, hashlib
+from lxml import etree as ET
+from . import locales, collation
+
+# Compiled CSL renderer for the generated styles.
+#
+# Every element of a style is compiled once into a Python closure taking a
+# render context and returning (text, flag), where flag tells whether the
+# element called a variable and whether that variable rendered anything:
+# groups are suppressed when they called variables and all of them were empty.
+# Compiled styles are cached by the digest of the style and the output format.
+
+csl = "{http://purl.org/net/xbiblio/csl}"
+xmllang = "{http://www.w3.org/XML/1998/namespace}lang"
+
+# Version of the rendered output, to be raised by any change that alters the
+# text of an entry: render caches drop the entries of other versions
+version = 1
+
+# Group suppression flags
+NONE, EMPTY, FILLED = 0, 1, 2
+
+namevariables = ["author", "chair", "collection-editor", "compiler", "composer", "container-author", "contributor", "curator", "director", "editor", "editorial-director", "editortranslator", "executive-producer", "guest", "host", "illustrator", "interviewer", "narrator", "organizer", "original-author", "performer", "producer", "recipient", "reviewed-author", "script-writer", "series-creator", "translator"]
+datevariables = ["accessed", "available-date", "event-date", "issued", "original-date", "submitted"]
+rawvariables = ["DOI", "ISBN", "ISSN", "PMCID", "PMID", "URL"]
+numericpattern = re.compile(r"^\s*[a-zA-Z]?\d+[a-zA-Z]*(\s*[-–,&]\s*[a-zA-Z]?\d+[a-zA-Z]*)*\s*$")
+cjkpattern = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]")
+doipattern = re.compile(r"^\s*https?://(dx\.)?doi\.org/", re.IGNORECASE)
+notepattern = re.compile(r"^\s*([a-z][a-z-]*[a-z])\s*:\s*(.+?)\s*$", re.MULTILINE)
+wordpattern = re.compile(r"<[^>]*>|&#?\w+;|[\s\-–—/]+|[^\s\-–—/<&]+|[<&]")
+punctuation = "\"'“”‘’()[]{}.,;:!?"
+# CSL stop words and the single-word prepositions citeproc-js also keeps lowercase
+stopwords = set("a an and as at but by down for from in into nor of on onto or over so the till to up via with yet".split()+"about above across after against along amid among around before behind below beneath beside between beyond circa despite during except inside like near off out per since than through throughout toward towards under underneath until unto upon versus vs within without".split())
+
+class Context:
+    __slots__ = ["item", "locator", "label", "position", "suppressed", "reads", "sorting", "firstnames", "suppressauthor"]
+
+    def __init__(self, item, locator=None, label=None, position="first", sorting=False, suppressauthor=False):
+        self.item = item
+        self.locator = locator
+        self.label = label if label is not None else ("page" if locator else None)
+        self.position = position
+        self.suppressed = None
+        self.reads = None
+        self.sorting = sorting
+        self.firstnames = None
+        self.suppressauthor = suppressauthor
+
+# Output formats
+class TextFormat:
+    name = "text"
+
+    # Documents are written as opening, one line per entry, closing
+    opening = ""
+    closing = ""
+
+    def escape(self, text):
+        return text
+
+    def style(self, text, attrib):
+        return text
+
+    def display(self, text, mode):
+        return "\n"+text if mode in ["block", "indent"] else text
+
+    def entry(self, text):
+        return re.sub(r"\n+", "\n", text).strip()
+
+    def line(self, entry):
+        return entry+"\n"
+
+    def document(self, entries):
+        return self.opening+"".join([self.line(x) for x in entries])+self.closing
+
+class HtmlFormat(TextFormat):
+    name = "html"
+    opening = '<div class="csl-bib-body">\n'
+    closing = "</div>\n"
+    styles = {
+        ("font-style", "italic"): ("<i>", "</i>"),
+        ("font-style", "oblique"): ("<i>", "</i>"),
+        ("font-weight", "bold"): ("<b>", "</b>"),
+        ("font-variant", "small-caps"): ('<span style="font-variant:small-caps;">', "</span>"),
+        ("text-decoration", "underline"): ('<span style="text-decoration:underline;">', "</span>"),
+        ("vertical-align", "sup"): ("<sup>", "</sup>"),
+        ("vertical-align", "sub"): ("<sub>", "</sub>"),
+    }
+
+    def escape(self, text):
+        return text.replace("&", "&#38;").replace("<", "&#60;").replace(">", "&#62;")
+
+    def style(self, text, attrib):
+        for key in attrib:
+            tags = self.styles.get((key, attrib[key]), None)
+            if tags is not None:
+                text = tags[0]+text+tags[1]
+        return text
+
+    def display(self, text, mode):
+        return '<div class="csl-'+mode+'">'+text+"</div>"
+
+    def entry(self, text):
+        return '<div class="csl-entry">'+text.strip()+"</div>"
+
+    def line(self, entry):
+        return "  "+entry+"\n"
+
+class RtfFormat(TextFormat):
+    name = "rtf"
+    opening = "{\\rtf1\\ansi\\deff0\n"
+    closing = "}\n"
+    styles = {
+        ("font-style", "italic"): "\\i ",
+        ("font-style", "oblique"): "\\i ",
+        ("font-weight", "bold"): "\\b ",
+        ("font-variant", "small-caps"): "\\scaps ",
+        ("text-decoration", "underline"): "\\ul ",
+        ("vertical-align", "sup"): "\\super ",
+        ("vertical-align", "sub"): "\\sub ",
+    }
+
+    def escape(self, text):
+        text = text.replace("\\", "\\\\").replace("{", "\\{").replace("}", "\\}")
+        out = []
+        for c in text:
+            code = ord(c)
+            if code<128:
+                out.append(c)
+            elif code<0x10000:
+                out.append("\\uc0\\u"+str(code if code<0x8000 else code-0x10000)+" ")
+            else:
+                code -= 0x10000
+                for unit in [0xd800+(code>>10), 0xdc00+(code & 0x3ff)]:
+                    out.append("\\uc0\\u"+str(unit-0x10000)+" ")
+        return "".join(out)
+
+    def style(self, text, attrib):
+        for key in attrib:
+            control = self.styles.get((key, attrib[key]), None)
+            if control is not None:
+                text = "{"+control+text+"}"
+        return text
+
+    def display(self, text, mode):
+        return "\\line "+text if mode in ["block", "indent"] else text
+
+    def entry(self, text):
+        return text.strip()
+
+    def line(self, entry):
+        return entry+"\\par\n"
+
+formats = {"text": TextFormat, "html": HtmlFormat, "rtf": RtfFormat}
+
+# Locale: style <locale> elements first, then the built-in terms of the
+# language, then the built-in English terms. English is a fallback per term:
+# the forms of a term the language defines are never mixed with English ones.
+class Locale:
+    def __init__(self, root, lang):
+        self.lang = lang
+        language = lang.split("-")[0]
+        self.terms = {}
+        self.options = {}
+        tables = [self.styleterms(root, l) for l in [None, language, lang]]
+        tables.insert(0, locales.builtin.get(language, {}))
+        for table in tables:
+            for name in table:
+                self.terms.setdefault(name, {}).update(table[name])
+        self.english = locales.builtin["en"]
+        for locale in root.iterfind(csl+"locale"):
+            if locale.attrib.get(xmllang, None) in [None, language, lang]:
+                for options in locale.iterfind(csl+"style-options"):
+                    self.options.update(options.attrib)
+        self.dates = locales.dates.get(language, locales.dates["en"])
+
+    def styleterms(self, root, lang):
+        table = {}
+        for locale in root.iterfind(csl+"locale"):
+            if locale.attrib.get(xmllang, None)!=lang:
+                continue
+            for term in locale.iterfind(csl+"terms/"+csl+"term"):
+                single = term.find(csl+"single")
+                multiple = term.find(csl+"multiple")
+                if single is not None or multiple is not None:
+                    value = ((single.text or "") if single is not None else "", (multiple.text or "") if multiple is not None else "")
+                else:
+                    value = (term.text or "", term.text or "")
+                table.setdefault(term.attrib["name"], {})[term.attrib.get("form", "long")] = value
+        return table
+
+    fallbacks = {"verb-short": ["verb-short", "verb", "long"], "symbol": ["symbol", "short", "long"], "short": ["short", "long"], "verb": ["verb", "long"], "long": ["long"]}
+
+    def term(self, name, form="long", plural=False):
+        for terms in [self.terms, self.english]:
+            forms = terms.get(name, {})
+            for f in self.fallbacks.get(form, ["long"]):
+                if f in forms:
+                    return forms[f][1 if plural else 0]
+        return ""
+
+# Variables
+def normalize(item):
+    """
+    CSL-JSON item with numbers as strings and the "key: value" lines of the
+    note field (e.g. name-kana) added as variables. As in citeproc-js, name
+    lines are "family || given" (one line per name, a literal name without
+    "||") and date lines are raw dates.
+    """
+    item = dict(item)
+    for key in item:
+        if isinstance(item[key], (int, float)) and not isinstance(item[key], bool):
+            item[key] = str(item[key])
+    note = item.get("note", "")
+    if isinstance(note, str) and ":" in note:
+        names = {}
+        for key, value in notepattern.findall(note):
+            if key in namevariables:
+                names.setdefault(key, []).append(notename(value))
+            elif key in datevariables:
+                item.setdefault(key, {"raw": value})
+            elif key not in item:
+                item[key] = value
+        for key in names:
+            if key not in item:
+                item[key] = names[key]
+    return item
+
+def notename(value):
+    if "||" not in value:
+        return {"literal": value}
+    family, given = [x.strip() for x in value.split("||", 1)]
+    return {"family": family, "given": given} if given else {"family": family}
+
+def isnumeric(value):
+    return bool(numericpattern.match(value))
+
+def capitalize(word):
+    for i, c in enumerate(word):
+        if c.isalpha():
+            return word[:i]+c.upper()+word[i+1:]
+    return word
+
+def textcase(text, case):
+    """
+    Words are split at spaces, hyphens and slashes; markup is left alone.
+    Sentence case capitalizes the first word and lowercases the others
+    unless they have capitals after their first letter (acronyms,
+    McNamara). Title case capitalizes lowercase words except stop words
+    inside the title; the first and last word and the word after a colon
+    are always capitalized. As in citeproc-js, capitalized words are kept.
+    Both lowercase uppercase strings first.
+    """
+    if case=="lowercase":
+        return text.lower()
+    if case=="uppercase":
+        return text.upper()
+    if case not in ["capitalize-first", "capitalize-all", "sentence", "title"]:
+        return text
+    upper = case in ["sentence", "title"] and text.isupper()
+    tokens = wordpattern.findall(text)
+    words = [i for i, x in enumerate(tokens) if x[:1] not in "<&" and any(c.isalpha() for c in x)]
+    first = True
+    for n, i in enumerate(words):
+        word = tokens[i].lower() if upper else tokens[i]
+        if case=="capitalize-first":
+            word = capitalize(word) if first and word==word.lower() else word
+        elif case=="capitalize-all":
+            word = capitalize(word) if word==word.lower() else word
+        elif case=="sentence":
+            if word[1:]==word[1:].lower():
+                word = capitalize(word) if first else word.lower()
+        elif first or n==len(words)-1 or word.strip(punctuation).lower() not in stopwords:
+            word = capitalize(word) if word==word.lower() else word
+        tokens[i] = word
+        first = case=="title" and word.endswith(":")
+    return "".join(tokens)
+
+def pagerange(value, format, delimiter):
+    parts = re.split(r"\s*[-–]+\s*", value)
+    if len(parts)!=2 or not parts[0].isdigit() or not parts[1].isdigit():
+        return value.replace("-", delimiter) if len(parts)==2 else value
+    first, last = parts
+    if len(last)<len(first):
+        last = first[:len(first)-len(last)]+last
+    if format=="minimal" or format=="minimal-two" or format=="chicago":
+        if format=="chicago":
+            n = int(first)
+            if n<100 or n%100==0:
+                return first+delimiter+last
+            if n%100<10:
+                format = "minimal"
+            elif len(first)==4 and sum(1 for a, b in zip(first, last) if a!=b)>=3:
+                return first+delimiter+last
+            else:
+                format = "minimal-two"
+        i = 0
+        while i<len(first)-1 and first[i]==last[i]:
+            i += 1
+        if format=="minimal-two" and len(last)-i<2:
+            i = max(0, len(last)-2)
+        last = last[i:]
+    return first+delimiter+last
+
+def ordinal(locale, number):
+    n = int(number)
+    if 11<=n%100<=13:
+        suffix = locale.term("ordinal-%02d" % (n%100)) or locale.term("ordinal")
+    else:
+        suffix = locale.term("ordinal-%02d" % (n%10)) if n%10 in [1, 2, 3] else ""
+        suffix = suffix or locale.term("ordinal")
+    return str(n)+suffix
+
+def dateparts(value):
+    """
+    List of [year, month, day] from a CSL-JSON date (date-parts or raw ISO)
+    """
+    if isinstance(value, dict):
+        if "date-parts" in value and value["date-parts"] and value["date-parts"][0]:
+            return [[int(x) for x in part if str(x).lstrip("-").isdigit()] for part in value["date-parts"] if part]
+        raw = value.get("raw", "")
+    else:
+        raw = str(value)
+    parts = []
+    for date in re.split(r"/", raw):
+        match = re.match(r"^\s*(-?\d{1,4})(?:-(\d{1,2}))?(?:-(\d{1,2}))?", date)
+        if match:
+            parts.append([int(x) for x in match.groups() if x is not None])
+    return parts
+
+def literaldate(value):
+    if isinstance(value, dict):
+        if "literal" in value:
+            return value["literal"]
+        if not dateparts(value) and value.get("raw", ""):
+            return value["raw"]
+    return ""
+
+def namesortkey(name):
+    if "literal" in name:
+        return name["literal"]
+    return " ".join([x for x in [name.get("non-dropping-particle", ""), name.get("family", ""), name.get("dropping-particle", ""), name.get("given", "")] if x])
+
+# Compiled style
+class CompiledStyle:
+    def __init__(self, root, format="text"):
+        self.root = root
+        self.format = formats[format]()
+        self.lang = root.attrib.get("default-locale", "en-US")
+        self.locales = {}
+        self.pageformat = root.attrib.get("page-range-format", None)
+        self.macros = {}
+        self.rootoptions = self.nameoptions(root, {})
+        for macro in root.iterfind(csl+"macro"):
+            self.macros[macro.attrib["name"]] = None
+
+        # Macros are compiled once per locale, on first use by a layout
+        self.compiled = {}
+
+        self.citation = self.compilesection(root.find(csl+"citation"))
+        self.bibliography = self.compilesection(root.find(csl+"bibliography"))
+
+    def locale(self, lang):
+        if lang not in self.locales:
+            self.locales[lang] = Locale(self.root, lang)
+        return self.locales[lang]
+
+    def nameoptions(self, element, inherited):
+        options = dict(inherited)
+        for key in ["et-al-min", "et-al-use-first", "et-al-subsequent-min", "et-al-subsequent-use-first", "and", "delimiter-precedes-last", "delimiter-precedes-et-al", "initialize-with", "initialize", "name-as-sort-order", "sort-separator", "name-form", "name-delimiter", "names-delimiter"]:
+            if key in element.attrib:
+                options[key] = element.attrib[key]
+        return options
+
+    def compilesection(self, section):
+        if section is None:
+            return None
+        options = self.nameoptions(section, self.rootoptions)
+        layouts = {}
+        for layout in section.iterfind(csl+"layout"):
+            langs = layout.attrib.get("locale", "").split()
+            lang = langs[0] if langs else self.lang
+            locale = self.locale(lang)
+            compiled = (self.compilechildren(layout, options, locale, ""), layout.attrib.get("prefix", ""), layout.attrib.get("suffix", ""), layout.attrib.get("delimiter", ""), dict(layout.attrib), locale)
+            for l in langs or [None]:
+                layouts[l] = compiled
+        sort = []
+        for key in section.iterfind(csl+"sort/"+csl+"key"):
+            sort.append((key.attrib.get("variable", None), key.attrib.get("macro", None), key.attrib.get("sort", "ascending")=="descending"))
+        return {"options": options, "layouts": layouts, "sort": sort, "attrib": dict(section.attrib)}
+
+    def macro(self, name, options, locale):
+        key = (name, locale.lang, tuple(sorted(options.items())))
+        if key not in self.compiled:
+            element = self.root.find(csl+"macro[@name='"+name+"']")
+            if element is None:
+                raise KeyError("Macro '"+name+"' is not defined in the style")
+            self.compiled[key] = None
+            self.compiled[key] = self.compilechildren(element, options, locale, "")
+        compiled = self.compiled
+        return lambda ctx: compiled[key](ctx)
+
+    def compilechildren(self, element, options, locale, delimiter):
+        children = [self.compile(child, options, locale) for child in element if isinstance(child.tag, str)]
+        children = [c for c in children if c is not None]
+        if len(children)==1:
+            return children[0]
+
+        def render(ctx):
+            out = []
+            flag = NONE
+            for child in children:
+                text, f = child(ctx)
+                if f>flag:
+                    flag = f
+                if text:
+                    out.append(text)
+            return punctuate(delimiter, out), flag
+        return render
+
+    def compile(self, element, options, locale):
+        tag = element.tag.replace(csl, "")
+        compiler = getattr(self, "compile"+tag.replace("-", ""), None)
+        if compiler is None:
+            return None
+        return compiler(element, options, locale)
+
+    def decorate(self, element, inner, locale, escape=True):
+        """
+        Wrap a raw-text producer with text-case, quotes, formatting, affixes and display
+        """
+        a = element.attrib
+        fmt = self.format
+        case = a.get("text-case", None)
+        strip = a.get("strip-periods", "false")=="true"
+        quotes = a.get("quotes", "false")=="true"
+        styles = {k: a[k] for k in ["font-style", "font-variant", "font-weight", "text-decoration", "vertical-align"] if k in a}
+        prefix = fmt.escape(a.get("prefix", ""))
+        suffix = fmt.escape(a.get("suffix", ""))
+        display = a.get("display", None)
+        openquote = fmt.escape(locale.term("open-quote"))
+        closequote = fmt.escape(locale.term("close-quote"))
+        inquote = locale.options.get("punctuation-in-quote", "false")=="true"
+        if not (escape and type(fmt).escape is not TextFormat.escape) and not (case or strip or quotes or styles or prefix or suffix or display):
+            return inner
+
+        def render(ctx):
+            text, flag = inner(ctx)
+            if not text:
+                return "", flag
+            if strip:
+                text = text.replace(".", "")
+            if case is not None:
+                text = textcase(text, case)
+            if escape:
+                text = fmt.escape(text)
+            end = suffix[1:] if suffix[:1]=="." and text.endswith(".") else suffix
+            if quotes:
+                if inquote and end[:1] in [".", ","]:
+                    text = text+end[:1]
+                    end = end[1:]
+                text = openquote+text+closequote
+            if styles:
+                text = fmt.style(text, styles)
+            text = prefix+text+end
+            if display is not None:
+                text = fmt.display(text, display)
+            return text, flag
+        return render
+
+    """
+    Rendering elements
+    """
+    def compilelayout(self, element, options, locale):
+        return None
+
+    def compiletext(self, element, options, locale):
+        a = element.attrib
+        if "macro" in a:
+            return self.decorate(element, self.macro(a["macro"], options, locale), locale, False)
+        if "value" in a:
+            value = a["value"]
+            return self.decorate(element, lambda ctx: (value, NONE), locale)
+        if "term" in a:
+            value = locale.term(a["term"], a.get("form", "long"), a.get("plural", "false")=="true")
+            return self.decorate(element, lambda ctx: (value, NONE), locale)
+        variable = a.get("variable", None)
+        if variable is None:
+            return None
+        form = a.get("form", "long")
+        pageformat = self.pageformat
+        delimiter = locale.term("page-range-delimiter") or "–"
+
+        def render(ctx):
+            value = self.variable(ctx, variable, form)
+            if not value:
+                return "", EMPTY
+            if variable=="page" and pageformat is not None:
+                value = pagerange(value, pageformat, delimiter)
+            elif variable=="DOI":
+                # The style adds its own https://doi.org/ prefix
+                value = doipattern.sub("", value)
+            if variable not in rawvariables:
+                # Typographic apostrophes, as citeproc-js
+                value = value.replace("'", "’")
+            return value, FILLED
+        return self.decorate(element, render, locale)
+
+    def variable(self, ctx, variable, form="long"):
+        if ctx.reads is not None:
+            ctx.reads.append(variable)
+        if ctx.suppressed is not None and variable in ctx.suppressed:
+            return ""
+        if variable=="locator":
+            return ctx.locator or ""
+        if form=="short":
+            value = ctx.item.get(variable+"-short", None) or ctx.item.get(variable, "")
+        else:
+            value = ctx.item.get(variable, "")
+        if not isinstance(value, str):
+            return ""
+        return value
+
+    def compilenumber(self, element, options, locale):
+        variable = element.attrib.get("variable", None)
+        form = element.attrib.get("form", "numeric")
+
+        def render(ctx):
+            value = self.variable(ctx, variable)
+            if not value:
+                return "", EMPTY
+            if form in ["ordinal", "long-ordinal"] and value.isdigit():
+                value = ordinal(locale, value)
+            elif form=="roman" and value.isdigit():
+                value = roman(int(value))
+            return value, FILLED
+        return self.decorate(element, render, locale)
+
+    def compilelabel(self, element, options, locale):
+        variable = element.attrib.get("variable", None)
+        form = element.attrib.get("form", "long")
+        plural = element.attrib.get("plural", "contextual")
+
+        def render(ctx):
+            if variable=="locator":
+                value = ctx.locator or ""
+                term = ctx.label or "page"
+            else:
+                value = self.variable(ctx, variable)
+                term = variable
+            if not value:
+                return "", NONE
+            if plural=="always":
+                many = True
+            elif plural=="never":
+                many = False
+            else:
+                many = len(re.findall(r"\d+", value))>1 and bool(re.search(r"[-–,&]", value))
+            return locale.term(term, form, many), NONE
+        return self.decorate(element, render, locale)
+
+    def compilegroup(self, element, options, locale):
+        inner = self.compilechildren(element, options, locale, element.attrib.get("delimiter", ""))
+
+        def render(ctx):
+            text, flag = inner(ctx)
+            if flag==EMPTY:
+                return "", EMPTY
+            return text, flag
+        return self.decorate(element, render, locale, False)
+
+    def compilechoose(self, element, options, locale):
+        branches = []
+        for branch in element:
+            if not isinstance(branch.tag, str):
+                continue
+            tag = branch.tag.replace(csl, "")
+            test = self.condition(branch) if tag!="else" else (lambda ctx: True)
+            branches.append((test, self.compilechildren(branch, options, locale, "")))
+
+        def render(ctx):
+            for test, body in branches:
+                if test(ctx):
+                    return body(ctx)
+            return "", NONE
+        return render
+
+    def condition(self, branch):
+        a = branch.attrib
+        match = a.get("match", "all")
+        tests = []
+        types = a.get("type", "").split()
+        if match!="all" and len(types)>1:
+            types = frozenset(types)
+            tests.append(lambda ctx: ctx.item.get("type", "") in types)
+        else:
+            for t in types:
+                tests.append(lambda ctx, t=t: ctx.item.get("type", "")==t)
+        for v in a.get("variable", "").split():
+            tests.append(lambda ctx, v=v: self.hasvariable(ctx, v))
+        for v in a.get("is-numeric", "").split():
+            tests.append(lambda ctx, v=v: isnumeric(self.value(ctx, v)))
+        for v in a.get("is-uncertain-date", "").split():
+            tests.append(lambda ctx, v=v: isinstance(ctx.item.get(v, None), dict) and bool(ctx.item[v].get("circa", False)))
+        for l in a.get("locator", "").split():
+            tests.append(lambda ctx, l=l: bool(ctx.locator) and (ctx.label or "page")==l)
+        for p in a.get("position", "").split():
+            tests.append(lambda ctx, p=p: position(ctx.position, p))
+        if "disambiguate" in a:
+            tests.append(lambda ctx: False)
+
+        if len(tests)==1:
+            test = tests[0]
+            return (lambda ctx: not test(ctx)) if match=="none" else test
+        if match=="any":
+            return lambda ctx: any(test(ctx) for test in tests)
+        if match=="none":
+            return lambda ctx: not any(test(ctx) for test in tests)
+        return lambda ctx: all(test(ctx) for test in tests)
+
+    def value(self, ctx, variable):
+        if variable=="locator":
+            return ctx.locator or ""
+        value = ctx.item.get(variable, "")
+        return value if isinstance(value, str) else ""
+
+    def hasvariable(self, ctx, variable):
+        if variable=="locator":
+            return bool(ctx.locator)
+        if ctx.suppressed is not None and variable in ctx.suppressed:
+            return False
+        value = ctx.item.get(variable, None)
+        if isinstance(value, dict):
+            return bool(dateparts(value)) or bool(literaldate(value))
+        return bool(value)
+
+    def compiledate(self, element, options, locale):
+        a = element.attrib
+        variable = a.get("variable", None)
+        form = a.get("form", None)
+        limit = {"year": 1, "year-month": 2, "year-month-day": 3}[a.get("date-parts", "year-month-day")]
+        delimiter = a.get("delimiter", "")
+        children = {}
+        order = []
+        for part in element.iterfind(csl+"date-part"):
+            children[part.attrib["name"]] = part.attrib
+            order.append(part.attrib["name"])
+
+        if form is not None:
+            parts = []
+            for name, partform, prefix, suffix in locale.dates.get(form, locale.dates["text"]):
+                if {"year": 1, "month": 2, "day": 3}[name]>limit:
+                    continue
+                override = children.get(name, {})
+                parts.append((name, override.get("form", partform), override.get("prefix", prefix), override.get("suffix", suffix), override.get("text-case", None)))
+            localized = True
+        else:
+            parts = [(name, children[name].get("form", "long" if name=="month" else ("numeric" if name=="day" else "long")), children[name].get("prefix", ""), children[name].get("suffix", ""), children[name].get("text-case", None)) for name in order]
+            localized = False
+        fmt = self.format
+
+        def single(date):
+            out = []
+            for name, partform, prefix, suffix, case in parts:
+                index = {"year": 0, "month": 1, "day": 2}[name]
+                if index>=len(date):
+                    continue
+                text = self.datepart(locale, name, date[index], partform)
+                if case is not None:
+                    text = textcase(text, case)
+                out.append((prefix, text, suffix))
+            if localized and out:
+                # The last part keeps no trailing separator of the localized format
+                last = out[-1]
+                out[-1] = (last[0], last[1], "" if last[2] in [" ", ", ", "/"] else last[2])
+            return delimiter.join([fmt.escape(p+t+s) for p, t, s in out])
+
+        def render(ctx):
+            value = ctx.item.get(variable, None)
+            if ctx.reads is not None:
+                ctx.reads.append(variable)
+            if value is None or (ctx.suppressed is not None and variable in ctx.suppressed):
+                return "", EMPTY
+            literal = literaldate(value)
+            if literal:
+                return fmt.escape(literal), FILLED
+            dates = dateparts(value)
+            if not dates:
+                return "", EMPTY
+            return "–".join([x for x in [single(d) for d in dates] if x]), FILLED
+        return self.decorate(element, render, locale, False)
+
+    def datepart(self, locale, name, value, form):
+        if name=="year":
+            return str(value)[-2:] if form=="short" else str(value)
+        if name=="month":
+            if value>12:
+                return locale.term("season-%02d" % (value-12)) or str(value)
+            if form=="numeric":
+                return str(value)
+            if form=="numeric-leading-zeros":
+                return "%02d" % value
+            return locale.term("month-%02d" % value, "short" if form=="short" else "long")
+        if form=="numeric-leading-zeros":
+            return "%02d" % value
+        if form=="ordinal":
+            return ordinal(locale, value)
+        return str(value)
+
+    def compilenames(self, element, options, locale, inherited=None):
+        a = element.attrib
+        variables = a.get("variable", "").split()
+        options = self.nameoptions(element, options)
+        delimiter = a.get("delimiter", options.get("names-delimiter", ""))
+        nameelement = element.find(csl+"name")
+        labelelement = element.find(csl+"label")
+        etalelement = element.find(csl+"et-al")
+        substitute = element.find(csl+"substitute")
+        if inherited is not None and nameelement is None and labelelement is None:
+            nameelement, labelelement, etalelement = inherited
+
+        # Label before or after the name
+        labelfirst = False
+        if labelelement is not None and nameelement is not None:
+            children = list(labelelement.getparent())
+            labelfirst = nameelement not in children or children.index(labelelement)<children.index(nameelement)
+        nameattrib = dict(nameelement.attrib) if nameelement is not None else {}
+        nameoptions = self.nameoptions(nameelement, options) if nameelement is not None else options
+        if "delimiter" in nameattrib:
+            nameoptions["name-delimiter"] = nameattrib["delimiter"]
+        if "form" in nameattrib:
+            nameoptions["name-form"] = nameattrib["form"]
+        nameparts = {}
+        if nameelement is not None:
+            for part in nameelement.iterfind(csl+"name-part"):
+                nameparts[part.attrib["name"]] = part.attrib
+        labelform = labelelement.attrib.get("form", "long") if labelelement is not None else None
+        labeldecorate = self.decorate(labelelement, lambda ctx: (ctx.reads, NONE), locale) if labelelement is not None else None
+        etalterm = etalelement.attrib.get("term", "et-al") if etalelement is not None else "et-al"
+        namedecorate = self.decorate(nameelement, lambda ctx: (ctx.reads, NONE), locale, False) if nameelement is not None else None
+        substitutes = []
+        if substitute is not None:
+            for child in substitute:
+                if not isinstance(child.tag, str):
+                    continue
+                if child.tag==csl+"names":
+                    substitutes.append(self.compilenames(child, options, locale, (nameelement, labelelement, etalelement)))
+                else:
+                    compiled = self.compile(child, options, locale)
+                    if compiled is not None:
+                        substitutes.append(compiled)
+        fmt = self.format
+
+        def renderlist(ctx, names, role):
+            text = self.namelist(ctx, names, nameattrib, nameoptions, nameparts, locale, etalterm)
+            if namedecorate is not None:
+                text = namedecorate(NameText(ctx, text))[0]
+            if labelelement is not None:
+                term = locale.term(role, labelform, len(names)>1)
+                if term:
+                    label = labeldecorate(NameText(ctx, term))[0]
+                    text = label+text if labelfirst else text+label
+            return text
+
+        def render(ctx):
+            lists = []
+            for variable in variables:
+                if ctx.reads is not None:
+                    ctx.reads.append(variable)
+                if ctx.suppressed is not None and variable in ctx.suppressed:
+                    continue
+                names = ctx.item.get(variable, None)
+                if names:
+                    lists.append((variable, names))
+            if len(lists)==2 and lists[0][1]==lists[1][1] and set([lists[0][0], lists[1][0]])==set(["editor", "translator"]):
+                lists = [("editortranslator", lists[0][1])]
+            if lists:
+                if nameattrib.get("form", options.get("name-form", "long"))=="count":
+                    return fmt.escape(str(sum(len(names) for v, names in lists))), FILLED
+                text = delimiter.join([renderlist(ctx, names, role) for role, names in lists])
+                if ctx.firstnames is None:
+                    ctx.firstnames = text
+                return text, FILLED
+            for compiled in substitutes:
+                reads = ctx.reads
+                ctx.reads = []
+                text, flag = compiled(ctx)
+                used = ctx.reads
+                ctx.reads = reads
+                if reads is not None:
+                    reads.extend(used)
+                if text:
+                    if ctx.suppressed is None:
+                        ctx.suppressed = set()
+                    ctx.suppressed.update(used)
+                    return text, FILLED
+            return "", EMPTY
+        decorated = self.decorate(element, render, locale, False)
+        if inherited is not None:
+            return decorated
+
+        def suppressible(ctx):
+            text, flag = decorated(ctx)
+            if text and ctx.suppressauthor:
+                # suppress-author: the first names rendered, substitutes included
+                ctx.suppressauthor = False
+                return "", EMPTY
+            return text, flag
+        return suppressible
+
+    def namelist(self, ctx, names, attrib, options, parts, locale, etalterm):
+        fmt = self.format
+        if ctx.position in ["subsequent", "ibid", "ibid-with-locator"] and "et-al-subsequent-min" in options:
+            etalmin = int(options["et-al-subsequent-min"])
+            usefirst = int(options.get("et-al-subsequent-use-first", options.get("et-al-use-first", "1")))
+        else:
+            etalmin = int(options.get("et-al-min", "0") or 0)
+            usefirst = int(options.get("et-al-use-first", "1") or 1)
+        etal = etalmin>0 and len(names)>=etalmin and usefirst<len(names) and not ctx.sorting
+        shown = names[:usefirst] if etal else names
+        sortorder = "all" if ctx.sorting else options.get("name-as-sort-order", None)
+        form = options.get("name-form", "long")
+        delimiter = options.get("name-delimiter", ", ")
+        out = [self.name(n, i, sortorder, form, options, parts, locale) for i, n in enumerate(shown)]
+        out = [fmt.escape(x) for x in out if x]
+        if len(out)==0:
+            return ""
+        inverted = sortorder is not None
+        andform = options.get("and", None)
+        if etal:
+            precedes = options.get("delimiter-precedes-et-al", "contextual")
+            sep = delimiter if precedes=="always" or (precedes=="contextual" and len(out)>1) or (precedes=="after-inverted-name" and inverted) else " "
+            term = locale.term(etalterm)
+            if sep==" " and cjkpattern.search(out[-1][-1:]) and cjkpattern.search(term[:1]):
+                # 小澤ほか, as citeproc-js
+                sep = ""
+            return delimiter.join(out)+sep+fmt.escape(term)
+        if len(out)==1:
+            return out[0]
+        if andform in ["text", "symbol"]:
+            andterm = fmt.escape(locale.term("and", "symbol" if andform=="symbol" else "long"))
+            precedes = options.get("delimiter-precedes-last", "contextual")
+            if precedes=="always" or (precedes=="contextual" and len(out)>2) or (precedes=="after-inverted-name" and inverted and (sortorder=="all" or len(out)==2)):
+                last = delimiter+andterm+" "
+            else:
+                last = " "+andterm+" " if andterm.strip() else andterm
+            return delimiter.join(out[:-1])+last+out[-1]
+        return delimiter.join(out)
+
+    def name(self, name, index, sortorder, form, options, parts, locale):
+        if "literal" in name:
+            return name["literal"]
+        family = name.get("family", "")
+        given = name.get("given", "")
+        ndp = name.get("non-dropping-particle", "")
+        dp = name.get("dropping-particle", "")
+        suffix = name.get("suffix", "")
+        if ndp:
+            family = ndp+" "+family
+        familypart = parts.get("family", {})
+        givenpart = parts.get("given", {})
+
+        if cjkpattern.search(family+given):
+            # Japanese, Chinese and Korean names: family then given, no
+            # separator; as in citeproc-js, name-part affixes are not used
+            if form=="short":
+                return family
+            return family+given
+
+        if form=="short":
+            return nameaffix(family, familypart)
+        initialize = options.get("initialize-with", None)
+        if initialize is not None and given:
+            given = initials(given, initialize, options.get("initialize", "true")!="false")
+        if dp:
+            given = (given+" "+dp).strip()
+        if sortorder=="all" or (sortorder=="first" and index==0):
+            separator = options.get("sort-separator", ", ")
+            text = nameaffix(family, familypart)
+            if given:
+                text += separator+nameaffix(given, givenpart)
+            if suffix:
+                text += separator+suffix
+            return text
+        text = " ".join([x for x in [nameaffix(given, givenpart), nameaffix(family, familypart)] if x])
+        if suffix:
+            text += " "+suffix
+        return text
+
+    """
+    Public entry points
+    """
+    def layout(self, section, item):
+        layouts = section["layouts"]
+        language = item.get("language", "")
+        language = language.split("-")[0].lower() if isinstance(language, str) else ""
+        return layouts.get(language, None) or layouts.get(None, None) or list(layouts.values())[0]
+
+    def entry(self, item, sorting=False):
+        ctx = Context(item, sorting=sorting)
+        body, prefix, suffix, delimiter, attrib, locale = self.layout(self.bibliography, item)
+        text = body(ctx)[0]
+        if not text:
+            return "", ctx
+        fmt = self.format
+        styles = {k: attrib[k] for k in ["font-style", "font-variant", "font-weight", "text-decoration", "vertical-align"] if k in attrib}
+        if styles:
+            text = fmt.style(text, styles)
+        return fmt.escape(prefix)+text+fmt.escape(suffix), ctx
+
+    def cite(self, cite):
+        """
+        (text, first names rendered) of one cite
+        """
+        item = cite["item"]
+        ctx = Context(item, cite.get("locator", None), cite.get("label", None), cite.get("position", "first"), suppressauthor=cite.get("suppress-author", False))
+        body = self.layout(self.citation, item)[0]
+        return body(ctx)[0], ctx.firstnames
+
+class NameText:
+    """
+    Stand-in context handing a finished string to a decorate() wrapper
+    """
+    __slots__ = ["reads", "suppressed", "item"]
+
+    def __init__(self, ctx, text):
+        self.reads = text
+        self.suppressed = None
+        self.item = ctx.item
+
+def punctuate(delimiter, parts):
+    """
+    Join rendered parts without doubling a period ("n.d." + ". " -> "n.d. ")
+    """
+    if len(parts)<2:
+        return "".join(parts)
+    out = parts[0]
+    for part in parts[1:]:
+        joint = delimiter+part
+        if out.endswith(".") and joint.startswith("."):
+            joint = joint[1:]
+        out += joint
+    return out
+
+def nameaffix(text, attrib):
+    if not text:
+        return ""
+    if "text-case" in attrib:
+        text = textcase(text, attrib["text-case"])
+    return attrib.get("prefix", "")+text+attrib.get("suffix", "")
+
+def initials(given, initialize, full):
+    """
+    "John Paul" -> "J. P." and "Jean-Paul" -> "J.-P." for initialize-with=". "
+    """
+    out = ""
+    for word in given.split():
+        pieces = [piece for piece in word.split("-") if piece]
+        if not pieces:
+            continue
+        if full or all(len(piece.rstrip("."))==1 for piece in pieces):
+            out += "-".join([piece[0]+initialize.rstrip() for piece in pieces[:-1]]+[pieces[-1][0]+initialize])
+        else:
+            out += word+" "
+    return out.strip()
+
+def position(actual, test):
+    if test=="first":
+        return actual=="first"
+    if test=="subsequent":
+        return actual in ["subsequent", "ibid", "ibid-with-locator"]
+    if test=="ibid":
+        return actual in ["ibid", "ibid-with-locator"]
+    return actual==test
+
+def roman(n):
+    out = ""
+    for value, letters in [(1000, "m"), (900, "cm"), (500, "d"), (400, "cd"), (100, "c"), (90, "xc"), (50, "l"), (40, "xl"), (10, "x"), (9, "ix"), (5, "v"), (4, "iv"), (1, "i")]:
+        while n>=value:
+            out += letters
+            n -= value
+    return out
+
+# Renderer: compiled once per style digest and format
+class Renderer:
+    compiled = {}
+
+    def __init__(self, style, format="text"):
+        self.style = style
+        self.format = format
+        self.sortstyle = style if format=="text" else None
+
+    @classmethod
+    def load(cls, source, format="text"):
+        """
+        source: serialized style bytes, a path to a .csl file, or a parsed tree
+        """
+        data = source
+        if isinstance(source, str):
+            with open(source, "rb") as f:
+                data = f.read()
+        elif not isinstance(source, (bytes, bytearray)):
+            data = ET.tostring(source)
+        key = (hashlib.sha256(data).hexdigest(), format)
+        if key not in cls.compiled:
+            root = ET.fromstring(bytes(data), ET.XMLParser(remove_blank_text=True))
+            cls.compiled[key] = cls(CompiledStyle(root, format), format)
+            cls.compiled[key].digest = key[0]
+            cls.compiled[key].data = bytes(data)
+        return cls.compiled[key]
+
+    def canonicaldigest(self):
+        """
+        Digest of the style without its <updated> timestamp, in canonical XML,
+        so rebuilding an unchanged style keeps the same digest
+        """
+        if getattr(self, "canonical", None) is None:
+            root = ET.fromstring(self.data, ET.XMLParser(remove_blank_text=True))
+            for updated in root.iterfind(csl+"info/"+csl+"updated"):
+                updated.text = None
+            self.canonical = hashlib.sha256(ET.tostring(root, method="c14n")).hexdigest()
+        return self.canonical
+
+    def sorter(self):
+        if self.sortstyle is None:
+            self.sortstyle = Renderer.load(self.data, "text").style
+        return self.sortstyle
+
+    def sortvalues(self, item):
+        """
+        One raw value per bibliography sort key (strings, names in sort order,
+        dates as YYYYYMMDD); readings fall back as in collation.namekana
+        """
+        style = self.sorter()
+        section = style.bibliography
+        values = []
+        for variable, macro, descending in section["sort"]:
+            if macro is not None:
+                locale = style.layout(section, item)[5]
+                ctx = Context(item, sorting=True)
+                value = style.macro(macro, section["options"], locale)(ctx)[0]
+            elif variable in collation.readings:
+                value = collation.namekana(item)
+            elif variable in datevariables:
+                dates = dateparts(item.get(variable, {})) if item.get(variable, None) else []
+                value = "%05d%02d%02d" % tuple((dates[0]+[0, 0, 0])[:3]) if dates else ""
+            elif variable in namevariables:
+                value = ", ".join([namesortkey(n) for n in item.get(variable, [])])
+            else:
+                value = item.get(variable, "")
+                value = value if isinstance(value, str) else ""
+            values.append(value)
+        return values
+
+    def record(self, item):
+        """
+        (sort values, text, first names) of a normalized item
+        """
+        values = self.sortvalues(item) if self.style.bibliography["sort"] else []
+        return (values,)+self.rendered(item)
+
+    def records(self, items, cache=None):
+        return cache.records(self, items) if cache is not None else [self.record(item) for item in items]
+
+    def sortkeys(self, items, collator=None, rows=None):
+        """
+        Collation keys of the items for the style's <sort>, one tuple per
+        item; rows are their sort values when already known
+        """
+        collator = collator if collator is not None else collation.Collator()
+        sort = self.style.bibliography["sort"]
+        rows = rows if rows is not None else [self.sortvalues(item) for item in items]
+        columns = [[row[k] for row in rows] for k in range(len(sort))]
+        return collator.keys(columns, [variable in collation.readings for variable, macro, descending in sort])
+
+    def sort(self, items, keys=None):
+        """
+        Items in the order of the style's <sort> on precomputed keys; empty values sort last
+        """
+        keys = keys if keys is not None else self.sortkeys(items)
+        descending = [x[2] for x in self.style.bibliography["sort"]]
+        return [items[i] for i in collation.Collator().order(keys, descending)]
+
+    def entry(self, item):
+        return self.style.entry(normalize(item))[0]
+
+    def entries(self, items):
+        """
+        Rendered entries in input order, with the layout's own formatting
+        """
+        style = self.style
+        fmt = style.format
+        for item in items:
+            text = style.entry(normalize(item))[0]
+            if text:
+                yield fmt.entry(text)
+
+    def bibliography(self, items, sort=True, cache=None):
+        items = [normalize(item) for item in items]
+        records = self.records(items, cache)
+        if sort and self.style.bibliography["sort"]:
+            keys = self.sortkeys(items, rows=[record[0] for record in records])
+            records = self.sort(records, keys)
+        return list(self.substitute(record[1:] for record in records))
+
+    def rendered(self, item):
+        """
+        (text, first names) of a normalized item, before formatting as an entry
+        """
+        text, ctx = self.style.entry(item)
+        return text, ctx.firstnames
+
+    def substitute(self, entries):
+        """
+        Formatted entries from (text, first names) pairs in bibliography
+        order, with subsequent-author-substitute applied
+        """
+        fmt = self.style.format
+        substitute = self.style.bibliography["attrib"].get("subsequent-author-substitute", None)
+        previous = None
+        for text, names in entries:
+            if not text:
+                continue
+            if substitute is not None:
+                if names and names==previous:
+                    text = text.replace(names, fmt.escape(substitute), 1)
+                previous = names
+            yield fmt.entry(text)
+
+    def document(self, items, sort=True, cache=None):
+        return self.style.format.document(self.bibliography(items, sort, cache))
+
+    def citation(self, cites):
+        """
+        One citation cluster: cites are items, or dicts with "item" and
+        optional "locator", "label" and "position"
+        """
+        cites = [c if "item" in c else {"item": c} for c in cites]
+        return self.cluster([dict(c, item=normalize(c["item"])) for c in cites])
+
+    def cluster(self, cites):
+        """
+        citation() for cites whose items are already normalized
+        """
+        style = self.style
+        fmt = style.format
+        layout = style.layout(style.citation, cites[0]["item"]) if cites else None
+        if layout is None:
+            return ""
+        body, prefix, suffix, delimiter, attrib, locale = layout
+        """
+        collapse="year": a cite whose names are those of the cite before it
+        is rendered without them and joined to it with the cite-group
+        delimiter (the layout delimiter if not set, as citeproc-js)
+        """
+        options = style.citation["attrib"]
+        collapse = options.get("collapse", None) in ["year", "year-suffix", "year-suffix-ranged"]
+        groups = []
+        previous = None
+        for c in cites:
+            text, names = style.cite(c)
+            if not text:
+                continue
+            if collapse and names and names==previous:
+                groups[-1].append(style.cite(dict(c, **{"suppress-author": True}))[0])
+            else:
+                groups.append([text])
+            previous = names
+        if not groups:
+            return ""
+        groupdelimiter = fmt.escape(options.get("cite-group-delimiter", delimiter))
+        aftercollapse = fmt.escape(options.get("after-collapse-delimiter", delimiter))
+        text = ""
+        for i, group in enumerate(groups):
+            if i>0:
+                text += aftercollapse if len(groups[i-1])>1 else fmt.escape(delimiter)
+            text += groupdelimiter.join(group)
+        styles = {k: attrib[k] for k in ["font-style", "font-variant", "font-weight", "text-decoration", "vertical-align"] if k in attrib}
+        if styles:
+            text = fmt.style(text, styles)
+        return fmt.escape(prefix)+text+fmt.escape(suffix)
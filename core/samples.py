@@ -0,0 +1,219 @@
+import os, re, json, zipfile
+from xml.sax.saxutils import escape
+from lxml import etree as ET
+from .base import Base
+from .build import recordids
+from .renderer import Renderer, normalize, csl
+from .archive import member, ZipStream
+
+# Sample documents: a fixed reference corpus (citation clusters and their
+# items, input/samples.json) cited and listed with one generated style, as a
+# .docx. Every part but word/document.xml is the same for all styles, so it is
+# compressed once per process and copied into each archive as is. Archives are
+# written front to back (ZipStream), every member compressed in memory first,
+# with fixed dates: an unchanged style gives a byte-identical document.
+# Entries are rendered with the html format and turned into Word runs.
+
+default_corpus = os.path.dirname(os.path.abspath(__file__))+"/../input/samples.json"
+wordml = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+relationships = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+def samplepath(id, directory="output/samples"):
+    return directory+"/"+os.path.basename(Base.outputpath(id))[:-len(".csl")]+"-sample.docx"
+
+# Reference corpus
+def extract(paths):
+    """
+    Corpus of the Zotero citations in .docx files: the clusters in document
+    order (duplicates dropped) and every cited item, as first cited
+    """
+    items = {}
+    clusters = []
+    for path in paths:
+        with zipfile.ZipFile(path) as archive:
+            root = ET.fromstring(archive.read("word/document.xml"))
+        # Field codes are split over runs; each citation starts with its marker
+        instructions = "".join([x.text or "" for x in root.iter("{"+wordml+"}instrText")])
+        for field in instructions.split("ADDIN ZOTERO_ITEM CSL_CITATION")[1:]:
+            citation = json.JSONDecoder().raw_decode(field.strip())[0]
+            cluster = []
+            for cite in citation["citationItems"]:
+                # An item cited in both documents keeps its first data, as clusters do
+                item = cite["itemData"]
+                items.setdefault(item["id"], item)
+                cluster.append({k: cite[k] for k in ["id", "locator", "label", "suppress-author"] if k in cite})
+            if cluster not in clusters:
+                clusters.append(cluster)
+    return {"clusters": clusters, "items": list(items.values())}
+
+def readcorpus(paths=None):
+    """
+    Corpus from a corpus .json file, or extracted from .docx files
+    """
+    paths = paths if paths else [default_corpus]
+    if all([os.path.splitext(x)[1]==".docx" for x in paths]):
+        return extract(paths)
+    if len(paths)>1:
+        raise ValueError("Give one corpus .json file or any number of .docx files")
+    with open(paths[0], encoding="utf-8") as f:
+        return json.load(f)
+
+# Document parts shared by every style
+contenttypes = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types"><Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/><Default Extension="xml" ContentType="application/xml"/><Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/><Override PartName="/word/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/><Override PartName="/docProps/core.xml" ContentType="application/vnd.openxmlformats-package.core-properties+xml"/><Override PartName="/docProps/app.xml" ContentType="application/vnd.openxmlformats-officedocument.extended-properties+xml"/></Types>'''
+
+packagerels = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships"><Relationship Id="rId1" Type="'''+relationships+'''/officeDocument" Target="word/document.xml"/><Relationship Id="rId2" Type="http://schemas.openxmlformats.org/package/2006/relationships/metadata/core-properties" Target="docProps/core.xml"/><Relationship Id="rId3" Type="'''+relationships+'''/extended-properties" Target="docProps/app.xml"/></Relationships>'''
+
+documentrels = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships"><Relationship Id="rId1" Type="'''+relationships+'''/styles" Target="styles.xml"/></Relationships>'''
+
+styles = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:styles xmlns:w="'''+wordml+'''"><w:docDefaults><w:rPrDefault><w:rPr><w:rFonts w:ascii="Times New Roman" w:hAnsi="Times New Roman" w:eastAsia="MS Mincho" w:cs="Times New Roman"/><w:sz w:val="24"/><w:szCs w:val="24"/><w:lang w:val="en-US" w:eastAsia="ja-JP"/></w:rPr></w:rPrDefault><w:pPrDefault><w:pPr><w:spacing w:after="120"/></w:pPr></w:pPrDefault></w:docDefaults><w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/></w:style><w:style w:type="paragraph" w:styleId="Title"><w:name w:val="Title"/><w:basedOn w:val="Normal"/><w:next w:val="Normal"/><w:pPr><w:spacing w:after="240"/></w:pPr><w:rPr><w:b/><w:sz w:val="32"/><w:szCs w:val="32"/></w:rPr></w:style><w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/><w:basedOn w:val="Normal"/><w:next w:val="Normal"/><w:pPr><w:keepNext/><w:spacing w:before="360" w:after="120"/><w:outlineLvl w:val="0"/></w:pPr><w:rPr><w:b/><w:sz w:val="28"/><w:szCs w:val="28"/></w:rPr></w:style><w:style w:type="paragraph" w:styleId="Bibliography"><w:name w:val="Bibliography"/><w:basedOn w:val="Normal"/></w:style></w:styles>'''
+
+coreproperties = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<cp:coreProperties xmlns:cp="http://schemas.openxmlformats.org/package/2006/metadata/core-properties" xmlns:dc="http://purl.org/dc/elements/1.1/"><dc:title>Sample document</dc:title><dc:creator>pycsl</dc:creator></cp:coreProperties>'''
+
+appproperties = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Properties xmlns="http://schemas.openxmlformats.org/officeDocument/2006/extended-properties"><Application>pycsl</Application></Properties>'''
+
+def sharedparts():
+    """
+    Compressed members of every part but word/document.xml, in archive order
+    """
+    parts = [
+        ("[Content_Types].xml", contenttypes),
+        ("_rels/.rels", packagerels),
+        ("docProps/core.xml", coreproperties),
+        ("docProps/app.xml", appproperties),
+        ("word/_rels/document.xml.rels", documentrels),
+        ("word/styles.xml", styles),
+    ]
+    return [member(name, data.encode("utf-8")) for name, data in parts]
+
+# Rendered html to WordprocessingML runs
+markup = re.compile(r'<(/?)(i|b|sup|sub|span|div)((?: [^>]*)?)>|&#(\d+);|[^<&]+')
+properties = {
+    "i": "<w:i/>",
+    "b": "<w:b/>",
+    "sup": '<w:vertAlign w:val="superscript"/>',
+    "sub": '<w:vertAlign w:val="subscript"/>',
+    ' style="font-variant:small-caps;"': "<w:smallCaps/>",
+    ' style="text-decoration:underline;"': '<w:u w:val="single"/>',
+}
+
+# Run properties in the order the schema requires
+order = ["<w:b/>", "<w:i/>", "<w:smallCaps/>", '<w:u w:val="single"/>', '<w:vertAlign w:val="superscript"/>', '<w:vertAlign w:val="subscript"/>']
+
+def runs(html):
+    """
+    Runs of one rendered html entry or citation (formatting tags and
+    csl-block/csl-indent displays, which start a new line)
+    """
+    html = re.sub(r'^<div class="csl-entry">(.*)</div>$', r"\1", html, flags=re.S)
+    out = []
+    stack = []
+    text = []
+    def flush():
+        if text:
+            active = set([x for x in stack if x is not None])
+            rpr = "".join([x for x in order if x in active])
+            out.append("<w:r>"+("<w:rPr>"+rpr+"</w:rPr>" if rpr else "")+'<w:t xml:space="preserve">'+escape("".join(text))+"</w:t></w:r>")
+            del text[:]
+    for match in markup.finditer(html):
+        closing, tag, attributes, code = match.group(1), match.group(2), match.group(3), match.group(4)
+        if tag is not None:
+            flush()
+            if closing:
+                stack.pop()
+            elif tag=="div":
+                if attributes in [' class="csl-block"', ' class="csl-indent"'] and out:
+                    out.append("<w:r><w:br/></w:r>")
+                stack.append(None)
+            else:
+                stack.append(properties.get(tag if tag!="span" else attributes, None))
+        elif code is not None:
+            text.append(chr(int(code)))
+        else:
+            text.append(match.group(0))
+    flush()
+    return "".join(out)
+
+def paragraph(content, style=None, indent=False):
+    ppr = ('<w:pStyle w:val="'+style+'"/>' if style is not None else "")+('<w:ind w:left="720" w:hanging="720"/>' if indent else "")
+    return "<w:p>"+("<w:pPr>"+ppr+"</w:pPr>" if ppr else "")+content+"</w:p>"
+
+def plain(text):
+    return '<w:r><w:t xml:space="preserve">'+escape(text)+"</w:t></w:r>"
+
+def document(data, id, corpus):
+    """
+    word/document.xml of one serialized style: its title, a paragraph per
+    citation cluster and the bibliography of every corpus item
+    """
+    renderer = Renderer.load(data, "html")
+    root = ET.fromstring(data)
+    title = root.findtext(csl+"info/"+csl+"title") or id
+    items = corpus["normalized"]
+    body = [paragraph(plain(title), "Title"), paragraph(plain(id))]
+    body.append(paragraph(plain("Citations"), "Heading1"))
+    for cluster in corpus["clusters"]:
+        body.append(paragraph(runs(renderer.cluster([dict(cite, item=items[cite["id"]]) for cite in cluster]))))
+    body.append(paragraph(plain("Bibliography"), "Heading1"))
+    hanging = renderer.style.bibliography["attrib"].get("hanging-indent", "false")=="true"
+    for entry in renderer.bibliography(corpus["items"]):
+        body.append(paragraph(runs(entry), "Bibliography", hanging))
+
+    # Each style is rendered once: do not keep it compiled
+    for format in ["html", "text"]:
+        Renderer.compiled.pop((renderer.digest, format), None)
+    section = '<w:sectPr><w:pgSz w:w="11906" w:h="16838"/><w:pgMar w:top="1701" w:right="1701" w:bottom="1701" w:left="1701" w:header="851" w:footer="992" w:gutter="0"/></w:sectPr>'
+    return '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<w:document xmlns:w="'+wordml+'"><w:body>'+"".join(body)+section+"</w:body></w:document>"
+
+def writesample(stream, data, id, corpus, shared):
+    archive = ZipStream(stream)
+    for entry in shared:
+        archive.add(entry)
+    archive.add(member("word/document.xml", document(data, id, corpus).encode("utf-8")))
+    archive.close()
+
+# Worker side: store, template, corpus and the shared parts, once per process
+worker = {}
+
+def initworker(store, templatesource, corpus, directory, shared=None):
+    from .template import Template
+    worker["store"] = store
+    worker["template"] = Template.fromsource(templatesource)
+    worker["corpus"] = dict(corpus, normalized={item["id"]: normalize(item) for item in corpus["items"]})
+    worker["directory"] = directory
+    worker["shared"] = shared if shared is not None else sharedparts()
+
+def buildsample(config):
+    """
+    Build the style of one Metadata record in memory and write its sample
+    document; returns the document path
+    """
+    ids, id = recordids(config)
+    base = Base(ids, config["name"], config["language"], len(ids)>1, dict(config), worker["store"], worker["template"])
+    path = samplepath(id, worker["directory"])
+    with open(path, "wb") as f:
+        writesample(f, base.serialize(), id, worker["corpus"], worker["shared"])
+    return path
+
+def buildsamples(configs, store, template, corpus, directory="output/samples", jobs=1):
+    """
+    Sample document of every record, over a process pool when jobs is not 1
+    (0: one per CPU); returns the paths in record order
+    """
+    os.makedirs(directory, exist_ok=True)
+    shared = sharedparts()
+    if jobs==1:
+        initworker(store, template.source(), corpus, directory, shared)
+        return [buildsample(config) for config in configs]
+    from concurrent.futures import ProcessPoolExecutor
+    if jobs<1:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, max(len(configs), 1))
+    chunksize = max(1, len(configs)//(jobs*4))
+    with ProcessPoolExecutor(jobs, initializer=initworker, initargs=(store, template.source(), corpus, directory, shared)) as pool:
+        return list(pool.map(buildsample, configs, chunksize=chunksize))
@@ -0,0 +1,229 @@
+import re
+
+# Declared Settings keys (the a-, b- and c- rows of the Settings sheet), with
+# their type and the default used when an id has no value. Each id's column is
+# compiled once into a JournalSettings object whose attributes are the keys
+# with "-" as "_" (b-name-delimiter: settings.b_name_delimiter), already
+# converted: flags are bools, so the spreadsheet text "false" is False, not a
+# true string. Processor only reads these attributes.
+
+class ConfigError(ValueError):
+    """
+    Every invalid Settings value found, reported together
+    """
+    def __init__(self, errors):
+        self.errors = errors
+        ValueError.__init__(self, str(len(errors))+" invalid Settings value"+("s" if len(errors)>1 else "")+":\n"+"\n".join(["  "+x for x in errors]))
+
+class Invalid(Exception):
+    pass
+
+# Converters: a raw cell value (str, bool, int or float) to the typed value
+def text(value):
+    if isinstance(value, bool):
+        raise Invalid("expected text, got "+repr(value))
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+truths = {"true": True, "yes": True, "1": True, "false": False, "no": False, "0": False}
+
+def flag(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)) and value in [0, 1]:
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in truths:
+        return truths[value.strip().lower()]
+    raise Invalid("expected TRUE or FALSE, got "+repr(value))
+
+def boolean(value):
+    """
+    CSL boolean attribute value: "true" or "false"
+    """
+    return "true" if flag(value) else "false"
+
+def optionalboolean(value):
+    return "" if value=="" else boolean(value)
+
+def choice(*values):
+    def convert(value):
+        value = text(value)
+        if value not in values:
+            raise Invalid("expected one of "+", ".join([repr(x) for x in values])+", got "+repr(value))
+        return value
+    return convert
+
+labelform = choice("", "long", "short", "symbol", "verb", "verb-short")
+sortorder = choice("", "first", "all")
+andform = choice("", "text", "symbol")
+
+keys = [
+    # General
+    ("a-punctuation-in-quote", boolean, "false"),
+    ("a-bracket-left", text, "（"),
+    ("a-bracket-right", text, "）"),
+    ("a-page-range-delimiter", text, "-"),
+    ("a-no-date-value", text, ""),
+
+    # Citation
+    ("c-date-page-delimiter", text, ", "),
+    ("c-contributor-left", text, "（"),
+    ("c-contributor-right", text, "）"),
+    ("c-name-date-delimiter", text, ", "),
+    ("c-name-delimiter", text, ""),
+    ("c-delimiter-precedes-last", flag, False),
+    ("c-et-al-subsequent", flag, False),
+    ("c-and-form", andform, ""),
+    ("c-page-label-form", labelform, ""),
+    ("c-page-label-suffix", text, " "),
+    ("c-locator-label-form", labelform, ""),
+    ("c-locator-label-right", text, ""),
+    ("c-invert-page-label", flag, False),
+    ("c-original-date-left", text, ""),
+    ("c-original-date-right", text, "="),
+
+    # Bibliography: contributors
+    ("b-contributors-display-block", flag, False),
+    ("b-contributors-substitute-subsequent", text, ""),
+    ("b-and-form", andform, ""),
+    ("b-name-part-delimiter", text, ""),
+    ("b-name-delimiter", text, "・"),
+    ("b-name-sort-separator", text, ","),
+    ("b-name-initialize", optionalboolean, ""),
+    ("b-name-initialize-with", text, ""),
+    ("b-container-contributor-initialize", optionalboolean, ""),
+    ("b-container-contributor-initialize-with", text, ""),
+    ("b-secondary-contributor-initialize", optionalboolean, ""),
+    ("b-secondary-contributor-initialize-with", text, ""),
+    ("b-delimiter-precedes-last", choice("contextual", "after-inverted-name", "always", "never"), "never"),
+    ("b-contributor-name-as-sort-order", sortorder, ""),
+    ("b-container-contributor-name-as-sort-order", sortorder, ""),
+    ("b-secondary-contributor-name-as-sort-order", sortorder, ""),
+    ("b-secondary-contributors-left", text, ""),
+    ("b-secondary-contributors-right", text, ""),
+    ("b-secondary-contributor-label-left", text, ""),
+    ("b-secondary-contributor-label-right", text, ","),
+    ("b-container-contributors-left", text, ""),
+    ("b-container-contributors-right", text, ""),
+    ("b-container-contributors-suffix", text, ""),
+    ("b-invert-contributors-label", flag, False),
+    ("b-contributors-suffix", text, "、"),
+    ("b-contributor-label-left", text, " ("),
+    ("b-contributor-label-right", text, ")"),
+    ("b-contributor-2-label-left", text, " ("),
+    ("b-contributor-2-label-right", text, ")"),
+    ("b-translator-editor", flag, False),
+    ("b-translator-editor-delimiter", text, ""),
+
+    # Bibliography: date and titles
+    ("b-date-left", text, "（"),
+    ("b-date-right", text, "）"),
+    ("b-date-delimiter", text, ""),
+    ("b-title-quotes", boolean, "true"),
+    ("b-book-title-prefix", text, ". "),
+    ("b-book-title-left", text, "『"),
+    ("b-book-title-right", text, "』"),
+    ("b-book-title-style", choice("", "normal", "italic", "oblique"), ""),
+    ("b-website-title-left", text, ""),
+    ("b-website-title-right", text, ""),
+    ("b-journal-title-left", text, ""),
+    ("b-journal-title-right", text, ""),
+    ("b-journal-title-suffix", text, ","),
+    ("b-edition-left", text, ""),
+    ("b-edition-right", text, ""),
+
+    # Bibliography: locators
+    ("b-issue-delimiter", text, "、"),
+    ("b-locator-chapter-label-form", labelform, "long"),
+    ("b-locator-chapter-prefix", text, "、"),
+    ("b-locator-chapter-suffix", text, "、"),
+    ("b-locator-chapter-label-invert", flag, False),
+    ("b-locator-chapter-separator", text, ""),
+    ("b-locator-article-prefix", text, "、"),
+    ("b-locator-label-invert", flag, False),
+    ("b-locator-label-form", labelform, ""),
+    ("b-locator-left", text, ""),
+    ("b-locator-right", text, ""),
+    ("b-locator-label-delimiter", text, ""),
+    ("b-volume-left", text, ""),
+    ("b-volume-right", text, ""),
+    ("b-issue-left", text, ""),
+    ("b-issue-right", text, ""),
+    ("b-only-issue-left", text, ""),
+    ("b-only-issue-right", text, ""),
+    ("b-volume-issue-delimiter", text, ""),
+    ("b-article-page-label-invert", flag, False),
+    ("b-locators-chapter-after-issue", flag, False),
+
+    # Bibliography: publisher and access
+    ("b-publisher-remove-place", flag, False),
+    ("b-publisher-group-left", text, ""),
+    ("b-publisher-group-right", text, ""),
+    ("b-accessed-format", text, ""),
+    ("b-accessed-format-en", text, ""),
+    ("b-accessed-left", text, ""),
+    ("b-accessed-left-en", text, ""),
+    ("b-accessed-right", text, ""),
+    ("b-accessed-right-en", text, ""),
+    ("b-accessed-label-right", text, ""),
+    ("b-accessed-label-added", flag, False),
+    ("b-url-left", text, ""),
+    ("b-doi-left", text, ""),
+    ("b-access-display-newline", flag, False),
+    ("b-final-punctuation", text, ". "),
+    ("b-final-punctuation-omit-type", text, ""),
+]
+
+def attribute(name):
+    return name.replace("-", "_")
+
+class JournalSettings:
+    __slots__ = ["id"]+[attribute(name) for name, convert, default in keys]
+
+    def __repr__(self):
+        return "JournalSettings("+self.id+")"
+
+declared = {name: (attribute(name), convert, default) for name, convert, default in keys}
+pattern = re.compile(r"^[abc]-")
+
+def compilesettings(id, column):
+    """
+    JournalSettings of one Settings column; raises ConfigError with every
+    invalid value of the column
+    """
+    settings = JournalSettings()
+    settings.id = id
+    errors = []
+    for name, (slot, convert, default) in declared.items():
+        value = column.get(name, "")
+        try:
+            # Missing keys, and empty cells of flags and CSL booleans, take the default
+            if name not in column or value=="" and convert in [flag, boolean]:
+                value = default
+            else:
+                value = convert(value)
+            setattr(settings, slot, value)
+        except Invalid as error:
+            errors.append(id+": "+name+": "+str(error))
+    for name in column:
+        if pattern.match(name) and name not in declared:
+            errors.append(id+": "+name+": unknown setting")
+    if errors:
+        raise ConfigError(errors)
+    return settings
+
+def validate(store, ids):
+    """
+    Compile the settings of every id, reporting the errors of all ids at once
+    """
+    errors = []
+    for id in dict.fromkeys(ids):
+        try:
+            store.journal(id)
+        except ConfigError as error:
+            errors += error.errors
+        except KeyError as error:
+            errors.append(str(error.args[0]))
+    if errors:
+        raise ConfigError(errors)
@@ -0,0 +1,136 @@
+import os, json, heapq, pickle, tempfile
+from .renderer import Renderer, normalize
+from . import collation
+
+# Streaming bibliography export for libraries too large to load at once.
+# Items are read incrementally from a CSL-JSON array (or JSON Lines), cut into
+# shards and rendered by workers that each hold the compiled style. Every
+# shard is sorted on the style's collation keys and spilled to a temporary
+# file; the shards are then k-way merged into the output. Memory is bounded by
+# the shard size times the number of shards in flight, not by the library.
+
+# Worker side: the compiled style, loaded once per process
+worker = {}
+
+def initworker(data, format, cachepath=None):
+    worker["renderer"] = Renderer.load(data, format)
+    worker["cache"] = None
+    if cachepath is not None:
+        from .cache import RenderCache
+        worker["cache"] = RenderCache(cachepath)
+
+def readitems(path, chunksize=1<<20):
+    """
+    Items of a CSL-JSON array or a JSON Lines file, one at a time
+    """
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8") as f:
+        buffer = ""
+        position = 0
+        eof = False
+        while True:
+            # Skip separators between items
+            while position<len(buffer) and buffer[position] in " \t\r\n,[]﻿":
+                position += 1
+            if position>=len(buffer):
+                if eof:
+                    return
+                buffer = f.read(chunksize)
+                position = 0
+                eof = buffer==""
+                continue
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                more = f.read(chunksize)
+                eof = more==""
+                buffer = buffer[position:]+more
+                position = 0
+                continue
+            position = end
+            yield item
+
+def shards(items, size):
+    shard = []
+    for item in items:
+        shard.append(item)
+        if len(shard)>=size:
+            yield shard
+            shard = []
+    if shard:
+        yield shard
+
+def rendershard(start, items, directory):
+    """
+    Render and sort one shard; returns the path of its spill file of
+    (merge key, text, first names) records in sorted order
+    """
+    renderer = worker["renderer"]
+    items = [normalize(item) for item in items]
+    records = renderer.records(items, worker["cache"])
+    sort = renderer.style.bibliography["sort"]
+    collator = collation.Collator()
+    descending = [x[2] for x in sort]
+    keys = renderer.sortkeys(items, collator, [record[0] for record in records]) if sort else [()]*len(items)
+    order = collator.order(keys, descending) if sort else range(len(items))
+    path = os.path.join(directory, "shard-%09d.pickle" % start)
+    with open(path, "wb") as f:
+        for i in order:
+            values, text, names = records[i]
+            if text:
+                # The input position breaks ties so the merge is stable
+                pickle.dump((collator.mergekey(keys[i], descending), start+i, text, names), f, pickle.HIGHEST_PROTOCOL)
+    return path
+
+def readshard(path):
+    with open(path, "rb") as f:
+        while True:
+            # One pickle per record, so nothing read stays referenced
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+def export(data, source, stream, format="text", jobs=1, size=5000, cachepath=None):
+    """
+    Write the bibliography of every item in source (a CSL-JSON or JSON Lines
+    path) to stream, sorted as the style declares; data is the serialized style
+    and cachepath an optional RenderCache file shared by the workers.
+    Returns the number of entries written.
+    """
+    renderer = Renderer.load(data, format)
+    with tempfile.TemporaryDirectory(prefix="pycsl-") as directory:
+        paths = []
+        if jobs==1:
+            initworker(data, format, cachepath)
+            start = 0
+            for shard in shards(readitems(source), size):
+                paths.append(rendershard(start, shard, directory))
+                start += len(shard)
+        else:
+            from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+            if jobs<1:
+                jobs = os.cpu_count() or 1
+            with ProcessPoolExecutor(jobs, initializer=initworker, initargs=(data, format, cachepath)) as pool:
+                pending = set()
+                start = 0
+                for shard in shards(readitems(source), size):
+                    # At most two shards per worker in flight
+                    if len(pending)>=jobs*2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        paths += [future.result() for future in done]
+                    pending.add(pool.submit(rendershard, start, shard, directory))
+                    start += len(shard)
+                paths += [future.result() for future in pending]
+
+        merged = heapq.merge(*[readshard(path) for path in sorted(paths)], key=lambda record: (record[0], record[1]))
+        fmt = renderer.style.format
+        count = 0
+        stream.write(fmt.opening)
+        for entry in renderer.substitute((record[2], record[3]) for record in merged):
+            stream.write(fmt.line(entry))
+            count += 1
+        stream.write(fmt.closing)
+    return count
@@ -0,0 +1,121 @@
+import os, io, copy, hashlib
+from lxml import etree as ET
+
+class Template:
+    """
+    Base style parsed once; every journal works on a copy of the master tree
+    """
+    default_path = os.path.dirname(os.path.abspath(__file__))+"/../input/chicago-author-date.csl"
+    instances = {}
+
+    def __init__(self, path=None, data=None):
+        self.ns = {"z": "http://purl.org/net/xbiblio/csl"}
+        # Bytes of a template with no file, for pool workers (see source())
+        self.memory = data
+        if data is not None:
+            self.path = path if path is not None else "<memory>"
+        else:
+            self.path = path if path is not None else self.default_path
+            with open(self.path, "rb") as f:
+                data = f.read()
+        self.digest = hashlib.sha256(data).hexdigest()
+        parser = ET.XMLParser(remove_blank_text=True)
+        self.master = ET.parse(io.BytesIO(data), parser)
+        root = self.master.getroot()
+
+        # Child positions of the nodes every build looks up
+        info = root.find("z:info", self.ns)
+        citation = root.find("z:citation", self.ns)
+        bibliography = root.find("z:bibliography", self.ns)
+        self.paths = {
+            "info": self.position(info),
+            "citation": self.position(citation),
+            "citationlayout": self.position(citation.find("z:layout", self.ns)),
+            "bibliography": self.position(bibliography),
+            "bibliographylayout": self.position(bibliography.find("z:layout", self.ns)),
+            "sort": self.position(bibliography.find("z:sort", self.ns)),
+        }
+        self.macropaths = [(m.attrib["name"], self.position(m)) for m in root.findall("z:macro", self.ns)]
+
+        # Preorder node numbering, built for patches (see core.patch)
+        self.preorder = None
+        self.readable = None
+
+    @classmethod
+    def load(cls, path=None):
+        key = os.path.abspath(path if path is not None else cls.default_path)
+        if key not in cls.instances:
+            cls.instances[key] = cls(key)
+        return cls.instances[key]
+
+    def source(self):
+        """
+        What a pool worker loads this template from: its path, or its bytes
+        when it was given as data
+        """
+        return self.memory if self.memory is not None else self.path
+
+    @classmethod
+    def fromsource(cls, source):
+        return cls(data=source) if isinstance(source, (bytes, bytearray)) else cls.load(source)
+
+    def position(self, element):
+        path = []
+        while element.getparent() is not None:
+            path.insert(0, element.getparent().index(element))
+            element = element.getparent()
+        return path
+
+    def copy(self, track=False):
+        return TemplateCopy(self, track)
+
+    def nodeindex(self):
+        """
+        Template node -> preorder index
+        """
+        if self.preorder is None:
+            self.preorder = {node: i for i, node in enumerate(self.master.getroot().iter())}
+        return self.preorder
+
+    def nodepaths(self):
+        """
+        Readable path of every template node by preorder index, e.g.
+        macro[@name='title']/choose/if[2]/text
+        """
+        if self.readable is None:
+            paths = []
+            for node in self.master.getroot().iter():
+                steps = []
+                while node.getparent() is not None:
+                    parent = node.getparent()
+                    name = node.tag.split("}")[-1] if isinstance(node.tag, str) else "comment()"
+                    if name=="macro" and "name" in node.attrib:
+                        step = name+"[@name='"+node.attrib["name"]+"']"
+                    else:
+                        same = [x for x in parent if x.tag==node.tag]
+                        step = name+("["+str(same.index(node)+1)+"]" if len(same)>1 else "")
+                    steps.insert(0, step)
+                    node = parent
+                paths.append("/".join(steps) or "/")
+            self.readable = paths
+        return self.readable
+
+class TemplateCopy:
+    """
+    Private copy of the master tree with its lookups already resolved
+    """
+    def __init__(self, template, track=False):
+        self.tree = copy.deepcopy(template.master)
+        self.root = self.tree.getroot()
+
+        # Copied node -> template node, for patches
+        self.origin = dict(zip(self.root.iter(), template.master.getroot().iter())) if track else None
+        for name in template.paths:
+            setattr(self, name, self.resolve(template.paths[name]))
+        self.macros = {name: self.resolve(path) for name, path in template.macropaths}
+
+    def resolve(self, path):
+        element = self.root
+        for i in path:
+            element = element[i]
+        return element
@@ -0,0 +1,173 @@
+import os, time, json
+
+# Optional per-stage build timing. Stages nest (a stage opened inside another
+# is recorded as "outer/inner") and are attributed to the output id being
+# built. Disabled, a stage costs one attribute check. Enabled by the
+# PYCSL_TIMING environment variable (a path prefix for the reports, or 1 for
+# the default one) or by `pycsl.py build --timing`.
+
+variable = "PYCSL_TIMING"
+default_prefix = ".cache/build-timing"
+
+class Stage:
+    __slots__ = ["timer", "name"]
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.timer.begin(self.name)
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.end()
+        return False
+
+class Timer:
+    def __init__(self):
+        self.enabled = False
+        self.id = None
+        self.events = []
+
+        # Deepest stage level recorded (1: top-level stages only), None for all
+        self.depth = None
+
+        # Open stages as [path, start, lap path, lap start]
+        self.stack = []
+
+    def enable(self, enabled=True, depth=None):
+        self.enabled = enabled
+        self.depth = depth
+
+    def record(self, id):
+        """
+        Attribute the following stages to an output id (None: the whole build)
+        """
+        self.id = id
+
+    def stage(self, name):
+        return Stage(self, name)
+
+    def begin(self, name):
+        if not self.enabled:
+            return
+        # Inside a lap, the stage nests under the lap
+        path = (self.stack[-1][2] or self.stack[-1][0])+"/"+name if self.stack else name
+        self.stack.append([path, time.perf_counter(), None, 0])
+
+    def end(self):
+        if not self.enabled or not self.stack:
+            return
+        self.closelap()
+        path, start, lap, lapstart = self.stack.pop()
+        self.add(path, start, time.perf_counter())
+
+    def lap(self, name):
+        """
+        Start a sequential section of the current stage, ending the previous
+        one: sections of one long method without nesting its body
+        """
+        if not self.enabled or not self.stack:
+            return
+        self.closelap()
+        top = self.stack[-1]
+        top[2] = top[0]+"/"+name
+        top[3] = time.perf_counter()
+
+    def closelap(self):
+        if self.stack and self.stack[-1][2] is not None:
+            top = self.stack[-1]
+            self.add(top[2], top[3], time.perf_counter())
+            top[2] = None
+
+    def add(self, path, start, stop):
+        if self.depth is not None and path.count("/")>=self.depth:
+            return
+        self.events.append({"id": self.id, "stage": path, "start": start, "duration": stop-start, "pid": os.getpid()})
+
+    def drain(self):
+        """
+        Events recorded so far, forgotten here (workers hand them to the parent)
+        """
+        events = self.events
+        self.events = []
+        return events
+
+# One timer per process
+timer = Timer()
+
+def stage(name):
+    return timer.stage(name)
+
+def lap(name):
+    timer.lap(name)
+
+def fromenvironment():
+    """
+    Report path prefix set by PYCSL_TIMING, or None
+    """
+    value = os.environ.get(variable, "")
+    if value in ["", "0"]:
+        return None
+    return default_prefix if value=="1" else value
+
+def summary(events):
+    """
+    Totals per stage over all ids: stage -> (count, total, max) in seconds
+    """
+    stages = {}
+    for event in events:
+        count, total, longest = stages.get(event["stage"], (0, 0.0, 0.0))
+        stages[event["stage"]] = (count+1, total+event["duration"], max(longest, event["duration"]))
+    return stages
+
+def report(events, limit=20):
+    """
+    Table of the slowest stages by total time
+    """
+    stages = summary(events)
+    build = sum(event["duration"] for event in events if event["stage"]=="record")
+    lines = ["%-56s %6s %10s %10s %10s %7s" % ("stage", "count", "total ms", "mean ms", "max ms", "share")]
+    for name, (count, total, longest) in sorted(stages.items(), key=lambda x: -x[1][1])[:limit]:
+        share = "%6.1f%%" % (100.0*total/build) if build and name.startswith("record/") else ""
+        lines.append("%-56s %6d %10.2f %10.3f %10.3f %7s" % (name, count, total*1000, total*1000/count, longest*1000, share))
+    return "\n".join(lines)
+
+def trace(events):
+    """
+    Chrome trace-event document (chrome://tracing, Perfetto): one complete
+    event per stage, one track per process
+    """
+    origin = min([event["start"] for event in events], default=0)
+    out = []
+    for event in events:
+        out.append({
+            "name": event["stage"].split("/")[-1],
+            "cat": event["id"] or "build",
+            "ph": "X",
+            "ts": round((event["start"]-origin)*1e6, 3),
+            "dur": round(event["duration"]*1e6, 3),
+            "pid": event["pid"],
+            "tid": event["pid"],
+            "args": {"id": event["id"], "stage": event["stage"]},
+        })
+    return {"traceEvents": out, "displayTimeUnit": "ms"}
+
+def save(events, prefix):
+    """
+    Write <prefix>.json (stage times per id, plus the raw events) and
+    <prefix>.trace.json; returns both paths
+    """
+    ids = {}
+    for event in events:
+        stages = ids.setdefault(event["id"] or "build", {})
+        stages[event["stage"]] = stages.get(event["stage"], 0.0)+event["duration"]
+    directory = os.path.dirname(os.path.abspath(prefix))
+    os.makedirs(directory, exist_ok=True)
+    paths = [prefix+".json", prefix+".trace.json"]
+    with open(paths[0], "w", encoding="utf-8") as f:
+        json.dump({"ids": ids, "events": events}, f, indent=1, ensure_ascii=False)
+    with open(paths[1], "w", encoding="utf-8") as f:
+        json.dump(trace(events), f, ensure_ascii=False)
+    return paths
@@ -1,12 +1,12 @@
-import os, re
-from lxml.etree import SubElement, QName
-import pandas as pd
+import re, copy
+from lxml.etree import Element, SubElement, QName
+from .config import ConfigStore
 
 class Tools:
-    def __init__(self, id):
+    def __init__(self, id, store=None):
         self.ns = {"z": "http://purl.org/net/xbiblio/csl"}
-        df = pd.read_excel(os.path.dirname(os.path.abspath(__file__))+"/../input/config.xlsx")[["variable", id]].fillna("")
-        self.config = dict(zip(df["variable"],df[id]))
+        self.store = store if store is not None else ConfigStore.load()
+        self.config = self.store.journal(id)
     
     def getformat(self, format):
         parts = []
@@ -67,17 +67,52 @@ class Tools:
         parent.insert(index, child)
         return child
     
+    def newelement(self, tag, text=None, attribs={}):
+        element = Element("{"+self.ns["z"]+"}"+tag)
+        if text is not None:
+            element.text = text
+        for a in attribs:
+            element.attrib[a] = attribs[a]
+        return element
+    
+    """
+    Position-aware editing: sibling operations only, no child list copies
+    """
+    def insertafter(self, reference, element):
+        reference.addnext(element)
+        return element
+    
+    def insertbefore(self, reference, element):
+        reference.addprevious(element)
+        return element
+    
+    def move(self, element, before=None, after=None, parent=None):
+        if before is not None:
+            before.addprevious(element)
+        elif after is not None:
+            after.addnext(element)
+        else:
+            (parent if parent is not None else element.getparent()).append(element)
+        return element
+    
     def qname(self, v):
         return QName("http://www.w3.org/XML/1998/namespace", v)
     
-    def localize(self, element, language="ja"):
-        if "macro" in element.attrib:
-            element.attrib["macro"] = element.attrib["macro"]+"-"+language
-            for a in element.attrib:
-                if a in ["prefix", "suffix"]:
-                    element.attrib.pop(a)
-        for c in element.getchildren():
-            self.localize(c)
+    def localize(self, element, languages=("ja",), clone=copy.deepcopy):
+        """
+        One copy of element per language, in a single walk over all the
+        copies: macro calls go to the language's twin ("-ja") and lose their
+        affixes
+        """
+        copies = [clone(element) for x in languages]
+        suffixes = ["-"+x for x in languages]
+        for nodes in zip(*[x.iterdescendants() for x in copies]):
+            if "macro" in nodes[0].attrib:
+                for node, suffix in zip(nodes, suffixes):
+                    node.attrib["macro"] = node.attrib["macro"]+suffix
+                    node.attrib.pop("prefix", None)
+                    node.attrib.pop("suffix", None)
+        return copies
     
     def render(self, d, parent, previous=None, after=None, where=None, path=None):
         if path is not None:
@@ -89,22 +124,14 @@ class Tools:
         children = d.get("children", [])
         element = None
         
-        if where is not None:
-            index = where
-        elif after is not None:
-            index = parent.getchildren().index(after)
-        elif previous is not None:
-            index = previous.getparent().getchildren().index(previous)+1
-        else:
-            try:
-                previous = parent.getchildren()[len(parent.getchildren())-1]
-                index = parent.getchildren().index(previous)+1
-            except:
-                index = 0
-        
         if tag is not None:
             element = SubElement(parent, tag)
-            parent.insert(index, element)
+            if where is not None:
+                parent.insert(where, element)
+            elif after is not None:
+                self.insertbefore(after, element)
+            elif previous is not None:
+                self.insertafter(previous, element)
             
             if text is not None:
                 setattr(element, "text", text)
@@ -0,0 +1,137 @@
+import os, sys, time, traceback
+from .config import ConfigStore
+from .template import Template
+from .build import recordids, SelectionError
+from .schema import ConfigError
+
+# Watch mode: the parsed template and config stay in memory, and the two
+# sources are polled for changes (mtime and size, read once they are stable,
+# so a spreadsheet being saved is not read half-written). A changed config is
+# diffed against the previous one column by column and only the output ids
+# whose Metadata record or Settings columns changed are rebuilt; a changed
+# template rebuilds everything.
+
+def stamp(path):
+    try:
+        status = os.stat(path)
+    except OSError:
+        return None
+    return (status.st_mtime_ns, status.st_size)
+
+def affected(old, new):
+    """
+    Output ids of new whose Metadata record or any Settings column changed
+    since old, and the Settings ids that changed
+    """
+    changed = set([id for id in set(old.settings)|set(new.settings) if old.settings.get(id, None)!=new.settings.get(id, None)])
+    before = {recordids(config)[1]: config for config in old.records()}
+    ids = []
+    for config in new.records():
+        settingsids, id = recordids(config)
+        if before.get(id, None)!=config or any(x in changed for x in settingsids):
+            ids.append(id)
+    return ids, changed
+
+class Watcher:
+    def __init__(self, configpath, templatepath, build, interval=0.25, out=sys.stdout):
+        """
+        build(store, template, ids) rebuilds the given output ids (None: every
+        id that is out of date)
+        """
+        self.paths = {"config": configpath, "template": templatepath}
+        self.build = build
+        self.interval = interval
+        self.out = out
+        self.store = ConfigStore(configpath)
+        self.template = Template(os.path.abspath(templatepath))
+        self.stamps = {name: stamp(path) for name, path in self.paths.items()}
+
+        # Ids of a failed rebuild, retried with the next one
+        self.pending = []
+
+    def log(self, message):
+        self.out.write(time.strftime("[%H:%M:%S] ")+message+"\n")
+        self.out.flush()
+
+    def changes(self):
+        """
+        Sources whose stamp changed and stayed the same over one more poll
+        """
+        moved = [name for name, path in self.paths.items() if stamp(path)!=self.stamps[name]]
+        if not moved:
+            return []
+        current = {name: stamp(self.paths[name]) for name in moved}
+        time.sleep(self.interval)
+        return [name for name in moved if stamp(self.paths[name])==current[name] and current[name] is not None]
+
+    def reload(self, names):
+        """
+        Read the changed sources; returns the output ids to rebuild (None for
+        all), or [] when nothing relevant changed or a source cannot be read yet
+        """
+        try:
+            store = ConfigStore(self.paths["config"]) if "config" in names else self.store
+            template = Template(os.path.abspath(self.paths["template"])) if "template" in names else self.template
+        except Exception as error:
+            # Keep the previous state; the next save is picked up again
+            self.log("Cannot read "+", ".join([self.paths[x] for x in names])+": "+str(error))
+            return []
+        for name in names:
+            self.stamps[name] = stamp(self.paths[name])
+
+        ids = []
+        if "config" in names:
+            ids, changed = affected(self.store, store)
+            self.log("Config changed: "+(", ".join(sorted(changed)) if changed else "no Settings column")+" -> "+(", ".join(ids) if ids else "nothing to rebuild"))
+        if "template" in names:
+            if template.digest!=self.template.digest:
+                self.log("Template changed: rebuilding every style")
+                ids = None
+            else:
+                self.log("Template saved without changes")
+        self.store = store
+        self.template = template
+
+        # Later lookups by path get the new sources too
+        ConfigStore.instances[os.path.abspath(self.paths["config"])] = store
+        Template.instances[os.path.abspath(self.paths["template"])] = template
+        return ids
+
+    def rebuild(self, ids):
+        if ids is not None and self.pending is not None:
+            ids = list(dict.fromkeys(self.pending+ids))
+        elif ids is not None:
+            ids = None
+        start = time.perf_counter()
+        try:
+            self.build(self.store, self.template, ids)
+        except (ConfigError, SelectionError) as error:
+            self.log(str(error))
+            self.pending = ids
+            return
+        except Exception:
+            traceback.print_exc(file=self.out)
+            self.pending = ids
+            return
+        self.pending = []
+        self.log("Done in %.2f s" % (time.perf_counter()-start))
+
+    def run(self, polls=None):
+        """
+        Build what is out of date, then poll until interrupted (or for polls polls)
+        """
+        self.rebuild(None)
+        self.log("Watching "+" and ".join(self.paths.values())+" (Ctrl+C to stop)")
+        count = 0
+        try:
+            while polls is None or count<polls:
+                count += 1
+                time.sleep(self.interval)
+                names = self.changes()
+                if not names:
+                    continue
+                ids = self.reload(names)
+                if ids is None or ids:
+                    self.rebuild(ids)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,117 @@
+import re, zipfile
+from lxml import etree as ET
+
+# Minimal .xlsx reader: streams xl/sharedStrings.xml and the requested
+# xl/worksheets/*.xml with iterparse and returns the cell values the way
+# pandas.read_excel(...).fillna("") does (str, bool, int or float; empty cells as "")
+
+main = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+relationships = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+package = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+def readsheets(path, names):
+    """
+    {sheet name: list of rows} for the named sheets; rows are lists of values,
+    the first row being the header
+    """
+    with zipfile.ZipFile(path) as archive:
+        targets = sheettargets(archive)
+        for name in names:
+            if name not in targets:
+                raise ValueError("Worksheet named '"+name+"' not found in "+path)
+        strings = sharedstrings(archive)
+        return {name: readrows(archive, targets[name], strings) for name in names}
+
+def records(rows):
+    """
+    Header row and data rows as (columns, list of dicts), pandas-style
+    """
+    if len(rows)==0:
+        return [], []
+    width = max(len(row) for row in rows)
+    header = rows[0]+[""]*(width-len(rows[0]))
+    columns = []
+    for i in range(width):
+        if header[i]!="":
+            columns.append((i, header[i]))
+        elif any(i<len(row) and row[i]!="" for row in rows[1:]):
+            columns.append((i, "Unnamed: "+str(i)))
+    data = []
+    for row in rows[1:]:
+        data.append({name: row[i] if i<len(row) else "" for i, name in columns})
+    return [name for i, name in columns], data
+
+def sheettargets(archive):
+    workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+    rels = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    paths = {}
+    for rel in rels.iter(package+"Relationship"):
+        target = rel.attrib["Target"]
+        paths[rel.attrib["Id"]] = target.lstrip("/") if target.startswith("/") else "xl/"+target
+    return {sheet.attrib["name"]: paths[sheet.attrib[relationships+"id"]] for sheet in workbook.iter(main+"sheet")}
+
+def sharedstrings(archive):
+    if "xl/sharedStrings.xml" not in archive.namelist():
+        return []
+    strings = []
+    with archive.open("xl/sharedStrings.xml") as f:
+        for event, si in ET.iterparse(f, tag=main+"si"):
+            strings.append(richtext(si))
+            si.clear()
+    return strings
+
+def richtext(element):
+    # Plain <t>, or runs <r><t>; phonetic readings (<rPh>) are not part of the value
+    text = element.find(main+"t")
+    if text is not None:
+        return text.text or ""
+    return "".join([(t.text or "") for t in element.iterfind(main+"r/"+main+"t")])
+
+def readrows(archive, target, strings):
+    rows = []
+    with archive.open(target) as f:
+        for event, row in ET.iterparse(f, tag=main+"row"):
+            number = int(row.attrib["r"])-1 if "r" in row.attrib else len(rows)
+            while len(rows)<number:
+                rows.append([])
+            values = []
+            for c in row.iterfind(main+"c"):
+                column = columnindex(c.attrib["r"]) if "r" in c.attrib else len(values)
+                while len(values)<column:
+                    values.append("")
+                values.append(cellvalue(c, strings))
+            while len(values)>0 and values[-1]=="":
+                values.pop()
+            rows.append(values)
+            row.clear()
+
+    # Trailing empty rows are not part of the sheet
+    while len(rows)>0 and len(rows[-1])==0:
+        rows.pop()
+    return rows
+
+def columnindex(reference):
+    letters = re.match(r"[A-Z]+", reference).group(0)
+    index = 0
+    for letter in letters:
+        index = index*26+ord(letter)-64
+    return index-1
+
+def cellvalue(c, strings):
+    kind = c.attrib.get("t", "n")
+    if kind=="inlineStr":
+        inline = c.find(main+"is")
+        return richtext(inline) if inline is not None else ""
+    v = c.find(main+"v")
+    if v is None or v.text is None:
+        return ""
+    if kind=="s":
+        return strings[int(v.text)]
+    if kind=="b":
+        return v.text=="1"
+    if kind in ["str", "d"]:
+        return v.text
+    if kind=="e":
+        return ""
+    number = float(v.text)
+    return int(number) if number.is_integer() and "." not in v.text and "E" not in v.text.upper() else number
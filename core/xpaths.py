@@ -0,0 +1,98 @@
+from lxml import etree as ET
+
+ns = {"z": "http://purl.org/net/xbiblio/csl"}
+
+# Queries used by Base and Processor, by name.
+# Names are the paths without the namespace prefix; $-variables are passed at call time.
+queries = {
+    # Style level
+    "locale": "z:locale[@xml:lang=$lang]",
+    "locale/terms": "z:locale[@xml:lang=$lang]/z:terms",
+    ".//macro-calls": ".//z:text[@macro]",
+
+    # Macro calls in layouts ($macro without the language suffix)
+    "macro-call": "z:text[@macro=concat($macro, $langsuffix)]",
+    "choose/if/macro-call": "z:choose/z:if/z:text[@macro=concat($macro, $langsuffix)]",
+
+    # Layout and macro bodies
+    ".//label": ".//z:label",
+    "date": "z:date",
+    "date[@variable='original-date']": "z:date[@variable='original-date']",
+    "else-if": "z:else-if",
+    "group": "z:group",
+    "text": "z:text",
+    "names/name": "z:names/z:name",
+    "group/names/label": "z:group/z:names/z:label",
+    "group/names/name": "z:group/z:names/z:name",
+    "group/text[@variable='publisher-place']": "z:group/z:text[@variable='publisher-place']",
+    "group/choose/if/group": "z:group/z:choose/z:if/z:group",
+    "group/choose/else/group": "z:group/z:choose/z:else/z:group",
+    "group/choose/if[@type='legal_case']": "z:group/z:choose/z:if[@type='legal_case']",
+    "group/choose/if[@type='legal_case']/choose/if/text": "z:group/z:choose/z:if[@type='legal_case']/z:choose/z:if/z:text",
+    "group/choose/if[@type='legal_case']/choose/else/text": "z:group/z:choose/z:if[@type='legal_case']/z:choose/z:else/z:text",
+    "group/choose/if[@type='webpage post-weblog']": "z:group/z:choose/z:if[@type='webpage post-weblog']",
+    "group/choose/if[@type='webpage post-weblog']/date": "z:group/z:choose/z:if[@type='webpage post-weblog']/z:date",
+    "group/choose/if[@variable='issued']/group": "z:group/z:choose/z:if[@variable='issued']/z:group",
+    "group/choose/if[@variable='issued']/group/text": "z:group/z:choose/z:if[@variable='issued']/z:group/z:text",
+    "choose/if/text": "z:choose/z:if/z:text",
+    "choose/if/group": "z:choose/z:if/z:group",
+    "choose/if/group/names": "z:choose/z:if/z:group/z:names",
+    "choose/if/group/names/name": "z:choose/z:if/z:group/z:names/z:name",
+    "choose/if/group/names/label": "z:choose/z:if/z:group/z:names/z:label",
+    "choose/if/group/names[@variable='editor translator']": "z:choose/z:if/z:group/z:names[@variable='editor translator']",
+    "choose/if/choose": "z:choose/z:if/z:choose",
+    "choose/if/choose/if": "z:choose/z:if/z:choose/z:if",
+    "choose/if/choose/if/text": "z:choose/z:if/z:choose/z:if/z:text",
+    "choose/if/choose/if/group": "z:choose/z:if/z:choose/z:if/z:group",
+    "choose/if/choose/if/group/choose/if": "z:choose/z:if/z:choose/z:if/z:group/z:choose/z:if",
+    "choose/if/choose/if/group/choose/if/text": "z:choose/z:if/z:choose/z:if/z:group/z:choose/z:if/z:text",
+    "choose/if/choose/if/group/choose/else": "z:choose/z:if/z:choose/z:if/z:group/z:choose/z:else",
+    "choose/if/choose/else-if/group": "z:choose/z:if/z:choose/z:else-if/z:group",
+    "choose/if/choose/else-if/group/text[@variable='issue']": "z:choose/z:if/z:choose/z:else-if/z:group/z:text[@variable='issue']",
+    "choose/if/choose/else-if/group/text[@term='issue']": "z:choose/z:if/z:choose/z:else-if/z:group/z:text[@term='issue']",
+    "choose/if/choose/else": "z:choose/z:if/z:choose/z:else",
+    "choose/if/choose/else/text": "z:choose/z:if/z:choose/z:else/z:text",
+    "choose/if[@type='webpage']/text": "z:choose/z:if[@type='webpage']/z:text",
+    "choose/else-if/group/text": "z:choose/z:else-if/z:group/z:text",
+    "choose/else-if/choose/if/group": "z:choose/z:else-if/z:choose/z:if/z:group",
+    "choose/else-if/choose/if/text": "z:choose/z:else-if/z:choose/z:if/z:text",
+    "choose/else-if/choose/else/text": "z:choose/z:else-if/z:choose/z:else/z:text",
+    "choose/else-if[@type='bill book graphic legislation motion_picture song']/text": "z:choose/z:else-if[@type='bill book graphic legislation motion_picture song']/z:text",
+    "choose/else/text": "z:choose/z:else/z:text",
+    "choose/else/group": "z:choose/z:else/z:group",
+}
+
+class QueryError(LookupError):
+    pass
+
+class XPaths:
+    """
+    Registry of precompiled queries shared by every build in the process
+    """
+    def __init__(self, queries):
+        self.queries = queries
+        self.compiled = {name: ET.XPath(queries[name], namespaces=ns) for name in queries}
+
+    def all(self, name, element, **variables):
+        if element is None:
+            raise QueryError("Query '"+name+"' ("+self.queries[name]+") has no context node: the macro or layout it targets is missing from the template")
+        return self.compiled[name](element, **variables)
+
+    def first(self, name, element, **variables):
+        result = self.all(name, element, **variables)
+        if len(result)==0:
+            raise QueryError("Query '"+name+"' ("+self.queries[name]+") matched no node under "+self.describe(element)+self.describevariables(variables))
+        return result[0]
+
+    def describe(self, element):
+        tag = ET.QName(element).localname
+        if "name" in element.attrib:
+            return "<"+tag+" name='"+element.attrib["name"]+"'>"
+        return "<"+tag+">"
+
+    def describevariables(self, variables):
+        if len(variables)==0:
+            return ""
+        return " with "+", ".join([k+"='"+str(variables[k])+"'" for k in variables])
+
+xpaths = XPaths(queries)
@@ -1,18 +1,285 @@
-import os
+import os, sys, argparse, fnmatch
+from core.config import ConfigStore, convert
+from core.template import Template
 from core.base import Base
-import pandas as pd
+from core.manifest import Manifest
+from core.build import recordids, selectrecords, buildrecord, buildparallel, buildtimestamp, SelectionError
+from core import timing
+from core.schema import validate, ConfigError
 
 class Pycsl:
-    def __init__(self):
-        df = pd.read_excel(os.path.dirname(os.path.abspath(__file__))+"/input/config.xlsx", sheet_name="Metadata").fillna("")
-        configs = df.to_dict(orient="records")
-        for config in configs:
-            ids = [x.strip() for x in config["ids"].split(",")]
-            multilingual = len(ids)>1
-            name = config["name"]
-            language = config["language"]
-            self.base = Base(ids, name, language, multilingual, config)    
-            self.base.create()
+    def __init__(self, store=None, template=None, jobs=1, updated=None, force=False, ids=None, journals=None, dryrun=False, compact=False):
+        self.store = store if store is not None else ConfigStore.load(os.path.dirname(os.path.abspath(__file__))+"/input/config.xlsx")
+        with timing.stage("template"):
+            self.template = template if template is not None else Template.load(os.path.dirname(os.path.abspath(__file__))+"/input/chicago-author-date.csl")
+        self.updated = updated if updated is not None else buildtimestamp()
+        
+        # Only the requested records go any further
+        records = selectrecords(self.store.records(), ids, journals)
+        
+        # Every Settings value of every id is checked before any tree is built
+        with timing.stage("validate"):
+            validate(self.store, [x for config in records for x in recordids(config)[0]])
+        
+        # Skip records whose inputs did not change since the last build
+        with timing.stage("manifest"):
+            manifest = Manifest()
+            generator = Manifest.generatordigest()
+            options = {"compact": True} if compact else None
+            configs = []
+            digests = {}
+            self.skipped = []
+            for config in records:
+                recordidlist, id = recordids(config)
+                digest = Manifest.digest(self.template.digest, generator, config, {x: self.store.getsettings(x) for x in recordidlist}, options)
+                if not force and manifest.uptodate(id, Base.outputpath(id), digest):
+                    self.skipped.append(id)
+                    continue
+                digests[id] = digest
+                configs.append(config)
+        
+        self.rebuilt = list(digests.keys())
+        if dryrun:
+            self.outputs = []
+            self.sizes = []
+            self.report("Would rebuild")
+            return
+        
+        if jobs!=1:
+            built = buildparallel(configs, self.store, self.template, self.updated, jobs, compact)
+        else:
+            built = []
+            for config in configs:
+                self.base = buildrecord(config, self.store, self.template, self.updated, compact)
+                built.append((self.base.output, self.base.sizes))
+        self.outputs = [output for output, sizes in built]
+        self.sizes = [(id, sizes[0], sizes[1]) for id, (output, sizes) in zip(self.rebuilt, built) if sizes is not None]
+        
+        with timing.stage("manifest"):
+            for id in self.rebuilt:
+                manifest.update(id, Base.outputpath(id), digests[id])
+            manifest.save()
+        self.report("Rebuilt")
+        if self.sizes:
+            from core.optimize import report
+            print(report(self.sizes))
+    
+    def report(self, label):
+        print(label+": "+(", ".join(self.rebuilt) if self.rebuilt else "none"))
+        if self.skipped:
+            print("Up to date: "+", ".join(self.skipped))
+
+def configstore(args):
+    return ConfigStore.load(args.config if args.config is not None else os.path.dirname(os.path.abspath(__file__))+"/input/config.xlsx")
+
+def build(args):
+    prefix = args.timing if args.timing is not None else timing.fromenvironment()
+    timing.timer.enable(prefix is not None)
+    with timing.stage("config"):
+        store = configstore(args)
+    try:
+        Pycsl(store, jobs=args.jobs, force=args.force, ids=args.id, journals=args.journal, dryrun=args.dry_run, compact=args.compact)
+    except (ConfigError, SelectionError) as error:
+        sys.exit(str(error))
+    if prefix is not None:
+        events = timing.timer.drain()
+        print(timing.report(events))
+        print("Timings: "+", ".join(timing.save(events, prefix)))
+
+def watching(args):
+    from core.watch import Watcher
+    root = os.path.dirname(os.path.abspath(__file__))
+    def rebuild(store, template, ids):
+        # ids come from the config diff; the filters of the command still apply
+        selected = args.id if ids is None else [x for x in ids if not args.id or any(fnmatch.fnmatchcase(x, p) for p in args.id)]
+        if ids is not None and not selected:
+            return
+        Pycsl(store, template, ids=selected, journals=args.journal)
+    configpath = args.config if args.config is not None else root+"/input/config.xlsx"
+    Watcher(configpath, root+"/input/chicago-author-date.csl", rebuild, args.interval).run()
+
+def catalogue(args):
+    store = configstore(args)
+    try:
+        records = selectrecords(store.records(), args.id, args.journal)
+    except SelectionError as error:
+        sys.exit(str(error))
+    for config in records:
+        print(recordids(config)[1]+"\t"+config["name"]+" ("+config["language"]+")")
+
+def conversion(args):
+    print("Wrote "+convert(configstore(args).path, args.destination))
+
+def patching(args):
+    from core.build import buildpatch
+    store = configstore(args)
+    records = [config for config in store.records() if recordids(config)[1]==args.style]
+    if not records:
+        raise KeyError("No Metadata record with output id '"+args.style+"'")
+    patch = buildpatch(records[0], store, Template.load(os.path.dirname(os.path.abspath(__file__))+"/input/chicago-author-date.csl"), buildtimestamp())
+    print(args.style+": "+str(len(patch.ops))+" ops ("+", ".join([str(n)+" "+kind for kind, n in sorted(patch.summary().items())])+")")
+    if not args.summary:
+        print(patch.describe())
+
+def sampling(args):
+    from core.samples import readcorpus, buildsamples
+    import time
+    store = configstore(args)
+    try:
+        records = selectrecords(store.records(), args.id, args.journal)
+        validate(store, [x for config in records for x in recordids(config)[0]])
+    except (ConfigError, SelectionError) as error:
+        sys.exit(str(error))
+    corpus = readcorpus(args.corpus)
+    start = time.perf_counter()
+    paths = buildsamples(records, store, Template.load(os.path.dirname(os.path.abspath(__file__))+"/input/chicago-author-date.csl"), corpus, args.output, args.jobs)
+    print("Wrote %d sample documents (%d citations, %d references each) to %s in %.2f s" % (len(paths), len(corpus["clusters"]), len(corpus["items"]), args.output, time.perf_counter()-start))
+
+def packaging(args):
+    from core.package import package, indexname, bundlename
+    index, read = package(args.input, args.output, args.jobs, args.base_url)
+    print("Packaged %d styles into %s (%d read, %d unchanged): %s, %s and .gz copies" % (len(index["styles"]), args.output, read, len(index["styles"])-read, indexname, bundlename))
+
+def stylesource(args):
+    """
+    Serialized style for a .csl path or an output id; ids not built yet are generated in memory
+    """
+    path = args.style if os.path.splitext(args.style)[1]==".csl" else os.path.dirname(os.path.abspath(__file__))+"/"+Base.outputpath(args.style)
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    if args.style.endswith(".csl"):
+        raise FileNotFoundError(path)
+    from core.build import generate
+    store = configstore(args)
+    for config in store.records():
+        ids, id = recordids(config)
+        if id==args.style:
+            return generate(config, {x: store.getsettings(x) for x in ids}, Template.load(os.path.dirname(os.path.abspath(__file__))+"/input/chicago-author-date.csl"))
+    raise KeyError("No Metadata record with output id '"+args.style+"'")
+
+def rendercache(args):
+    if args.cache is None:
+        return None
+    from core.cache import RenderCache
+    return RenderCache(args.cache if args.cache!="" else None)
+
+def report(cache):
+    stats = cache.stats()
+    print("Render cache: %d hits, %d misses, %d evicted (%d entries, %.1f MB)" % (stats["hits"], stats["misses"], stats["evicted"], stats["entries"], stats["bytes"]/1048576), file=sys.stderr)
+
+def rendering(args):
+    import json
+    from core.renderer import Renderer
+    with open(args.items, encoding="utf-8") as f:
+        items = json.load(f)
+    renderer = Renderer.load(stylesource(args), args.format)
+    if args.citations:
+        text = "".join([renderer.citation([item])+"\n" for item in items])
+    else:
+        cache = rendercache(args)
+        text = renderer.document(items, cache=cache)
+        if cache is not None:
+            report(cache)
+    if args.output is None:
+        sys.stdout.write(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+def exporting(args):
+    from core.stream import export
+    data = stylesource(args)
+    cache = rendercache(args)
+    cachepath = cache.path if cache is not None else None
+    before = cache.stats() if cache is not None else None
+    if args.output is None:
+        count = export(data, args.items, sys.stdout, args.format, args.jobs, args.shard_size, cachepath)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            count = export(data, args.items, f, args.format, args.jobs, args.shard_size, cachepath)
+    print("Wrote "+str(count)+" entries", file=sys.stderr)
+    if cache is not None:
+        # Lookups happened in the workers: count them from the totals of the cache file
+        stats = cache.stats()
+        cache.hits, cache.misses, cache.evicted = [stats["total "+x]-before["total "+x] for x in ["hits", "misses", "evicted"]]
+        report(cache)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the journal CSL styles listed in input/config.xlsx")
+    commands = parser.add_subparsers(dest="command")
+    
+    # Config source and record filters shared by the subcommands
+    select = argparse.ArgumentParser(add_help=False)
+    select.add_argument("--config", help="config source: config.xlsx, .json, .toml or a directory of CSV files (default: input/config.xlsx)")
+    select.add_argument("--id", action="append", help="output id or glob pattern, e.g. kyosei-ja or '*-en' (repeatable)")
+    select.add_argument("--journal", action="append", help="journal name or glob pattern (repeatable)")
+    
+    command = commands.add_parser("build", parents=[select], help="generate styles (default)")
+    command.add_argument("-j", "--jobs", type=int, default=1, help="worker processes (0: one per CPU)")
+    command.add_argument("-f", "--force", action="store_true", help="rebuild every style even if its inputs did not change")
+    command.add_argument("-n", "--dry-run", action="store_true", help="list the styles that would be rebuilt without writing anything")
+    command.add_argument("--timing", nargs="?", const=timing.default_prefix, metavar="PREFIX", help="time each build stage per id; writes PREFIX.json and PREFIX.trace.json (Chrome trace) and prints the slowest stages (default: .cache/build-timing; also set by PYCSL_TIMING)")
+    command.add_argument("--compact", action="store_true", help="release form: drop unreachable macros and no-op attributes, no indentation; prints a size report")
+    command.set_defaults(run=build)
+    
+    command = commands.add_parser("watch", parents=[select], help="keep the template and config loaded and rebuild the styles affected by each change")
+    command.add_argument("--interval", type=float, default=0.25, help="seconds between polls of the config and the template")
+    command.set_defaults(run=watching)
+    
+    command = commands.add_parser("list", parents=[select], help="list output ids and journals")
+    command.set_defaults(run=catalogue)
+    
+    command = commands.add_parser("convert", help="write the configuration as .json, .toml or a directory of CSV files")
+    command.add_argument("destination", help="e.g. input/config.json, input/config.toml or input/config (CSV)")
+    command.add_argument("--config", help="source (default: input/config.xlsx)")
+    command.set_defaults(run=conversion)
+    
+    command = commands.add_parser("patch", help="show a style as the edits that turn the template into it")
+    command.add_argument("style", help="output id, e.g. kyosei-ja")
+    command.add_argument("--summary", action="store_true", help="only count the ops")
+    command.add_argument("--config", help="config source (default: input/config.xlsx)")
+    command.set_defaults(run=patching)
+    
+    command = commands.add_parser("samples", parents=[select], help="write a sample .docx citing a fixed reference corpus for every selected style")
+    command.add_argument("-j", "--jobs", type=int, default=1, help="worker processes (0: one per CPU)")
+    command.add_argument("-o", "--output", default="output/samples", help="directory of the documents (default: output/samples)")
+    command.add_argument("--corpus", nargs="+", help="corpus .json file, or .docx files whose Zotero citations are the corpus (default: input/samples.json)")
+    command.set_defaults(run=sampling)
+    
+    command = commands.add_parser("package", help="write the release catalogue of the built styles: index.json, .gz copies and a zip bundle")
+    command.add_argument("-o", "--output", default="dist", help="release directory (default: dist)")
+    command.add_argument("--input", default="output", help="directory of the built styles (default: output)")
+    command.add_argument("-j", "--jobs", type=int, default=1, help="worker processes (0: one per CPU)")
+    command.add_argument("--base-url", help="download URL prefix added to each index entry, e.g. https://github.com/frianasoa/pycsl/releases/latest/download")
+    command.set_defaults(run=packaging)
+    
+    command = commands.add_parser("render", help="render CSL-JSON items with a generated style")
+    command.add_argument("style", help="output id or .csl file, e.g. kyosei-ja or output/chicago-author-date-kyosei-ja.csl")
+    command.add_argument("items", help="CSL-JSON file (a list of items)")
+    command.add_argument("--format", choices=["text", "html", "rtf"], default="text")
+    command.add_argument("--citations", action="store_true", help="one citation per item instead of the bibliography")
+    command.add_argument("-o", "--output", help="output file (default: standard output)")
+    command.add_argument("--cache", nargs="?", const="", help="reuse rendered entries from a render cache (default file: .cache/render-cache.sqlite)")
+    command.add_argument("--config", help="config source used for styles not built yet (default: input/config.xlsx)")
+    command.set_defaults(run=rendering)
+    
+    command = commands.add_parser("export", help="stream a whole library through a generated style, sorted, in bounded memory")
+    command.add_argument("style", help="output id or .csl file")
+    command.add_argument("items", help="CSL-JSON array or JSON Lines file, read incrementally")
+    command.add_argument("--format", choices=["text", "html", "rtf"], default="text")
+    command.add_argument("-o", "--output", help="output file (default: standard output)")
+    command.add_argument("-j", "--jobs", type=int, default=1, help="worker processes (0: one per CPU)")
+    command.add_argument("--shard-size", type=int, default=5000, help="items per sorted shard")
+    command.add_argument("--cache", nargs="?", const="", help="reuse rendered entries from a render cache (default file: .cache/render-cache.sqlite)")
+    command.add_argument("--config", help="config source used for styles not built yet (default: input/config.xlsx)")
+    command.set_defaults(run=exporting)
+    
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv)==0 or argv[0] not in commands.choices and argv[0] not in ["-h", "--help"]:
+        argv = ["build"]+argv
+    args = parser.parse_args(argv)
+    args.run(args)
 
 if __name__=="__main__":
-    Pycsl()
\ No newline at end of file
+    main()
\ No newline at end of file
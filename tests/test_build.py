@@ -0,0 +1,59 @@
+import os, sys, json, zipfile
+root = os.path.dirname(os.path.abspath(__file__))+"/.."
+sys.path.insert(0, root)
+
+from core.config import ConfigStore
+from core.template import Template
+from core.samples import readcorpus, buildsamples
+from core.build import selectrecords
+import pycsl
+
+def memorytemplate():
+    with open(root+"/input/chicago-author-date.csl", "rb") as f:
+        return Template(data=f.read())
+
+def test_inmemory_template_parallel_build(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = ConfigStore.load(root+"/input/config.xlsx")
+    template = memorytemplate()
+    updated = "2000-01-01T00:00:00+00:00"
+    parallel = pycsl.Pycsl(store, template, jobs=2, updated=updated, force=True, ids=["kyosei-*"])
+    assert len(parallel.outputs)==2
+    built = {}
+    for output in parallel.outputs:
+        with open(output, "rb") as f:
+            built[output] = f.read()
+    serial = pycsl.Pycsl(store, template, updated=updated, force=True, ids=["kyosei-*"])
+    for output in serial.outputs:
+        with open(output, "rb") as f:
+            assert f.read()==built[output]
+
+def test_inmemory_template_parallel_samples(tmp_path):
+    store = ConfigStore.load(root+"/input/config.xlsx")
+    records = selectrecords(store.records(), ["kyosei-*"])
+    paths = buildsamples(records, store, memorytemplate(), readcorpus(), str(tmp_path), jobs=2)
+    assert len(paths)==2 and all(os.path.getsize(x)>0 for x in paths)
+
+def test_samples_from_docx_corpus(tmp_path):
+    corpus = readcorpus([root+"/output/chicago-author-date-aerj-ja-test.docx", root+"/output/chicago-author-date-kyosei-ja-test.docx"])
+    # input/samples.json is the corpus of the two documents as extracted
+    with open(root+"/input/samples.json", encoding="utf-8") as f:
+        assert corpus==json.load(f)
+    store = ConfigStore.load(root+"/input/config.xlsx")
+    records = selectrecords(store.records(), ["aerj-*"])
+    paths = buildsamples(records, store, memorytemplate(), corpus, str(tmp_path))
+    assert len(paths)==2
+    for path in paths:
+        with zipfile.ZipFile(path) as archive:
+            document = archive.read("word/document.xml").decode("utf-8")
+        # Item 5216 has its editor in the note field
+        assert "環境省" in document
+
+def test_unmatched_patterns_are_reported():
+    import pytest
+    from core.build import SelectionError
+    store = ConfigStore.load(root+"/input/config.xlsx")
+    with pytest.raises(SelectionError) as error:
+        selectrecords(store.records(), ["kyosei-*", "nope"], ["Zzz*"])
+    assert error.value.patterns==[("--id", "nope"), ("--journal", "Zzz*")]
+    assert len(selectrecords(store.records(), ["kyosei-*"]))==2
@@ -0,0 +1,64 @@
+import os, sys, json
+root = os.path.dirname(os.path.abspath(__file__))+"/.."
+sys.path.insert(0, root)
+
+from core import cache
+from core.cache import RenderCache
+from core.renderer import Renderer, normalize
+
+def library():
+    with open(root+"/input/samples.json", encoding="utf-8") as f:
+        return [normalize(x) for x in json.load(f)["items"]]
+
+def renderer():
+    return Renderer.load(root+"/output/chicago-author-date-kyosei-ja.csl")
+
+def test_cached_records(tmp_path):
+    items = library()
+    path = str(tmp_path/"cache.sqlite")
+    expected = [renderer().record(x) for x in items]
+    store = RenderCache(path)
+    assert store.records(renderer(), items)==expected
+    assert (store.hits, store.misses)==(0, len(items))
+    store.close()
+
+    # Another process: everything is read back
+    store = RenderCache(path)
+    assert store.records(renderer(), items)==expected
+    assert (store.hits, store.misses)==(len(items), 0)
+    assert store.records(renderer(), items+[dict(items[0], title="Another")])[-1]!=expected[0]
+    assert store.misses==1
+    store.close()
+
+def test_other_renderer_version_is_dropped(tmp_path, monkeypatch):
+    items = library()
+    path = str(tmp_path/"cache.sqlite")
+    store = RenderCache(path)
+    store.records(renderer(), items)
+    store.close()
+    monkeypatch.setattr(cache, "rendererversion", cache.rendererversion+1)
+    store = RenderCache(path)
+    assert store.stats()["entries"]==0
+    store.records(renderer(), items)
+    assert store.misses==len(items)
+    store.close()
+    # Still the same version: kept
+    store = RenderCache(path)
+    assert store.stats()["entries"]==len(items)
+
+def test_least_recently_used_eviction(tmp_path):
+    items = library()
+    store = RenderCache(str(tmp_path/"cache.sqlite"))
+    store.records(renderer(), items[:10])
+    size = store.size()
+    store.records(renderer(), items[:5])
+    store.limit = size*3//2
+    store.records(renderer(), items[10:20])
+    assert store.evicted>0 and store.size()<=store.limit
+    # Entries are dropped least recently used first: no entry is left from a
+    # group older than one with dropped entries
+    left = set([row[0] for row in store.connection.execute("SELECT item FROM entries")])
+    groups = [[cache.itemdigest(x) in left for x in group] for group in [items[5:10], items[:5], items[10:20]]]
+    assert not any(groups[0])
+    for older, newer in zip(groups, groups[1:]):
+        assert all(newer) or not any(older)
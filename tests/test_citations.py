@@ -0,0 +1,58 @@
+import os, sys, json
+root = os.path.dirname(os.path.abspath(__file__))+"/.."
+sys.path.insert(0, root)
+
+import pytest
+from core.citations import CitationDocument
+from core.renderer import Renderer
+
+def corpus():
+    with open(root+"/input/samples.json", encoding="utf-8") as f:
+        return json.load(f)
+
+def fresh(renderer, items, clusters):
+    document = CitationDocument(renderer, items)
+    document.extend(clusters)
+    return document.output()
+
+def test_positions():
+    document = CitationDocument(root+"/output/chicago-author-date-kyosei-ja.csl", corpus()["items"])
+    document.extend([["5195"], [{"id": "5195", "locator": "65"}], [{"id": "5195", "locator": "66"}], ["5216", "5195"], ["5195"]])
+    assert document.positions()==[("first",), ("ibid-with-locator",), ("ibid-with-locator",), ("first", "subsequent"), ("subsequent",)]
+    document.append([{"id": 5195, "locator": "66"}, {"id": 5195, "locator": "66"}])
+    assert document.positions()[-1]==("ibid-with-locator", "ibid")
+    with pytest.raises(KeyError):
+        document.append(["nope"])
+
+def test_edits_render_only_changed_clusters():
+    data = corpus()
+    renderer = Renderer.load(root+"/output/chicago-author-date-kyosei-ja.csl")
+    clusters = [[str(cite["id"]) for cite in cluster] for cluster in data["clusters"]]
+    document = CitationDocument(renderer, data["items"])
+    assert document.extend(clusters)==len(clusters)
+    assert document.output()==fresh(renderer, data["items"], clusters)
+
+    # Updating a cluster renders it and the clusters whose positions changed
+    before = document.positions()
+    clusters[3] = ["7427"]
+    rendered = document.update(3, clusters[3])
+    after = document.positions()
+    assert rendered==1+len([i for i in range(len(clusters)) if i!=3 and before[i]!=after[i]])<len(clusters)
+    assert document.output()==fresh(renderer, data["items"], clusters)
+
+    # Moving clusters renders those whose positions changed, nothing else
+    last = clusters.pop()
+    clusters.insert(0, last)
+    document.move(len(clusters)-1, 0)
+    assert document.rendered<len(clusters)
+    assert document.output()==fresh(renderer, data["items"], clusters)
+
+    # Replacing an item renders the clusters citing it again
+    item = dict([x for x in data["items"] if str(x["id"])=="7427"][0], title="Another title")
+    assert document.additems([item])==len([x for x in clusters if "7427" in x])>1
+    items = [item if str(x["id"])=="7427" else x for x in data["items"]]
+    assert document.output()==fresh(renderer, items, clusters)
+
+    del clusters[3]
+    document.delete(3)
+    assert document.output()==fresh(renderer, items, clusters)
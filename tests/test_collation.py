@@ -0,0 +1,46 @@
+import os, sys
+root = os.path.dirname(os.path.abspath(__file__))+"/.."
+sys.path.insert(0, root)
+
+from core.collation import Collator, kanakey, namekana, romajikana
+from core.renderer import Renderer, normalize
+
+def test_kana_keys():
+    # Voicing and small kana are secondary differences only
+    assert kanakey("がっこう")[0]==kanakey("かつこう")[0]
+    assert kanakey("がっこう")[1]!=kanakey("かつこう")[1]
+    # Katakana reads as hiragana, the long vowel mark as its vowel
+    assert kanakey("カー")==kanakey("かあ")
+
+def test_gojuon_order():
+    readings = ["やまだ", "あべ", "さとう", "がとう", "かとう", "ハヤシ", ""]
+    assert Collator().sort(readings, [readings], [True])==["あべ", "かとう", "がとう", "さとう", "ハヤシ", "やまだ", ""]
+
+def test_descending_keeps_empty_values_last():
+    collator = Collator()
+    keys = collator.keys([["b", "", "a"]], [False])
+    assert collator.order(keys, [True])==[0, 2, 1]
+    assert sorted(keys, key=lambda key: collator.mergekey(key, [True]))==[keys[0], keys[2], keys[1]]
+
+def test_strings_ignore_case_and_accents():
+    words = ["b", "Émile", "apple", "Zed"]
+    assert Collator().sort(words, [words], [False])==["apple", "b", "Émile", "Zed"]
+
+def test_name_readings():
+    assert namekana({"name-kana": "やまだ", "author": [{"family": "山田"}]})=="やまだ"
+    assert namekana({"author": [{"family": "ジャクソン", "given": "マイケル"}]})=="ジャクソン マイケル"
+    assert namekana({"language": "ja", "editor": [{"family": "Satō", "given": "Hanako"}]})=="さとうはなこ"
+    assert namekana({"author": [{"family": "Satō", "given": "Hanako"}]})==""
+    assert namekana({"language": "ja", "author": [{"family": "佐藤", "given": "章"}]})==""
+    assert romajikana("Hattori")=="はっとり" and romajikana("Smith")==""
+
+def test_mixed_bibliography_order():
+    def book(id, family, given, language=None, note=None, year=2000):
+        item = {"id": id, "type": "book", "title": "T", "author": [{"family": family, "given": given}], "issued": {"date-parts": [[year]]}}
+        item.update({k: v for k, v in [("language", language), ("note", note)] if v})
+        return item
+    items = [book(1, "Smith", "John"), book(2, "山田", "太郎", "ja", "name-kana:やまだ"), book(3, "佐藤", "章", "ja"), book(4, "Abe", "Shinzo", "ja"), book(5, "ジャクソン", "マイケル", "ja"), book(6, "秋山", "花", "ja", "name-kana:あきやま"), book(7, "Adams", "Ann"), book(8, "山田", "太郎", "ja", "name-kana:やまだ", 1999)]
+    renderer = Renderer.load(root+"/output/chicago-author-date-kyosei-ja.csl")
+    # Readings in gojūon order (name-kana, kana names, romanized Japanese
+    # names), then the items without a reading by name
+    assert [int(x["id"]) for x in renderer.sort([normalize(x) for x in items])]==[6, 4, 5, 8, 2, 7, 1, 3]
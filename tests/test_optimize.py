@@ -0,0 +1,41 @@
+import os, sys, json
+root = os.path.dirname(os.path.abspath(__file__))+"/.."
+sys.path.insert(0, root)
+
+from lxml import etree as ET
+from core.config import ConfigStore
+from core.template import Template
+from core.build import generate, recordids, selectrecords
+from core.optimize import reachable
+from core.renderer import Renderer
+
+csl = "{http://purl.org/net/xbiblio/csl}"
+updated = "2000-01-01T00:00:00+00:00"
+
+def test_compact_styles_render_the_same():
+    store = ConfigStore.load(root+"/input/config.xlsx")
+    template = Template.load(root+"/input/chicago-author-date.csl")
+    with open(root+"/input/samples.json", encoding="utf-8") as f:
+        corpus = json.load(f)
+    items = {x["id"]: x for x in corpus["items"]}
+    count = 0
+    for config in selectrecords(store.records(), ["kyosei-*", "aerj-*"]):
+        ids, id = recordids(config)
+        settings = {x: store.getsettings(x) for x in ids}
+        full = generate(config, settings, template, updated)
+        compact = generate(config, settings, template, updated, compact=True)
+        assert len(compact)<len(full) and b"\n  " not in compact
+
+        # Only reachable macros, no empty affixes or comments are left
+        style = ET.fromstring(compact)
+        assert set([x.attrib["name"] for x in style.iterfind(csl+"macro")])==reachable(style)
+        assert not [x for x in style.iter() if isinstance(x.tag, str) and "" in [x.attrib.get("prefix", None), x.attrib.get("suffix", None)]]
+        assert not list(style.iter(ET.Comment))
+
+        before, after = Renderer.load(full), Renderer.load(compact)
+        assert after.bibliography(corpus["items"])==before.bibliography(corpus["items"])
+        for cluster in corpus["clusters"]:
+            cites = [dict(cite, item=items[cite["id"]]) for cite in cluster]
+            assert after.citation(cites)==before.citation(cites)
+        count += 1
+    assert count==4
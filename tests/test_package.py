@@ -0,0 +1,55 @@
+import os, sys, glob, gzip, json, shutil, zipfile, hashlib
+root = os.path.dirname(os.path.abspath(__file__))+"/.."
+sys.path.insert(0, root)
+
+from core.package import package
+
+def styles(tmp_path):
+    directory = tmp_path/"output"
+    directory.mkdir()
+    for path in glob.glob(root+"/output/*.csl"):
+        shutil.copy(path, str(directory))
+    return str(directory)
+
+def files(destination):
+    out = {}
+    for path in sorted(glob.glob(os.path.join(destination, "*"))):
+        with open(path, "rb") as f:
+            out[os.path.basename(path)] = f.read()
+    return out
+
+def test_package(tmp_path):
+    directory = styles(tmp_path)
+    destination = str(tmp_path/"dist")
+    index, read = package(directory, destination, jobs=2, baseurl="https://example.org/download/")
+    paths = sorted(glob.glob(os.path.join(directory, "*.csl")))
+    assert read==len(paths)==len(index["styles"])
+    entry = [x for x in index["styles"] if x["id"]=="kyosei-ja"][0]
+    assert entry["language"]=="ja" and entry["url"]=="https://example.org/download/chicago-author-date-kyosei-ja.csl"
+
+    # Every style is in the index, in its .gz copy and in the bundle
+    bundle = zipfile.ZipFile(os.path.join(destination, "styles.zip"))
+    assert bundle.testzip() is None
+    for path in paths:
+        with open(path, "rb") as f:
+            data = f.read()
+        name = os.path.basename(path)
+        assert [x["sha256"] for x in index["styles"] if x["file"]==name]==[hashlib.sha256(data).hexdigest()]
+        with gzip.open(os.path.join(destination, name+".gz")) as f:
+            assert f.read()==data
+        assert bundle.read(name)==data
+    assert json.loads(bundle.read("index.json"))==index
+
+    # Unchanged styles are not read again and give the same bytes
+    before = files(destination)
+    assert package(directory, destination, jobs=1, baseurl="https://example.org/download/")[1]==0
+    assert files(destination)==before
+
+    # A changed style is read again, a removed one leaves the package
+    with open(paths[0], "ab") as f:
+        f.write(b"\n")
+    os.remove(paths[1])
+    index, read = package(directory, destination)
+    assert read==1 and len(index["styles"])==len(paths)-1
+    assert not os.path.exists(os.path.join(destination, os.path.basename(paths[1])+".gz"))
+    assert "url" not in index["styles"][0]
@@ -0,0 +1,25 @@
+import os, sys
+root = os.path.dirname(os.path.abspath(__file__))+"/.."
+sys.path.insert(0, root)
+
+from lxml import etree as ET
+from core.config import ConfigStore
+from core.template import Template
+from core.build import buildpatch, generate, recordids
+
+updated = "2000-01-01T00:00:00+00:00"
+
+def test_patches_serialize_as_built_styles():
+    store = ConfigStore.load(root+"/input/config.xlsx")
+    template = Template.load(root+"/input/chicago-author-date.csl")
+    master = ET.tostring(template.master)
+    for config in store.records():
+        ids, id = recordids(config)
+        settings = {x: store.getsettings(x) for x in ids}
+        patch = buildpatch(config, store, template, updated)
+        assert patch.id==id
+        assert patch.serialize()==generate(config, settings, template, updated)
+        assert patch.serialize(compact=True)==generate(config, settings, template, updated, compact=True)
+        assert sum(patch.summary().values())==len(patch.ops)==len(patch.describe().splitlines())
+    # Materializing leaves the shared template untouched
+    assert ET.tostring(template.master)==master
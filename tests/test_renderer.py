@@ -0,0 +1,134 @@
+import os, sys, json, zipfile
+from lxml import etree as ET
+root = os.path.dirname(os.path.abspath(__file__))+"/.."
+sys.path.insert(0, root)
+
+from core.renderer import Renderer, Locale, normalize, textcase, pagerange
+from core.samples import extract
+
+def style(id):
+    return Renderer.load(root+"/output/chicago-author-date-"+id+".csl")
+
+wordml = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+def zoterofields(path):
+    """
+    (instruction, result paragraphs) of the fields of a .docx file
+    """
+    with zipfile.ZipFile(path) as archive:
+        document = ET.fromstring(archive.read("word/document.xml"))
+    fields = []
+    state = None
+    for paragraph in document.iter(wordml+"p"):
+        if state=="result":
+            fields[-1][1].append("")
+        for element in paragraph.iter(wordml+"fldChar", wordml+"instrText", wordml+"t"):
+            if element.tag==wordml+"fldChar":
+                state = {"begin": "instruction", "separate": "result", "end": None}[element.attrib[wordml+"fldCharType"]]
+                if state=="instruction":
+                    fields.append(["", [""]])
+            elif element.tag==wordml+"instrText" and state=="instruction":
+                fields[-1][0] += element.text or ""
+            elif element.tag==wordml+"t" and state=="result":
+                fields[-1][1][-1] += element.text or ""
+    return fields
+
+# Zotero (citeproc-js) output of the kyosei-ja style in its test document
+kyoseitest = root+"/output/chicago-author-date-kyosei-ja-test.docx"
+
+def test_citations_match_zotero():
+    items = {x["id"]: x for x in extract([kyoseitest])["items"]}
+    renderer = style("kyosei-ja")
+    count = 0
+    for instruction, result in zoterofields(kyoseitest):
+        if "CSL_CITATION" not in instruction:
+            continue
+        citation = json.JSONDecoder().raw_decode(instruction.split("CSL_CITATION", 1)[1].strip())[0]
+        cites = [dict({k: cite[k] for k in ["locator", "label", "suppress-author"] if k in cite}, item=items[cite["id"]]) for cite in citation["citationItems"]]
+        assert renderer.citation(cites)=="".join(result)
+        count += 1
+    assert count==20
+
+def test_bibliography_matches_zotero():
+    entries = [x for instruction, result in zoterofields(kyoseitest) if "CSL_BIBLIOGRAPHY" in instruction for x in result if x.strip()]
+    # citeproc-js puts a narrow no-break space before a colon that follows a space
+    entries = [x.strip().replace("\u202f", " ") for x in entries]
+    # Japanese entries first, in name-kana order, then the others
+    assert style("kyosei-ja").bibliography(extract([kyoseitest])["items"])==entries
+    assert len(entries)==29
+
+def test_note_names_and_dates():
+    item = normalize({"id": 1, "note": "name-kana:かんきょうしょ\neditor:環境省\nauthor: Smith || John\nauthor: Doe || Jane\nissued: 2004-05"})
+    assert item["name-kana"]=="かんきょうしょ"
+    assert item["editor"]==[{"literal": "環境省"}]
+    assert item["author"]==[{"family": "Smith", "given": "John"}, {"family": "Doe", "given": "Jane"}]
+    assert item["issued"]=={"raw": "2004-05"}
+    # Variables of the item are not replaced by note lines
+    assert normalize({"id": 1, "editor": [{"family": "A"}], "note": "editor:環境省"})["editor"]==[{"family": "A"}]
+
+def test_note_editor_renders():
+    item = {"id": 5216, "type": "report", "language": "ja", "title": "環境白書", "issued": {"date-parts": [[2020]]}, "note": "name-kana:かんきょうしょ\neditor:環境省"}
+    entry = style("aerj-ja").bibliography([item])[0]
+    assert entry.startswith("環境省") and "2020" in entry
+
+def test_locale_terms_do_not_mix_languages():
+    styleroot = ET.parse(root+"/output/chicago-author-date-aerj-ja.csl").getroot()
+    for lang, editor in [("ja", "編"), ("zh", "编"), ("ko", "편")]:
+        locale = Locale(styleroot, lang)
+        assert [locale.term("editor", form, True) for form in ["long", "short", "verb", "verb-short"]]==[editor]*4
+    assert Locale(styleroot, "zh").term("open-quote")=="「"
+    # Terms a language does not define at all are English ones
+    assert Locale(styleroot, "ja").term("circa", "short")=="c."
+    assert Locale(styleroot, "en").term("editor", "short", True)=="eds."
+    item = {"id": 1, "type": "book", "language": "ja", "title": "本", "editor": [{"family": "西村", "given": "幹子"}], "issued": {"date-parts": [[2020]]}}
+    entry = style("aerj-ja").bibliography([item])[0]
+    assert entry.startswith("西村幹子") and "編" in entry and "ed" not in entry
+
+def test_doi_url_is_not_prefixed_twice():
+    renderer = style("aerj-en")
+    items = [{"id": i, "type": "article-journal", "title": "Aid", "container-title": "Journal", "author": [{"family": "Smith", "given": "John"}], "issued": {"date-parts": [[2020]]}, "DOI": doi} for i, doi in enumerate(["10.1000/xyz", "https://doi.org/10.1000/xyz", "http://dx.doi.org/10.1000/xyz"])]
+    for entry in renderer.bibliography(items, sort=False):
+        assert entry.count("doi.org")==1 and entry.endswith(" https://doi.org/10.1000/xyz")
+
+def test_textcase():
+    assert textcase("knowledge-based aid: a new way", "title")=="Knowledge-Based Aid: A New Way"
+    assert textcase("KNOWLEDGE-BASED AID: THE NEW WAY", "title")=="Knowledge-Based Aid: The New Way"
+    assert textcase("the role of JICA in africa", "title")=="The Role of JICA in Africa"
+    assert textcase("what it is for", "title")=="What It Is For"
+    assert textcase("Knowledge-Based Aid: A New Way", "sentence")=="Knowledge-based aid: a new way"
+    assert textcase("Education For All and UNESCO", "sentence")=="Education for all and UNESCO"
+    assert textcase("iPhone Use", "sentence")=="iPhone use"
+    assert textcase("<i>the</i> end", "capitalize-first")=="<i>The</i> end"
+    assert textcase("the end of history", "capitalize-all")=="The End Of History"
+    assert textcase("環境白書", "title")=="環境白書"
+
+def test_cjk_names_have_no_separator():
+    item = {"id": 1, "type": "book", "language": "ja", "title": "途上国", "editor": [{"family": "小川", "given": "啓一"}, {"family": "西村", "given": "幹子"}], "issued": {"date-parts": [[2008]]}, "publisher": "学文社"}
+    assert style("kyosei-ja").bibliography([item])==["小川啓一・西村幹子編 2008『途上国』学文社。"]
+
+def test_japanese_page_label():
+    item = {"id": 1, "type": "chapter", "language": "ja", "title": "高等教育", "container-title": "国際教育開発論", "author": [{"family": "吉田", "given": "和浩"}], "issued": {"date-parts": [[2005]]}, "page": "121-140", "publisher": "有斐閣"}
+    assert style("kyosei-ja").bibliography([item])==["吉田和浩 2005「高等教育」『国際教育開発論』pp. 121-140、有斐閣。"]
+
+def test_citeproc_stop_words_and_apostrophes():
+    assert textcase("moving toward the post-washington consensus", "title")=="Moving toward the Post-Washington Consensus"
+    item = {"id": 1, "type": "book", "title": "Aesop's anthropology", "author": [{"family": "Hartigan", "given": "John"}], "issued": {"date-parts": [[2015]]}, "URL": "http://example.org/aesop's"}
+    entry = style("kyosei-en").bibliography([item])[0]
+    assert "Aesop’s Anthropology" in entry and "aesop's" in entry
+
+def test_citation_collapse_and_suppress_author():
+    renderer = style("kyosei-ja")
+    yamada = [{"id": i, "type": "book", "language": "ja", "title": "本", "author": [{"family": "山田", "given": "肖子"}], "issued": {"date-parts": [[year]]}} for i, year in [(1, 2009), (2, 2010)]]
+    ozawa = {"id": 3, "type": "book", "language": "ja", "title": "本", "author": [{"family": "小澤", "given": "大成"}, {"family": "小野", "given": "由美子"}, {"family": "近森", "given": "憲助"}], "issued": {"date-parts": [[2008]]}}
+    assert renderer.citation([ozawa]+yamada)=="（小澤ほか 2008; 山田 2009; 2010）"
+    assert renderer.citation([{"item": yamada[0], "locator": "65-66", "suppress-author": True}])=="（2009:65-66）"
+
+def test_title_case_keeps_capitalized_stop_words():
+    assert textcase("Inequality in Learning Engagements Amid the Pandemic", "title")=="Inequality in Learning Engagements Amid the Pandemic"
+
+def test_chicago_page_ranges():
+    # Chicago Manual of Style 9.64, as in the CSL specification
+    for value, expected in [("3-10", "3–10"), ("71-72", "71–72"), ("100-104", "100–104"), ("600-613", "600–613"), ("1100-1123", "1100–1123"), ("107-108", "107–8"), ("505-517", "505–17"), ("1002-1006", "1002–6"), ("321-325", "321–25"), ("415-532", "415–532"), ("11564-11568", "11564–68"), ("13792-13803", "13792–803"), ("1496-1504", "1496–1504"), ("2787-2816", "2787–2816"), ("11564-11615", "11564–615"), ("12991-13001", "12991–3001")]:
+        assert pagerange(value, "chicago", "–")==expected
+    assert pagerange("42-45", "minimal", "–")=="42–5" and pagerange("42-45", "minimal-two", "–")=="42–45"
+    assert pagerange("321-28", "expanded", "–")=="321–328"
@@ -0,0 +1,31 @@
+import os, sys
+root = os.path.dirname(os.path.abspath(__file__))+"/.."
+sys.path.insert(0, root)
+
+import pytest
+from core.config import ConfigStore
+from core.schema import ConfigError, validate
+
+def settings():
+    return dict(ConfigStore.load(root+"/input/config.xlsx").getsettings("kyosei-ja"))
+
+def test_settings_are_typed():
+    column = dict(settings(), **{"c-et-al-subsequent": "true", "c-invert-page-label": "", "a-punctuation-in-quote": 0, "c-page-label-form": "short"})
+    column.pop("a-bracket-left", None)
+    journal = ConfigStore(data={"settings": {"x-ja": column}}).journal("x-ja")
+    assert journal.c_et_al_subsequent is True and journal.c_invert_page_label is False
+    assert journal.a_punctuation_in_quote=="false" and journal.c_page_label_form=="short"
+    # Missing rows take their default
+    assert journal.a_bracket_left=="（"
+
+def test_every_error_is_reported():
+    bad = dict(settings(), **{"c-et-al-subsequent": "maybe", "c-page-label-form": "big", "b-nope": "1"})
+    store = ConfigStore(data={"settings": {"kyosei-ja": settings(), "bad-ja": bad}})
+    validate(store, ["kyosei-ja"])
+    with pytest.raises(ConfigError) as error:
+        validate(store, ["kyosei-ja", "bad-ja", "missing-ja"])
+    errors = error.value.errors
+    assert len(errors)==4
+    assert errors[:3]==["bad-ja: c-et-al-subsequent: expected TRUE or FALSE, got 'maybe'", "bad-ja: c-page-label-form: expected one of '', 'long', 'short', 'symbol', 'verb', 'verb-short', got 'big'", "bad-ja: b-nope: unknown setting"]
+    assert "missing-ja" in errors[3]
+    assert isinstance(error.value, ValueError) and str(error.value).startswith("4 invalid Settings values:")
@@ -0,0 +1,37 @@
+import os, sys, io, json
+root = os.path.dirname(os.path.abspath(__file__))+"/.."
+sys.path.insert(0, root)
+
+from core.stream import readitems, export
+from core.renderer import Renderer
+
+def library():
+    with open(root+"/input/samples.json", encoding="utf-8") as f:
+        return json.load(f)["items"]
+
+def styledata():
+    with open(root+"/output/chicago-author-date-kyosei-ja.csl", "rb") as f:
+        return f.read()
+
+def test_readitems(tmp_path):
+    items = library()
+    array = tmp_path/"items.json"
+    array.write_text(json.dumps(items, ensure_ascii=False, indent=1), encoding="utf-8")
+    lines = tmp_path/"items.jsonl"
+    lines.write_text("\n".join([json.dumps(x, ensure_ascii=False) for x in items])+"\n", encoding="utf-8")
+    # Small chunks cut items in the middle
+    assert list(readitems(str(array), chunksize=7))==items
+    assert list(readitems(str(lines), chunksize=100))==items
+
+def test_export_matches_bibliography(tmp_path):
+    items = library()
+    # The library twice over, so sorting spans shards
+    items = items+[dict(x, id=str(x["id"])+"b") for x in items]
+    source = tmp_path/"items.json"
+    source.write_text(json.dumps(items, ensure_ascii=False), encoding="utf-8")
+    data = styledata()
+    expected = Renderer.load(data, "html").document(items)
+    for jobs in [1, 2]:
+        stream = io.StringIO()
+        assert export(data, str(source), stream, "html", jobs=jobs, size=7)==len(items)
+        assert stream.getvalue()==expected
@@ -0,0 +1,68 @@
+import os, sys, io, shutil
+root = os.path.dirname(os.path.abspath(__file__))+"/.."
+sys.path.insert(0, root)
+
+from core.config import ConfigStore, convert, writejson
+from core.schema import ConfigError
+from core.watch import Watcher, affected
+
+def sources(tmp_path):
+    config = str(tmp_path/"config.json")
+    template = str(tmp_path/"template.csl")
+    convert(root+"/input/config.xlsx", config)
+    shutil.copy(root+"/input/chicago-author-date.csl", template)
+    return config, template
+
+def edit(path, change):
+    data = ConfigStore(path).data()
+    change(data)
+    stat = os.stat(path)
+    writejson(data, path)
+    # A later mtime even on coarse clocks
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns+10**9))
+
+def test_affected(tmp_path):
+    config, template = sources(tmp_path)
+    old = ConfigStore(config)
+    edit(config, lambda data: data["settings"]["kyosei-ja"].update({"a-bracket-left": "("}))
+    ids, changed = affected(old, ConfigStore(config))
+    assert changed=={"kyosei-ja"} and ids==["kyosei-ja"]
+
+def test_watcher_rebuilds_changed_ids(tmp_path):
+    config, template = sources(tmp_path)
+    calls = []
+    failures = []
+    def build(store, template, ids):
+        calls.append(ids)
+        if failures:
+            raise failures.pop()
+    out = io.StringIO()
+    watcher = Watcher(config, template, build, interval=0.01, out=out)
+    watcher.rebuild(None)
+    assert calls==[None]
+    assert watcher.changes()==[]
+
+    # A changed Settings column: the ids of that column only
+    edit(config, lambda data: data["settings"]["kyosei-ja"].update({"a-bracket-left": "("}))
+    assert watcher.changes()==["config"]
+    ids = watcher.reload(["config"])
+    assert ids==["kyosei-ja"]
+    watcher.rebuild(ids)
+    assert calls[-1]==["kyosei-ja"] and watcher.changes()==[]
+
+    # A failed rebuild is retried with the next change
+    failures.append(ConfigError(["aerj-ja: a-bracket-left: bad"]))
+    edit(config, lambda data: data["settings"]["aerj-ja"].update({"a-bracket-left": "("}))
+    watcher.rebuild(watcher.reload(watcher.changes()))
+    assert "aerj-ja: a-bracket-left: bad" in out.getvalue()
+    edit(config, lambda data: data["settings"]["jids-ja"].update({"a-bracket-left": "("}))
+    watcher.rebuild(watcher.reload(watcher.changes()))
+    assert calls[-1]==["aerj-ja", "jids-ja"] and watcher.pending==[]
+
+    # A changed template rebuilds everything; saving it unchanged does nothing
+    stat = os.stat(template)
+    os.utime(template, ns=(stat.st_atime_ns, stat.st_mtime_ns+10**9))
+    assert watcher.reload(watcher.changes())==[]
+    with open(template, "a", encoding="utf-8") as f:
+        f.write("\n<!-- edited -->\n")
+    assert watcher.reload(watcher.changes()) is None